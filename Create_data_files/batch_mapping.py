@@ -0,0 +1,255 @@
+"""
+Batch mapping of several process libraries against one Baukasten.
+
+The sentence model and the preprocessed Baukasten (feature table, rule hits,
+component embeddings) are loaded once and shared by all inputs, so each
+additional Lösungsbibliothek only pays for its own processes. Inputs are
+mapped concurrently and every input gets its own result files.
+
+Usage:
+    python batch_mapping.py plant_a.xlsx plant_b.xlsx "plant_c.xlsx::Linie 2" \
+        --baukasten "Challenge 2_Bibliothek und Baukasten.xlsx" --output-dir batch_results
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from embedding_backends import BACKENDS, DEFAULT_BATCH_SIZE, load_backend
+from enhanced_process_baukasten_mapper import EnhancedProcessBaukastenMapper, SharedBaukastenState
+
+SHEET_SEPARATOR = '::'
+
+# Shared state inherited by forked worker processes
+_WORKER_STATE = None
+
+
+def parse_input(spec):
+    """
+    Split an input spec into workbook path and process sheet
+
+    Args:
+        spec (str): ``workbook.xlsx`` or ``workbook.xlsx::Sheet name``
+
+    Returns:
+        tuple: (workbook path, sheet name)
+    """
+    if SHEET_SEPARATOR in spec:
+        path, sheet = spec.split(SHEET_SEPARATOR, 1)
+        return path, sheet
+    return spec, 'Lösungsbibliothek'
+
+
+def output_stem(spec, output_dir):
+    """Output path prefix for one input spec"""
+    path, sheet = parse_input(spec)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if SHEET_SEPARATOR in spec:
+        stem = f"{stem}_{sheet}"
+    return os.path.join(output_dir, stem.replace(' ', '_'))
+
+
+def build_shared_state(baukasten_workbook, rules_path=None, embedding_precision='float32', embedding_backend=None):
+    """
+    Load the model and preprocess the Baukasten once
+
+    Args:
+        baukasten_workbook (str): Workbook containing the Baukasten sheet
+        rules_path (str): Optional rules file
+        embedding_precision (str): Storage of the shared component embeddings ('float32', 'float16', 'int8')
+        embedding_backend (EmbeddingBackend): Sentence encoder shared by all mappers (None: default model)
+
+    Returns:
+        SharedBaukastenState: State to pass to every mapper
+    """
+    reference_mapper = EnhancedProcessBaukastenMapper(baukasten_workbook, rules_path=rules_path,
+                                                      embedding_precision=embedding_precision,
+                                                      embedding_backend=embedding_backend)
+    return SharedBaukastenState(reference_mapper)
+
+
+def load_candidate_ids(path):
+    """
+    Read a Lfd. Nummer pre-filter
+
+    Args:
+        path (str): JSON list of Lfd. Nummer, or the output of
+            ``process_data.py --where ... --find-components``
+
+    Returns:
+        list: Lfd. Nummer to score
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('components', [])
+    return [int(c) for c in data]
+
+
+def map_input(spec, shared_state, output_dir, top_k=None, write_excel=False, candidate_ids=None,
+              score_matrices=False):
+    """
+    Map one process library with the shared Baukasten state and write its results
+
+    Args:
+        spec (str): Input spec (see parse_input)
+        shared_state (SharedBaukastenState): Shared model and Baukasten
+        output_dir (str): Directory for the result files
+        top_k (int): Maximum matches per process (None for unbounded)
+        write_excel (bool): Also write the Enhanced_Challenge_2_Results-style workbook
+        candidate_ids (list): Optional Lfd. Nummer pre-filter (see load_candidate_ids)
+        score_matrices (bool): Also export the full score matrices to ``<stem>_scores/``
+            (see score_query.py)
+
+    Returns:
+        dict: Summary with the written files
+    """
+    start = time.perf_counter()
+    path, sheet = parse_input(spec)
+    stem = output_stem(spec, output_dir)
+    files = {'results': f"{stem}_results.npz", 'matrix': f"{stem}_matrix.json"}
+    if score_matrices:
+        files['scores'] = f"{stem}_scores"
+
+    mapper = EnhancedProcessBaukastenMapper(path, shared_state=shared_state, process_sheet=sheet)
+    result = mapper.map_processes_to_baukasten_scored(top_k=top_k, candidate_ids=candidate_ids,
+                                                      spill_dir=files.get('scores'))
+
+    result.save(files['results'])
+    with open(files['matrix'], 'w', encoding='utf-8') as f:
+        json.dump(result.to_matrix_json(), f, indent=4, ensure_ascii=False)
+    if write_excel and mapper.matrix_df is not None:
+        files['excel'] = f"{stem}_Results.xlsx"
+        mapper.save_enhanced_results(result.to_mappings(), files['excel'])
+
+    return {
+        'input': spec,
+        'processes': len(result),
+        'mappings': sum(len(ids) for ids in result.to_mappings().values()),
+        'seconds': round(time.perf_counter() - start, 2),
+        'files': files,
+    }
+
+
+def _map_input_in_worker(spec, output_dir, top_k, write_excel, candidate_ids, score_matrices):
+    """Process-pool entry point using the state inherited from the parent"""
+    return map_input(spec, _WORKER_STATE, output_dir, top_k, write_excel, candidate_ids, score_matrices)
+
+
+def run_batch(inputs, baukasten_workbook, output_dir, max_workers=4, executor='thread',
+              top_k=None, rules_path=None, write_excel=False, candidate_ids=None, embedding_precision='float32',
+              embedding_backend=None, score_matrices=False):
+    """
+    Map many process libraries against one shared Baukasten
+
+    Args:
+        inputs (list): Input specs (``workbook.xlsx`` or ``workbook.xlsx::Sheet``)
+        baukasten_workbook (str): Workbook providing the Baukasten sheet
+        output_dir (str): Directory for the result files
+        max_workers (int): Number of inputs mapped concurrently
+        executor (str): 'thread' or 'process' (process requires the fork start method
+            so workers inherit the loaded state instead of reloading it)
+        top_k (int): Maximum matches per process (None for unbounded)
+        rules_path (str): Optional rules file
+        write_excel (bool): Also write a results workbook per input
+        candidate_ids (list): Optional Lfd. Nummer pre-filter applied to every input
+        embedding_precision (str): Storage of the shared component embeddings (see embedding_quantization.py)
+        embedding_backend (EmbeddingBackend): Shared sentence encoder (see embedding_backends.py); size its
+            threads so that threads x workers does not exceed the cores
+        score_matrices (bool): Also export every input's full score matrices (not with candidate_ids)
+
+    Returns:
+        list: One summary dict per input, in input order
+    """
+    global _WORKER_STATE
+    os.makedirs(output_dir, exist_ok=True)
+
+    stems = [output_stem(spec, output_dir) for spec in inputs]
+    if len(set(stems)) != len(stems):
+        raise ValueError("Inputs would write to the same result files, rename the workbooks or sheets")
+    if score_matrices and candidate_ids is not None:
+        raise ValueError("score_matrices exports the full Baukasten and cannot be combined with candidate_ids")
+
+    shared_state = build_shared_state(baukasten_workbook, rules_path, embedding_precision, embedding_backend)
+
+    if executor == 'process':
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("executor='process' needs the fork start method, use executor='thread'")
+        _WORKER_STATE = shared_state
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork'))
+        submit = lambda spec: pool.submit(_map_input_in_worker, spec, output_dir, top_k, write_excel,
+                                           candidate_ids, score_matrices)
+    elif executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        submit = lambda spec: pool.submit(map_input, spec, shared_state, output_dir, top_k, write_excel,
+                                           candidate_ids, score_matrices)
+    else:
+        raise ValueError(f"Unknown executor '{executor}'")
+
+    summaries = {}
+    with pool:
+        futures = {submit(spec): spec for spec in inputs}
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                summaries[spec] = future.result()
+            except Exception as e:
+                print(f"⚠️ Mapping failed for {spec}: {e}")
+                summaries[spec] = {'input': spec, 'error': str(e)}
+    _WORKER_STATE = None
+
+    return [summaries[spec] for spec in inputs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map several process libraries against one Baukasten")
+    parser.add_argument('inputs', nargs='+', help="Workbooks, optionally 'workbook.xlsx::Sheet'")
+    parser.add_argument('--baukasten', default='Challenge 2_Bibliothek und Baukasten.xlsx',
+                        help="Workbook providing the Baukasten sheet")
+    parser.add_argument('--output-dir', default='batch_results')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--top-k', type=int, default=None)
+    parser.add_argument('--rules', default=None, help="Domain rules file")
+    parser.add_argument('--excel', action='store_true', help="Also write a results workbook per input")
+    parser.add_argument('--candidates', default=None,
+                        help="JSON Lfd. Nummer pre-filter, e.g. from process_data.py --where ... --find-components")
+    parser.add_argument('--embedding-precision', choices=['float32', 'float16', 'int8'], default='float32',
+                        help="Storage of the component embeddings (float16 halves, int8 quarters their memory)")
+    parser.add_argument('--score-matrices', action='store_true',
+                        help="Also export the full final and per-signal score matrices per input (see score_query.py)")
+    parser.add_argument('--embedding-backend', choices=BACKENDS, default=None,
+                        help="Sentence encoder (default: sentence-transformers when installed)")
+    parser.add_argument('--embedding-model', default=None,
+                        help="Model name, or the local model directory for the onnx backend")
+    parser.add_argument('--embedding-threads', type=int, default=None, help="Intra-op threads of the encoder")
+    parser.add_argument('--embedding-batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-seq-length', type=int, default=None, help="Tokens kept per text")
+    args = parser.parse_args()
+
+    candidate_ids = load_candidate_ids(args.candidates) if args.candidates else None
+    embedding_backend = None
+    if args.embedding_backend or args.embedding_model or args.embedding_threads or args.max_seq_length \
+            or args.embedding_batch_size != DEFAULT_BATCH_SIZE:
+        embedding_backend = load_backend(args.embedding_backend or 'sentence-transformers', args.embedding_model,
+                                         args.embedding_threads, args.embedding_batch_size, args.max_seq_length)
+    summaries = run_batch(args.inputs, args.baukasten, args.output_dir, max_workers=args.workers,
+                          executor=args.executor, top_k=args.top_k, rules_path=args.rules,
+                          write_excel=args.excel, candidate_ids=candidate_ids,
+                          embedding_precision=args.embedding_precision, embedding_backend=embedding_backend,
+                          score_matrices=args.score_matrices)
+
+    print("\n" + "=" * 60)
+    for summary in summaries:
+        if 'error' in summary:
+            print(f"❌ {summary['input']}: {summary['error']}")
+        else:
+            print(f"✅ {summary['input']}: {summary['processes']} processes, "
+                  f"{summary['mappings']} mappings in {summary['seconds']}s -> {summary['files']['results']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Precomputed per-component text features for the Enhanced Process-Baukasten Mapper.
+
+Every scoring signal reads the same handful of Baukasten fields. The feature
+table normalizes them once after loading (column-wise, see
+text_normalization.py) so the per-pair scoring paths only do list/array
+lookups instead of re-running the text preprocessing.
+"""
+
+import numpy as np
+
+from text_normalization import normalize_columns
+
+# Baukasten columns used by the similarity signals
+FEATURE_FIELDS = ('Bauteilnamen', 'Bauteilkategorie', 'Hersteller', 'Typ', 'Kurzbeschreibung')
+
+
+class ComponentFeatureTable:
+    """Column-oriented feature table with one row per Baukasten element"""
+
+    __slots__ = ('lfd_nummer', 'fields', 'text', 'embedding_row', '_row_by_lfd')
+
+    def __init__(self, baukasten_df, extra_fields=()):
+        """
+        Build the table from the Baukasten sheet.
+
+        Args:
+            baukasten_df (pd.DataFrame): Loaded Baukasten sheet
+            extra_fields (iterable): Additional columns to normalize (e.g. rule fields)
+        """
+        columns = list(FEATURE_FIELDS) + [f for f in extra_fields if f not in FEATURE_FIELDS]
+        self.fields = normalize_columns(baukasten_df, columns)
+        self.lfd_nummer = baukasten_df['Lfd. Nummer'].to_numpy()
+
+        # Combined text in the same order calculate_similarity always used
+        self.text = [
+            f"{name} {kategorie} {hersteller} {typ} {beschreibung}".strip()
+            for name, kategorie, hersteller, typ, beschreibung in zip(
+                *(self.fields[column] for column in FEATURE_FIELDS)
+            )
+        ]
+
+        # Row of each component in the mapper's embedding matrix (-1 if none)
+        self.embedding_row = np.full(len(self.text), -1, dtype=np.int32)
+        self._row_by_lfd = {lfd: row_idx for row_idx, lfd in enumerate(self.lfd_nummer)}
+
+    def __len__(self):
+        return len(self.text)
+
+    def row_for(self, baukasten_row):
+        """
+        Resolve the feature row of a Baukasten DataFrame row
+
+        Args:
+            baukasten_row: DataFrame row containing building kit element
+
+        Returns:
+            int or None: Row index, None if the element is not in the table
+        """
+        row_idx = baukasten_row.name
+        lfd_nummer = baukasten_row.get('Lfd. Nummer')
+        if isinstance(row_idx, (int, np.integer)) and 0 <= row_idx < len(self.text) \
+                and self.lfd_nummer[row_idx] == lfd_nummer:
+            return int(row_idx)
+        return self._row_by_lfd.get(lfd_nummer)
+
+    def field_texts(self, row_idx):
+        """All normalized fields of one row as a dict"""
+        return {column: values[row_idx] for column, values in self.fields.items()}
@@ -1,8 +1,15 @@
 import pandas as pd
 import json
+import os
 import re
+import sys
 from typing import List, Dict
 
+from mapping_results import MappingResult
+
+# process_data.py and its stdlib helpers (hierarchy_store.py) live one level up
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 def matrix_to_json(excel_file_path, sheet_name=None, output_file_path=None):
     df = pd.read_excel(excel_file_path, sheet_name=sheet_name, header=1, index_col=None)
 
@@ -28,6 +35,52 @@ def matrix_to_json(excel_file_path, sheet_name=None, output_file_path=None):
     print("JSON saved to enhanced_matrix.json")
 
 
+def results_to_json(results_file_path, output_file_path=None):
+    """
+    Write enhanced_matrix.json straight from the mapper's score-retaining result
+    (enhanced_results.npz), without reading the Excel matrix or rescoring.
+    """
+    matrix_json = MappingResult.load(results_file_path).to_matrix_json()
+
+    with open(output_file_path, "w", encoding="utf-8") as f:
+        json.dump(matrix_json, f, indent=4, ensure_ascii=False)
+
+    print(f"JSON saved to {output_file_path}")
+
+
+def json_to_sqlite(data_dir, output_file_path, results_file_path=None):
+    """
+    Write the SQLite store process_data.py serves from (hierarchy.sqlite)
+
+    Parameters:
+    data_dir: Directory with process_data.json, component_data.json,
+        hauptprozess_map.json and enhanced_matrix.json
+    output_file_path: Database path; an existing store is replaced in one transaction
+    results_file_path: enhanced_results.npz whose scores are stored with the mappings (optional)
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from hierarchy_store import write_store
+
+    data = {}
+    for key in ('process_data', 'component_data', 'hauptprozess_map', 'enhanced_matrix'):
+        with open(os.path.join(data_dir, f'{key}.json'), 'r', encoding='utf-8') as f:
+            data[key] = json.load(f)
+
+    # Same rounding as process_data.load_mapping_scores
+    scores = {}
+    if results_file_path and os.path.exists(results_file_path):
+        result = MappingResult.load(results_file_path)
+        for process_num in result.process_numbers():
+            matches = result.matches(process_num)
+            for component_id, score in zip(matches['ids'], matches['final']):
+                scores[(str(process_num), str(int(component_id)))] = round(float(score), 3)
+    data['mapping_scores'] = scores
+
+    write_store(output_file_path, data)
+    print(f"SQLite store saved to {output_file_path}")
+
+
 def excel_to_json(excel_file_path, sheet_name=None, output_file_path=None):
     """
     Convert Excel data to JSON format where each row becomes an object
@@ -127,21 +180,11 @@ def build_hauptprozess_json(df_process: pd.DataFrame,
     return result
 
 
-# Example usage:
-if __name__ == "__main__":
-    # Replace with your actual file path
-    excel_file = "Challenge 2_Bibliothek und Baukasten.xlsx"
-    matrix_path = "Enhanced_Challenge_2_Results.xlsx"
-    
-    # Convert to JSON
-    excel_to_json(excel_file, output_file_path="process_data.json", sheet_name="Lösungsbibliothek")
-    excel_to_json(excel_file, output_file_path="component_data.json", sheet_name="Baukasten")
-    matrix_to_json(matrix_path, output_file_path="enhanced_matrix.json", sheet_name="Enhanced-Filled-Matrix")
-    # Print first few records to verify
-    print("Done")
-
-
-    df_process = pd.read_excel(excel_file, sheet_name="Lösungsbibliothek", header=None).fillna("")
+def hauptprozess_to_json(excel_file_path, output_file_path, sheet_name="Lösungsbibliothek"):
+    """
+    Write hauptprozess_map.json ({Hauptprozess_ID: [subprocess_ids, ...]}) from the process sheet
+    """
+    df_process = pd.read_excel(excel_file_path, sheet_name=sheet_name, header=None).fillna("")
     # Set second row (index 1) as header
     df_process.columns = df_process.iloc[1, :]
     
@@ -154,11 +197,37 @@ if __name__ == "__main__":
     haupt_to_sub = build_hauptprozess_json(df_process)
 
     # Write to JSON file
-    with open("hauptprozess_map.json", "w", encoding="utf-8") as f:
+    with open(output_file_path, "w", encoding="utf-8") as f:
         json.dump(haupt_to_sub, f, indent=4, ensure_ascii=False)
 
-    print("JSON saved to hauptprozess_map.json")
+    print(f"JSON saved to {output_file_path}")
+
+
+# Example usage:
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert the workbooks into the JSON inputs of process_data.py")
+    parser.add_argument('--sqlite', nargs='?', const='hierarchy.sqlite', metavar='PATH',
+                        help="Also write the indexed SQLite store (default: hierarchy.sqlite)")
+    args = parser.parse_args()
 
+    # Replace with your actual file path
+    excel_file = "Challenge 2_Bibliothek und Baukasten.xlsx"
+    matrix_path = "Enhanced_Challenge_2_Results.xlsx"
+    results_path = "enhanced_results.npz"
+    
+    # Convert to JSON
+    excel_to_json(excel_file, output_file_path="process_data.json", sheet_name="Lösungsbibliothek")
+    excel_to_json(excel_file, output_file_path="component_data.json", sheet_name="Baukasten")
+    if os.path.exists(results_path):
+        results_to_json(results_path, output_file_path="enhanced_matrix.json")
+    else:
+        matrix_to_json(matrix_path, output_file_path="enhanced_matrix.json", sheet_name="Enhanced-Filled-Matrix")
+    # Print first few records to verify
+    print("Done")
 
 
+    hauptprozess_to_json(excel_file, output_file_path="hauptprozess_map.json", sheet_name="Lösungsbibliothek")
 
+    if args.sqlite:
+        json_to_sqlite('.', args.sqlite, results_file_path=results_path)
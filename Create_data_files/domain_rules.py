@@ -0,0 +1,205 @@
+"""
+Domain and manufacturer rules for the Enhanced Process-Baukasten Mapper.
+
+The rules live in ``domain_rules.json`` so domain experts can extend them
+without touching the scoring code. Each rule fires for a process when one of
+its ``keywords`` is among the process keywords and one of its ``hints`` occurs
+as a substring of one of the listed Baukasten ``fields``.
+
+All hints are compiled into a single Aho-Corasick automaton. The automaton is
+run once per component and field to build a component x rule hit matrix, so
+scoring a process against the whole Baukasten is a vectorized lookup instead
+of nested substring scans per pair.
+"""
+
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'domain_rules.json')
+
+
+class AhoCorasickMatcher:
+    """Multi-pattern substring matcher reporting every (also overlapping) hit"""
+
+    def __init__(self, patterns):
+        """
+        Build the automaton.
+
+        Args:
+            patterns (list): Patterns to search for; the index is the pattern id
+        """
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].add(pattern_id)
+
+        # Breadth-first construction of the failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Find all patterns occurring in text
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            set: Ids of the patterns found in text
+        """
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return found
+
+
+class RuleSet:
+    """One section of the rules file (e.g. ``domain`` or ``technical``)"""
+
+    def __init__(self, name, config):
+        """
+        Args:
+            name (str): Section name
+            config (dict): Section from the rules file
+        """
+        self.name = name
+        self.combine = config.get('combine', 'sum')
+        if self.combine not in ('sum', 'max'):
+            raise ValueError(f"Unknown combine mode '{self.combine}' in rule section '{name}'")
+        self.cap = float(config.get('cap', 1.0))
+        self.options = {k: v for k, v in config.items() if k not in ('rules', 'combine', 'cap')}
+        self.rules = config.get('rules', [])
+
+        self.rule_names = [rule.get('name', f'{name}_{i}') for i, rule in enumerate(self.rules)]
+        self.weights = np.array([float(rule['weight']) for rule in self.rules], dtype=np.float64)
+        self.fields = sorted({field for rule in self.rules for field in rule['fields']})
+
+        # Keyword -> rule ids that the keyword activates
+        self.keyword_index = {}
+        for rule_id, rule in enumerate(self.rules):
+            for keyword in rule['keywords']:
+                self.keyword_index.setdefault(keyword, []).append(rule_id)
+
+        self.hints = sorted({hint for rule in self.rules for hint in rule['hints']})
+        hint_ids = {hint: i for i, hint in enumerate(self.hints)}
+        self.matcher = AhoCorasickMatcher(self.hints)
+
+        # (field, hint id) -> rule ids that accept the hint in that field
+        self._hint_rules = {}
+        for rule_id, rule in enumerate(self.rules):
+            for field in rule['fields']:
+                for hint in rule['hints']:
+                    self._hint_rules.setdefault((field, hint_ids[hint]), set()).add(rule_id)
+
+    def row_hits(self, field_texts):
+        """
+        Evaluate all rule hints against one component
+
+        Args:
+            field_texts (dict): Preprocessed text per Baukasten field
+
+        Returns:
+            np.ndarray: Boolean vector with one entry per rule
+        """
+        hits = np.zeros(len(self.rules), dtype=bool)
+        for field in self.fields:
+            text = field_texts.get(field, '')
+            if not text:
+                continue
+            for hint_id in self.matcher.find_all(text):
+                for rule_id in self._hint_rules.get((field, hint_id), ()):
+                    hits[rule_id] = True
+        return hits
+
+    def hit_matrix(self, component_field_texts):
+        """
+        Build the component x rule hit matrix
+
+        Args:
+            component_field_texts (list): One ``row_hits`` input dict per component
+
+        Returns:
+            np.ndarray: Boolean matrix of shape (components, rules)
+        """
+        matrix = np.zeros((len(component_field_texts), len(self.rules)), dtype=bool)
+        for row_idx, field_texts in enumerate(component_field_texts):
+            matrix[row_idx] = self.row_hits(field_texts)
+        return matrix
+
+    def rule_activation(self, process_keywords):
+        """
+        Weight vector of the rules activated by a set of process keywords
+
+        Args:
+            process_keywords (iterable): Keywords from process
+
+        Returns:
+            np.ndarray: Rule weights, zero for rules not activated
+        """
+        active = np.zeros(len(self.rules), dtype=bool)
+        for keyword in process_keywords:
+            for rule_id in self.keyword_index.get(keyword, ()):
+                active[rule_id] = True
+        return np.where(active, self.weights, 0.0)
+
+    def score(self, hits, activation):
+        """
+        Combine rule hits with an activation vector
+
+        Args:
+            hits (np.ndarray): Hit vector (rules,) or hit matrix (components, rules)
+            activation (np.ndarray): Output of ``rule_activation``
+
+        Returns:
+            float or np.ndarray: Uncapped score per component
+        """
+        if not len(self.rules):
+            return np.zeros(hits.shape[:-1]) if hits.ndim > 1 else 0.0
+        if self.combine == 'sum':
+            return hits @ activation
+        return np.where(hits, activation, 0.0).max(axis=-1)
+
+
+def load_rules(rules_path=None):
+    """
+    Load the rules file
+
+    Args:
+        rules_path (str): Path to a rules JSON file, defaults to domain_rules.json
+
+    Returns:
+        dict: Section name -> RuleSet
+    """
+    rules_path = rules_path or DEFAULT_RULES_PATH
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return {name: RuleSet(name, section) for name, section in config.items()}
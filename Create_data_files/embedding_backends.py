@@ -0,0 +1,360 @@
+"""
+Pluggable sentence embedding backends for the mapper.
+
+Every backend encodes a list of texts into a float32 (texts, dimensions)
+matrix with an explicit CPU budget:
+
+    threads          intra-op threads of the model runtime (None: library default)
+    batch_size       texts per model call
+    max_seq_length   tokens kept per text (None: the model's own limit)
+
+Backends:
+
+    sentence-transformers   SentenceTransformer via PyTorch (the default, as before)
+    onnx                    ONNX Runtime session on a local export of the model
+                            (model.onnx plus tokenizer.json, e.g. from
+                            ``optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2``)
+    stub                    Deterministic hashed bag of words, no model and no
+                            network; for offline tests
+
+The ONNX backend sorts texts by length so each batch pads to its own longest
+text, and mean-pools the token embeddings like the sentence-transformers
+pooling layer. Vectors are not normalized here; QuantizedEmbeddings does that.
+
+``identity`` names everything that changes the vectors (backend, model, max
+sequence length); the mapper puts it into its scoring fingerprint so memoized
+scores of another backend are never reused.
+
+Usage (throughput comparison on the Baukasten component texts):
+    python embedding_backends.py "Challenge 2_Bibliothek und Baukasten.xlsx" \
+        --backends sentence-transformers onnx stub --onnx-model models/all-MiniLM-L6-v2-onnx --threads 4
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+    import torch
+except ImportError:
+    SentenceTransformer = None
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:
+    onnxruntime = None
+
+BACKENDS = ('sentence-transformers', 'onnx', 'stub')
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_BATCH_SIZE = 32
+STUB_DIMENSIONS = 384
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    """Short SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class EmbeddingBackend(ABC):
+    """Base class: encodes texts in batches under an explicit thread budget"""
+
+    name = None
+
+    def __init__(self, model=DEFAULT_MODEL, threads=None, batch_size=DEFAULT_BATCH_SIZE, max_seq_length=None):
+        """
+        Args:
+            model (str): Model name or local path
+            threads (int): Intra-op threads (None keeps the library default)
+            batch_size (int): Texts per model call
+            max_seq_length (int): Tokens kept per text (None keeps the model's limit)
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.model = model
+        self.threads = threads
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length
+
+    @property
+    def identity(self):
+        """Everything besides the texts that determines the vectors"""
+        suffix = f'@{self.max_seq_length}' if self.max_seq_length else ''
+        return f'{self.name}:{self.model}{suffix}'
+
+    @abstractmethod
+    def encode(self, texts):
+        """
+        Embed texts
+
+        Args:
+            texts (list): Input strings
+
+        Returns:
+            np.ndarray: float32 (len(texts), dimensions)
+        """
+
+    def describe(self):
+        """One-line summary for log output"""
+        return (f"{self.name} ({self.model}, threads={self.threads or 'default'}, "
+                f"batch_size={self.batch_size}, max_seq_length={self.max_seq_length or 'model'})")
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """SentenceTransformer model on PyTorch"""
+
+    name = 'sentence-transformers'
+
+    def __init__(self, model=DEFAULT_MODEL, threads=None, batch_size=DEFAULT_BATCH_SIZE, max_seq_length=None):
+        super().__init__(model, threads, batch_size, max_seq_length)
+        if SentenceTransformer is None:
+            raise ImportError("The sentence-transformers backend needs sentence-transformers and torch")
+        if threads:
+            torch.set_num_threads(threads)
+        self.encoder = SentenceTransformer(model)
+        if max_seq_length:
+            self.encoder.max_seq_length = max_seq_length
+
+    @property
+    def identity(self):
+        # The default setup keeps the former fingerprint, so existing score memos stay valid
+        if self.max_seq_length is None:
+            return self.model
+        return f'{self.model}@{self.max_seq_length}'
+
+    def encode(self, texts):
+        embeddings = self.encoder.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                         show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """Transformer encoder exported to ONNX, run by ONNX Runtime on the CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, model, threads=None, batch_size=DEFAULT_BATCH_SIZE, max_seq_length=None):
+        """
+        Args:
+            model (str): Directory with model.onnx (or onnx/model.onnx) and tokenizer.json,
+                or the path of the .onnx file itself
+            threads (int): ONNX Runtime intra-op threads
+            batch_size (int): Texts per session run
+            max_seq_length (int): Tokens kept per text (None: 256, the sentence-transformers limit)
+        """
+        super().__init__(model, threads, batch_size, max_seq_length)
+        if onnxruntime is None:
+            raise ImportError("The onnx backend needs onnxruntime and tokenizers")
+        self.model_path = self._find_model(model)
+        tokenizer_dir = model if os.path.isdir(model) else os.path.dirname(self.model_path)
+        tokenizer_path = os.path.join(tokenizer_dir, 'tokenizer.json')
+        if not os.path.exists(tokenizer_path):
+            raise FileNotFoundError(f"No tokenizer.json next to the ONNX model in {tokenizer_dir}")
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_seq_length or 256)
+        self.tokenizer.no_padding()  # Each batch is padded to its own longest text in encode
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {session_input.name for session_input in self.session.get_inputs()}
+        self._identity = f'onnx:{_file_digest(self.model_path)}@{max_seq_length or 256}'
+
+    @staticmethod
+    def _find_model(model):
+        if os.path.isfile(model):
+            return model
+        for candidate in ('model.onnx', os.path.join('onnx', 'model.onnx')):
+            path = os.path.join(model, candidate)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No model.onnx in {model}")
+
+    @property
+    def identity(self):
+        return self._identity
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(texts), length), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), length), dtype=np.int64)
+        for i, encoding in enumerate(encodings):
+            input_ids[i, :len(encoding.ids)] = encoding.ids
+            attention_mask[i, :len(encoding.ids)] = 1
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        # Mean pooling over the real tokens
+        mask = attention_mask[:, :, None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Length-sorted batches pad less; rows are put back in input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self._encode_batch([texts[i] for i in batch])
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+        return out
+
+
+class StubBackend(EmbeddingBackend):
+    """Deterministic hashed bag-of-words vectors (no model, no network)"""
+
+    name = 'stub'
+
+    def __init__(self, model='hashing', threads=None, batch_size=DEFAULT_BATCH_SIZE, max_seq_length=None,
+                 dimensions=STUB_DIMENSIONS):
+        super().__init__(model, threads, batch_size, max_seq_length)
+        self.dimensions = dimensions
+        self._word_cache = {}
+
+    @property
+    def identity(self):
+        return f'{super().identity}/{self.dimensions}'
+
+    def _word_vector(self, word):
+        vector = self._word_cache.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.md5(word.encode('utf-8')).digest()[:8], 'little')
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+            self._word_cache[word] = vector
+        return vector
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = str(text).lower().split()
+            if self.max_seq_length:
+                words = words[:self.max_seq_length]
+            for word in words:
+                out[i] += self._word_vector(word)
+            if words:
+                out[i] /= len(words)
+        return out
+
+
+BACKEND_CLASSES = {cls.name: cls for cls in (SentenceTransformerBackend, OnnxBackend, StubBackend)}
+
+
+def load_backend(name='sentence-transformers', model=None, threads=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_seq_length=None):
+    """
+    Create an embedding backend
+
+    Args:
+        name (str): One of BACKENDS
+        model (str): Model name or local path (None: the backend's default; required for onnx)
+        threads (int): Intra-op threads
+        batch_size (int): Texts per model call
+        max_seq_length (int): Tokens kept per text
+
+    Returns:
+        EmbeddingBackend: Loaded backend
+    """
+    if name not in BACKEND_CLASSES:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {BACKENDS}")
+    if name == 'onnx' and model is None:
+        raise ValueError("The onnx backend needs a local model path")
+    kwargs = {'threads': threads, 'batch_size': batch_size, 'max_seq_length': max_seq_length}
+    if model is not None:
+        kwargs['model'] = model
+    return BACKEND_CLASSES[name](**kwargs)
+
+
+def benchmark(backends, texts, repeat=3):
+    """
+    Encoding throughput of several backends on the same texts
+
+    Args:
+        backends (list): Loaded EmbeddingBackend instances
+        texts (list): Texts to encode
+        repeat (int): Timed runs per backend (the best one counts; one warm-up run first)
+
+    Returns:
+        list: {"backend", "identity", "texts", "dimensions", "seconds", "texts_per_second"} per backend
+    """
+    rows = []
+    for backend in backends:
+        embeddings = backend.encode(texts[:backend.batch_size])  # Warm-up: lazy init, allocator
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            embeddings = backend.encode(texts)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        rows.append({
+            'backend': backend.describe(),
+            'identity': backend.identity,
+            'texts': len(texts),
+            'dimensions': int(embeddings.shape[1]) if len(embeddings) else 0,
+            'seconds': round(best, 4),
+            'texts_per_second': round(len(texts) / best, 1) if best > 0 else float('inf'),
+        })
+    return rows
+
+
+def main():
+    from component_features import ComponentFeatureTable
+    from enhanced_process_baukasten_mapper import BAUKASTEN_COLUMNS, read_library_sheet
+
+    parser = argparse.ArgumentParser(description="Compare the throughput of the embedding backends")
+    parser.add_argument('workbook', nargs='?', default='Challenge 2_Bibliothek und Baukasten.xlsx',
+                        help="Workbook whose Baukasten component texts are encoded")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=['sentence-transformers', 'stub'])
+    parser.add_argument('--model', default=None, help="sentence-transformers model name or path")
+    parser.add_argument('--onnx-model', default=None, help="Local ONNX export (directory or .onnx file)")
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-seq-length', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    baukasten_df = read_library_sheet(args.workbook, 'Baukasten', 'Lfd. Nummer', columns=BAUKASTEN_COLUMNS)
+    texts = ComponentFeatureTable(baukasten_df).text
+
+    backends = []
+    for name in args.backends:
+        model = args.onnx_model if name == 'onnx' else args.model if name == 'sentence-transformers' else None
+        try:
+            backends.append(load_backend(name, model, args.threads, args.batch_size, args.max_seq_length))
+        except Exception as e:
+            print(f"⚠️ Skipping {name}: {e}")
+    if not backends:
+        print("❌ No backend could be loaded")
+        return
+
+    print(f"⏱️ Encoding {len(texts)} component texts, best of {args.repeat}")
+    rows = benchmark(backends, texts, args.repeat)
+    baseline = rows[0]['texts_per_second']
+    for row in rows:
+        print(f"   {row['backend']}")
+        print(f"      {row['texts_per_second']:>10} texts/s  {row['seconds']:>8}s  "
+              f"{row['dimensions']} dims  x{row['texts_per_second'] / baseline:.2f} vs {rows[0]['identity']}")
+
+
+if __name__ == "__main__":
+    main()
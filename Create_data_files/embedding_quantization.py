@@ -0,0 +1,249 @@
+"""
+Reduced-precision storage and scoring of component embeddings.
+
+Component embeddings are unit-normalized once and kept in one of three
+precisions:
+
+    float32   4 bytes per dimension (reference)
+    float16   2 bytes per dimension
+    int8      1 byte per dimension plus one float32 scale per vector
+              (symmetric, scale = max |x| / 127)
+
+Cosine similarity against a whole catalog is one dot product per block of
+rows, upcast to float32 block by block, so the quantized matrix is never
+materialized at full precision.
+
+accuracy_report() measures what a precision costs: it scores the workbook once
+at full precision (keeping the per-signal matrices, see score_store.py),
+replaces the embedding signal by the quantized similarities and compares the
+recombined final scores and the selected matches with the full-precision run.
+
+Usage:
+    python embedding_quantization.py "Challenge 2_Bibliothek und Baukasten.xlsx" --spill-dir scores_fp32
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+INT8_MAX = 127
+BLOCK_ROWS = 4096  # Rows upcast to float32 at a time
+
+
+def _unit_rows(matrix):
+    """Row-normalized float32 copy (zero rows stay zero)"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class QuantizedEmbeddings:
+    """Unit-normalized embedding matrix in float32, float16 or per-vector scaled int8"""
+
+    def __init__(self, values, scales=None, precision='float32'):
+        """
+        Args:
+            values (np.ndarray): (rows, dimensions) matrix in the storage dtype
+            scales (np.ndarray): float32 scale per row (int8 only)
+            precision (str): One of PRECISIONS
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision '{precision}', expected one of {PRECISIONS}")
+        self.values = values
+        self.scales = scales
+        self.precision = precision
+
+    @classmethod
+    def from_float(cls, embeddings, precision='float32'):
+        """
+        Normalize and quantize model output
+
+        Args:
+            embeddings (np.ndarray): (rows, dimensions) embeddings
+            precision (str): Storage precision
+
+        Returns:
+            QuantizedEmbeddings: Quantized matrix
+        """
+        unit = _unit_rows(embeddings)
+        if precision == 'float32':
+            return cls(unit, precision=precision)
+        if precision == 'float16':
+            return cls(unit.astype(np.float16), precision=precision)
+        if precision == 'int8':
+            scales = np.abs(unit).max(axis=1) / INT8_MAX
+            safe = np.where(scales > 0, scales, 1.0)[:, None]
+            codes = np.clip(np.rint(unit / safe), -INT8_MAX, INT8_MAX).astype(np.int8)
+            return cls(codes, scales.astype(np.float32), precision)
+        raise ValueError(f"Unknown embedding precision '{precision}', expected one of {PRECISIONS}")
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        """Storage size in bytes"""
+        return self.values.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def vectors(self, start=0, stop=None):
+        """Dequantized float32 rows [start, stop)"""
+        block = self.values[start:stop].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:stop, None]
+        return block
+
+    def similarities(self, queries, block_rows=BLOCK_ROWS):
+        """
+        Cosine similarity of queries against every stored row
+
+        Args:
+            queries (np.ndarray): One embedding (dimensions,) or several (n, dimensions)
+            block_rows (int): Stored rows upcast to float32 at a time
+
+        Returns:
+            np.ndarray: float32 similarities, (rows,) for one query or (n, rows)
+        """
+        single = np.ndim(queries) == 1
+        unit_queries = _unit_rows(queries)
+        out = np.empty((len(unit_queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), block_rows):
+            stop = min(start + block_rows, len(self))
+            block = self.values[start:stop].astype(np.float32)
+            # int8: dot with the codes, then one multiply by the row scales
+            dots = unit_queries @ block.T
+            if self.scales is not None:
+                dots *= self.scales[start:stop]
+            out[:, start:stop] = dots
+        return out[0] if single else out
+
+    def save(self, output_file_path):
+        """Write the matrix as an .npz file"""
+        arrays = {'values': self.values, 'precision': np.array(self.precision)}
+        if self.scales is not None:
+            arrays['scales'] = self.scales
+        np.savez(output_file_path, **arrays)
+
+    @classmethod
+    def load(cls, input_file_path):
+        """Read a matrix written by ``save``"""
+        with np.load(input_file_path, allow_pickle=False) as data:
+            return cls(data['values'], data['scales'] if 'scales' in data else None, str(data['precision']))
+
+
+def _selection_metrics(reference, selected):
+    """Agreement of two boolean selection matrices"""
+    union = np.logical_or(reference, selected).sum()
+    return {
+        'pairs_added': int(np.logical_and(selected, ~reference).sum()),
+        'pairs_removed': int(np.logical_and(reference, ~selected).sum()),
+        'processes_changed': int((reference != selected).any(axis=1).sum()),
+        'jaccard': round(float(np.logical_and(reference, selected).sum() / union), 6) if union else 1.0,
+    }
+
+
+def _top_n_agreement(reference_final, final, n):
+    """Share of processes whose best n components (by final score) are identical and in the same order"""
+    if len(final) == 0:
+        return 1.0
+    n = min(n, final.shape[1])
+    reference_top = np.argsort(-reference_final, axis=1, kind='stable')[:, :n]
+    top = np.argsort(-final, axis=1, kind='stable')[:, :n]
+    return round(float((reference_top == top).all(axis=1).mean()), 6)
+
+
+def accuracy_report(mapper, spill_dir, precisions=('float16', 'int8'), top_n=5):
+    """
+    Compare reduced-precision embedding scoring against full precision
+
+    Args:
+        mapper (EnhancedProcessBaukastenMapper): Mapper with float32 component embeddings
+        spill_dir (str): Directory for the full-precision per-signal matrices
+        precisions (tuple): Precisions to evaluate
+        top_n (int): Length of the ranked lists compared per process
+
+    Returns:
+        dict: Per precision: memory, embedding error, final score error, selection agreement
+    """
+    from what_if import WhatIfEvaluator
+
+    embeddings = mapper.component_embeddings
+    if not mapper.use_embeddings or embeddings is None:
+        raise ValueError("The accuracy report needs sentence embeddings (sentence_transformers not available)")
+    if embeddings.precision != 'float32':
+        raise ValueError("The accuracy report needs a mapper with embedding_precision='float32'")
+
+    mapper.map_processes_to_baukasten_scored(spill_dir=spill_dir)
+    evaluator = WhatIfEvaluator(spill_dir, hierarchy=mapper.subprocess_hierarchy)
+    reference_embedding = evaluator.signal_matrices['embedding']
+    reference_final = evaluator.recombine(evaluator.base_weights)
+    reference_selected = evaluator.select()
+
+    # Process embeddings for the store rows (same text as calculate_similarity)
+    # Rows keep their processes_df labels, so keywords come from the token table
+    process_rows = {int(row['Prozessnummer']): row
+                    for _, row in mapper.processes_df.drop_duplicates('Prozessnummer').iterrows()}
+    texts = [mapper.process_text(process_rows[int(p)], mapper.extract_keywords(process_rows[int(p)]))
+             for p in evaluator.process_ids]
+    process_embeddings = np.asarray(mapper.get_process_embeddings(texts), dtype=np.float32)
+    # calculate_embedding_similarity scores empty texts as 0
+    valid = np.outer([bool(t) for t in texts], [bool(t) for t in mapper.component_features.text])
+
+    full_vectors = embeddings.vectors()
+    report = {
+        'processes': len(evaluator.process_ids),
+        'components': len(evaluator.component_ids),
+        'dimensions': int(full_vectors.shape[1]),
+        'selected_pairs': int(reference_selected.sum()),
+        'precisions': {},
+    }
+    try:
+        for precision in ('float32',) + tuple(p for p in precisions if p != 'float32'):
+            quantized = QuantizedEmbeddings.from_float(full_vectors, precision)
+            similarity = np.where(valid, np.maximum(quantized.similarities(process_embeddings), 0.0), 0.0)
+            evaluator.signal_matrices['embedding'] = similarity
+            final = evaluator.recombine(evaluator.base_weights)
+            final_error = np.abs(final - reference_final)
+            report['precisions'][precision] = {
+                'bytes': quantized.nbytes,
+                'compression': round(embeddings.nbytes / quantized.nbytes, 2),
+                'embedding_max_abs_error': float(np.abs(similarity - reference_embedding).max(initial=0.0)),
+                'final_max_abs_error': float(final_error.max(initial=0.0)),
+                'final_mean_abs_error': float(final_error.mean()) if final_error.size else 0.0,
+                f'top_{top_n}_agreement': _top_n_agreement(reference_final, final, top_n),
+                **_selection_metrics(reference_selected, evaluator.select()),
+            }
+    finally:
+        evaluator.signal_matrices['embedding'] = reference_embedding
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy of float16/int8 embeddings against float32")
+    parser.add_argument('workbook', help="Workbook with Lösungsbibliothek and Baukasten sheets")
+    parser.add_argument('--spill-dir', default='scores_fp32', help="Directory for the full-precision matrices")
+    parser.add_argument('--precisions', nargs='+', choices=PRECISIONS[1:], default=list(PRECISIONS[1:]))
+    parser.add_argument('--output', default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    from enhanced_process_baukasten_mapper import EnhancedProcessBaukastenMapper
+    mapper = EnhancedProcessBaukastenMapper(args.workbook, embedding_precision='float32')
+    report = accuracy_report(mapper, args.spill_dir, tuple(args.precisions))
+
+    print("\n" + "=" * 60)
+    print(f"📐 {report['processes']} processes x {report['components']} components, "
+          f"{report['dimensions']} dimensions, {report['selected_pairs']} selected pairs at float32")
+    for precision, metrics in report['precisions'].items():
+        print(f"   {precision:>7}: {metrics['bytes']:>10} bytes ({metrics['compression']}x), "
+              f"final error max {metrics['final_max_abs_error']:.2e} / mean {metrics['final_mean_abs_error']:.2e}, "
+              f"+{metrics['pairs_added']} -{metrics['pairs_removed']} pairs, "
+              f"{metrics['processes_changed']} processes changed")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
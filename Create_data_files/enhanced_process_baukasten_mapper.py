@@ -14,46 +14,174 @@ import numpy as np
 from difflib import SequenceMatcher
 import re
 from collections import defaultdict
+import contextlib
+import hashlib
+import json
+import threading
 import warnings
+
+from component_features import FEATURE_FIELDS, ComponentFeatureTable
+from domain_rules import load_rules
+from embedding_backends import DEFAULT_MODEL as SENTENCE_MODEL_NAME, SentenceTransformer, load_backend
+from embedding_quantization import QuantizedEmbeddings
+from mapping_results import (DEFAULT_THRESHOLD_RULES, DEFAULT_WEIGHTS, CandidateHeap, MappingResult, ScoreStats,
+                             SIGNALS, apply_threshold_rule, min_threshold, select_top_k)
+from score_memo import MEMO_VERSION, ScoreMemo
+from score_store import ScoreStore, attribute_columns
+from text_normalization import ProcessTokenTable
 warnings.filterwarnings('ignore')
 
-# Enhanced NLP imports
-try:
-    from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
-    ADVANCED_NLP_AVAILABLE = True
+# Enhanced NLP availability (other backends: see embedding_backends.py)
+ADVANCED_NLP_AVAILABLE = SentenceTransformer is not None
+if ADVANCED_NLP_AVAILABLE:
     print("Advanced NLP capabilities loaded (SentenceTransformers)")
-except ImportError:
-    ADVANCED_NLP_AVAILABLE = False
+else:
     print("Using enhanced similarity without embeddings (still very effective!)")
 
+# Load schema: only the columns scoring and the result export read are kept in memory
+# (Notizen, Hinweise, Ablageort ..., Eigenschaft/Wert are dropped at load time)
+PROCESS_COLUMNS = ('Prozessnummer', 'Prozessname', 'Prozessart', 'Merkmalsklasse 1', 'Merkmalsklasse 2',
+                   'Merkmalsklasse 3', 'Randbedingung 1', 'Randbedingung 2', 'Verknüpfungen Prozessebene')
+BAUKASTEN_COLUMNS = ('Lfd. Nummer',) + FEATURE_FIELDS
+# Attributes indexed next to spilled score matrices (see score_query.py)
+PROCESS_ATTRIBUTE_COLUMNS = ('Prozessname', 'Prozessart', 'Merkmalsklasse 1', 'Merkmalsklasse 2',
+                             'Merkmalsklasse 3')
+# Low-cardinality columns stored as categoricals
+CATEGORICAL_COLUMNS = ('Prozessart', 'Bauteilkategorie', 'Hersteller')
+
+
+def read_library_sheet(excel_file_path, sheet_name, id_column, columns=None, categorical=CATEGORICAL_COLUMNS):
+    """
+    Read a library sheet (column names in its second row) with a compact schema
+    
+    Args:
+        excel_file_path (str): Workbook path
+        sheet_name (str): Sheet to read
+        id_column (str): Integer id column; rows without a numeric id are dropped
+        columns (iterable): Columns to keep (None keeps all)
+        categorical (iterable): Columns converted to categoricals
+        
+    Returns:
+        pd.DataFrame: Sheet with int64 ids, categoricals and only the requested columns
+    """
+    wanted = None if columns is None else set(columns) | {id_column}
+    df = pd.read_excel(excel_file_path, sheet_name=sheet_name, header=1,
+                       usecols=(lambda column: column in wanted) if wanted is not None else None)
+    # Drop empty rows and repeated header rows
+    ids = pd.to_numeric(df[id_column], errors='coerce')
+    df = df[ids.notna()].copy()
+    df[id_column] = ids[ids.notna()].astype('int64')
+    for column in categorical:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df.reset_index(drop=True)
+
+
+def load_sentence_model(embedding_backend=None):
+    """
+    Load the sentence encoder if available
+    
+    Args:
+        embedding_backend (EmbeddingBackend): Already loaded backend (see embedding_backends.py);
+            None loads the default SentenceTransformer when it is installed
+    
+    Returns:
+        tuple: (EmbeddingBackend or None, whether embeddings are used)
+    """
+    if embedding_backend is not None:
+        print(f"✅ Embedding backend: {embedding_backend.describe()}")
+        return embedding_backend, True
+    if ADVANCED_NLP_AVAILABLE:
+        try:
+            print("🔄 Loading sentence transformer model...")
+            embedding_backend = load_backend('sentence-transformers', SENTENCE_MODEL_NAME)
+            print("✅ Sentence transformer loaded successfully")
+            return embedding_backend, True
+        except Exception as e:
+            print(f"⚠️ Could not load sentence transformer: {e}")
+            return None, False
+    print("📝 Enhanced algorithm with advanced similarity metrics (no embeddings)")
+    return None, False
+
+
+class SharedBaukastenState:
+    """
+    Loaded embedding backend plus the preprocessed Baukasten, rule hits and component
+    embeddings, shared read-only by several mappers (see batch_mapping.py)
+    """
+    
+    __slots__ = ('embedding_backend', 'use_embeddings', 'encode_lock', 'rules', 'rule_hits',
+                 'baukasten_df', 'baukasten_source', 'component_features', 'component_embeddings')
+    
+    def __init__(self, mapper):
+        """
+        Args:
+            mapper (EnhancedProcessBaukastenMapper): Mapper whose Baukasten state is shared
+        """
+        self.embedding_backend = mapper.embedding_backend
+        self.use_embeddings = mapper.use_embeddings
+        self.encode_lock = threading.Lock()  # Serializes model calls across threads
+        self.rules = mapper.rules
+        self.rule_hits = mapper.rule_hits
+        self.baukasten_df = mapper.baukasten_df
+        self.baukasten_source = mapper.baukasten_source
+        self.component_features = mapper.component_features
+        self.component_embeddings = mapper.component_embeddings
+
+
 class EnhancedProcessBaukastenMapper:
-    def __init__(self, excel_file_path):
+    def __init__(self, excel_file_path, rules_path=None, shared_state=None,
+                 process_sheet='Lösungsbibliothek', embedding_precision='float32', embedding_backend=None):
         """
         Initialize the enhanced mapper with advanced NLP capabilities.
         
         Args:
             excel_file_path (str): Path to the Excel file with the data
+            rules_path (str): Optional domain/manufacturer rules file (defaults to domain_rules.json)
+            shared_state (SharedBaukastenState): Reuse an already loaded model and Baukasten
+                instead of loading them from this workbook
+            process_sheet (str): Name of the process library sheet
+            embedding_precision (str): Storage of the component embeddings: 'float32', 'float16'
+                or 'int8' (see embedding_quantization.py; taken from shared_state when given)
+            embedding_backend (EmbeddingBackend): Sentence encoder with its thread, batch and sequence
+                length settings (see embedding_backends.py); None loads the default SentenceTransformer
+                (taken from shared_state when given)
         """
         self.excel_file_path = excel_file_path
+        self.process_sheet = process_sheet
+        self.shared_state = shared_state
         self.processes_df = None
+        self.process_tokens = None  # ProcessTokenTable, built once in load_data
         self.baukasten_df = None
+        self.baukasten_source = None  # Workbook the Baukasten was loaded from
         self.matrix_df = None
         self.subprocess_hierarchy = {}  # Maps main processes to subprocesses
+        self.last_result = None  # MappingResult of the latest mapping run
+        
+        # Scoring configuration (see what_if.py for tuning without rescoring)
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.threshold_rules = dict(DEFAULT_THRESHOLD_RULES)
+        
+        # Domain and manufacturer rules, compiled once and evaluated per component in load_data
+        self.rules = shared_state.rules if shared_state is not None else load_rules(rules_path)
+        self.rule_hits = {}  # Rule section -> (components x rules) hit matrix
+        
+        # Per-component features and embeddings, built once in load_data
+        self.component_features = None
+        self.component_embeddings = None  # QuantizedEmbeddings, one row per feature row
+        self.embedding_precision = embedding_precision
+        self._process_embedding_cache = {}
+        self._similarity_row = (None, None)  # (process text, similarities to every component)
+        self._rule_score_rows = (None, {})  # (process keywords, {section: rule score per component})
         
         # Initialize sentence encoder if available
-        if ADVANCED_NLP_AVAILABLE:
-            try:
-                print("🔄 Loading sentence transformer model...")
-                self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-                print("✅ Sentence transformer loaded successfully")
-                self.use_embeddings = True
-            except Exception as e:
-                print(f"⚠️ Could not load sentence transformer: {e}")
-                self.use_embeddings = False
+        if shared_state is not None:
+            self.embedding_backend = shared_state.embedding_backend
+            self.use_embeddings = shared_state.use_embeddings
+            self._encode_lock = shared_state.encode_lock
         else:
-            self.use_embeddings = False
-            print("📝 Enhanced algorithm with advanced similarity metrics (no embeddings)")
+            self.embedding_backend, self.use_embeddings = load_sentence_model(embedding_backend)
+            self._encode_lock = contextlib.nullcontext()
             
         self.load_data()
         
@@ -61,32 +189,46 @@ class EnhancedProcessBaukastenMapper:
         """Load and clean data from all sheets with subprocess hierarchy"""
         print("Loading data from Excel file...")
         
-        # Load Lösungsbibliothek (Process Library)
-        df_losung_raw = pd.read_excel(self.excel_file_path, sheet_name='Lösungsbibliothek', header=None)
-        self.processes_df = df_losung_raw.iloc[1:].reset_index(drop=True)
-        self.processes_df.columns = df_losung_raw.iloc[1].tolist()
+        # Load Lösungsbibliothek (Process Library) with the compact load schema
+        self.processes_df = read_library_sheet(
+            self.excel_file_path, self.process_sheet, 'Prozessnummer', columns=PROCESS_COLUMNS
+        )
         print(self.processes_df.head())
-        self.processes_df = self.processes_df.dropna(subset=['Prozessnummer']).reset_index(drop=True)
         
-        # Clean process data - remove header row if it exists
-        if self.processes_df.iloc[0]['Prozessnummer'] == 'Prozessnummer':
-            self.processes_df = self.processes_df.iloc[1:].reset_index(drop=True)
+        # Normalize the process texts once, column-wise
+        self.process_tokens = ProcessTokenTable(self.processes_df)
         
         # Build subprocess hierarchy
         self._build_subprocess_hierarchy()
         
-        # Load Baukasten (Building Kit)
-        df_baukasten_raw = pd.read_excel(self.excel_file_path, sheet_name='Baukasten', header=None)
-        self.baukasten_df = df_baukasten_raw.iloc[1:].reset_index(drop=True)
-        self.baukasten_df.columns = df_baukasten_raw.iloc[1].tolist()
-        self.baukasten_df = self.baukasten_df.dropna(subset=['Lfd. Nummer']).reset_index(drop=True)
-        
-        # Clean baukasten data - remove header row if it exists
-        if str(self.baukasten_df.iloc[0]['Lfd. Nummer']) == 'Lfd. Nummer':
-            self.baukasten_df = self.baukasten_df.iloc[1:].reset_index(drop=True)
+        if self.shared_state is not None:
+            # Baukasten, features, rule hits and embeddings were prepared once for all mappers
+            self.baukasten_df = self.shared_state.baukasten_df
+            self.baukasten_source = self.shared_state.baukasten_source
+            self.component_features = self.shared_state.component_features
+            self.rule_hits = self.shared_state.rule_hits
+            self.component_embeddings = self.shared_state.component_embeddings
+            if self.component_embeddings is not None:
+                self.embedding_precision = self.component_embeddings.precision
+        else:
+            # Load Baukasten (Building Kit): feature fields plus the fields the rules read
+            rule_fields = {field for rule_set in self.rules.values() for field in rule_set.fields}
+            self.baukasten_df = read_library_sheet(
+                self.excel_file_path, 'Baukasten', 'Lfd. Nummer',
+                columns=BAUKASTEN_COLUMNS + tuple(sorted(rule_fields))
+            )
+            self.baukasten_source = self.excel_file_path
+            
+            # Normalize component fields, evaluate rules and embed components once
+            self._build_component_features()
         
-        # Load Matrix
-        self.matrix_df = pd.read_excel(self.excel_file_path, sheet_name='Bibliothek-Baukasten-Matrix', header=None)
+        # Load Matrix (plant libraries mapped in batch mode may not have one)
+        try:
+            self.matrix_df = pd.read_excel(self.excel_file_path, sheet_name='Bibliothek-Baukasten-Matrix', header=None)
+        except ValueError:
+            if self.shared_state is None:
+                raise
+            self.matrix_df = None
         
         print(f"Loaded {len(self.processes_df)} processes and {len(self.baukasten_df)} building kit elements")
         print(f"Built subprocess hierarchy with {len(self.subprocess_hierarchy)} main processes")
@@ -121,11 +263,50 @@ class EnhancedProcessBaukastenMapper:
                     except:
                         pass
     
+    def _build_component_features(self):
+        """Build the component feature table, rule hit matrices and component embeddings"""
+        rule_fields = {field for rule_set in self.rules.values() for field in rule_set.fields}
+        self.component_features = ComponentFeatureTable(
+            self.baukasten_df, extra_fields=sorted(rule_fields)
+        )
+        self._build_rule_hits()
+        
+        self.component_embeddings = None
+        self._process_embedding_cache = {}
+        self._similarity_row = (None, None)
+        self._rule_score_rows = (None, {})
+        if self.use_embeddings:
+            embeddings = self.get_process_embeddings(self.component_features.text)
+            if embeddings is not None:
+                self.component_embeddings = QuantizedEmbeddings.from_float(embeddings, self.embedding_precision)
+                self.component_features.embedding_row[:] = np.arange(len(self.component_features))
+    
+    def _build_rule_hits(self):
+        """Precompute the component x rule hit matrix for every rule section"""
+        features = self.component_features
+        component_field_texts = [features.field_texts(row_idx) for row_idx in range(len(features))]
+        self.rule_hits = {
+            name: rule_set.hit_matrix(component_field_texts)
+            for name, rule_set in self.rules.items()
+        }
+    
+    def _component_rule_hits(self, section, baukasten_row):
+        """Rule hits for one Baukasten row, read from the precomputed matrix when possible"""
+        row_idx = self.component_features.row_for(baukasten_row) if self.component_features else None
+        if row_idx is not None and section in self.rule_hits:
+            return self.rule_hits[section][row_idx]
+        
+        # Row not from baukasten_df: evaluate the rules directly
+        rule_set = self.rules[section]
+        return rule_set.row_hits({field: self.preprocess_text(baukasten_row.get(field, ''))
+                                  for field in rule_set.fields})
+    
     def get_process_embeddings(self, text_list):
-        """Generate embeddings for text using sentence transformers"""
+        """Generate embeddings for text with the embedding backend"""
         if self.use_embeddings and text_list:
             try:
-                embeddings = self.sentence_model.encode(text_list)
+                with self._encode_lock:
+                    embeddings = self.embedding_backend.encode(text_list)
                 return embeddings
             except Exception as e:
                 print(f"⚠️ Error generating embeddings: {e}")
@@ -161,6 +342,11 @@ class EnhancedProcessBaukastenMapper:
         Returns:
             list: List of keywords
         """
+        row_idx = self.process_tokens.row_for(process_row) if self.process_tokens else None
+        if row_idx is not None:
+            return list(self.process_tokens.keywords[row_idx])
+        
+        # Row not from processes_df: normalize its fields directly
         keywords = []
         
         # Extract from process name
@@ -187,13 +373,23 @@ class EnhancedProcessBaukastenMapper:
             
         return list(set(keywords))  # Remove duplicates
     
-    def calculate_embedding_similarity(self, process_text, baukasten_text):
+    def process_text(self, process_row, process_keywords):
+        """Process name plus sorted keywords, the text embedded for a process"""
+        row_idx = self.process_tokens.row_for(process_row) if self.process_tokens else None
+        if row_idx is not None:
+            process_name = self.process_tokens.names[row_idx]
+        else:
+            process_name = self.preprocess_text(process_row.get('Prozessname', ''))
+        return f"{process_name} {' '.join(sorted(process_keywords))}".strip()
+    
+    def calculate_embedding_similarity(self, process_text, baukasten_text, baukasten_idx=None):
         """
         Calculate semantic similarity using sentence embeddings
         
         Args:
             process_text (str): Combined process description
             baukasten_text (str): Combined building kit description
+            baukasten_idx (int): Optional feature row of the element, reuses its precomputed embedding
             
         Returns:
             float: Similarity score (0-1)
@@ -202,12 +398,33 @@ class EnhancedProcessBaukastenMapper:
             return 0.0
         
         try:
-            texts = [process_text, baukasten_text]
-            embeddings = self.get_process_embeddings(texts)
+            process_embedding = self._process_embedding_cache.get(process_text)
+            if process_embedding is None:
+                embeddings = self.get_process_embeddings([process_text])
+                if embeddings is None:
+                    return 0.0
+                process_embedding = np.asarray(embeddings[0], dtype=np.float32)
+                self._process_embedding_cache[process_text] = process_embedding
             
-            if embeddings is not None and len(embeddings) == 2:
-                similarity = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
-                return max(0.0, similarity)  # Ensure non-negative
+            embedding_row = -1
+            if baukasten_idx is not None and self.component_embeddings is not None:
+                embedding_row = self.component_features.embedding_row[baukasten_idx]
+            if embedding_row >= 0:
+                # One (float16/int8) dot product against all components per process text
+                cached_text, similarities = self._similarity_row
+                if cached_text != process_text:
+                    similarities = self.component_embeddings.similarities(process_embedding)
+                    self._similarity_row = (process_text, similarities)
+                return max(0.0, float(similarities[embedding_row]))
+
+            embeddings = self.get_process_embeddings([baukasten_text])
+            if embeddings is None:
+                return 0.0
+            baukasten_embedding = np.asarray(embeddings[0], dtype=np.float32)
+
+            norm = np.linalg.norm(process_embedding) * np.linalg.norm(baukasten_embedding)
+            similarity = float(np.dot(process_embedding, baukasten_embedding) / norm) if norm else 0.0
+            return max(0.0, similarity)  # Ensure non-negative
             
         except Exception as e:
             print(f"⚠️ Embedding similarity calculation failed: {e}")
@@ -226,20 +443,27 @@ class EnhancedProcessBaukastenMapper:
         Returns:
             dict: Detailed similarity breakdown
         """
-        # Extract building kit element information
-        bauteil_name = self.preprocess_text(baukasten_row.get('Bauteilnamen', ''))
-        kategorie = self.preprocess_text(baukasten_row.get('Bauteilkategorie', ''))
-        hersteller = self.preprocess_text(baukasten_row.get('Hersteller', ''))
-        typ = self.preprocess_text(baukasten_row.get('Typ', ''))
-        kurzbeschreibung = self.preprocess_text(baukasten_row.get('Kurzbeschreibung', ''))
-        
-        # Combine all baukasten information
-        baukasten_text = f"{bauteil_name} {kategorie} {hersteller} {typ} {kurzbeschreibung}".strip()
-        baukasten_words = baukasten_text.split()
+        # Extract building kit element information from the precomputed feature table
+        baukasten_idx = self.component_features.row_for(baukasten_row) if self.component_features else None
+        if baukasten_idx is not None:
+            fields = self.component_features.fields
+            bauteil_name = fields['Bauteilnamen'][baukasten_idx]
+            kategorie = fields['Bauteilkategorie'][baukasten_idx]
+            typ = fields['Typ'][baukasten_idx]
+            kurzbeschreibung = fields['Kurzbeschreibung'][baukasten_idx]
+            baukasten_text = self.component_features.text[baukasten_idx]
+        else:
+            bauteil_name = self.preprocess_text(baukasten_row.get('Bauteilnamen', ''))
+            kategorie = self.preprocess_text(baukasten_row.get('Bauteilkategorie', ''))
+            hersteller = self.preprocess_text(baukasten_row.get('Hersteller', ''))
+            typ = self.preprocess_text(baukasten_row.get('Typ', ''))
+            kurzbeschreibung = self.preprocess_text(baukasten_row.get('Kurzbeschreibung', ''))
+            
+            # Combine all baukasten information
+            baukasten_text = f"{bauteil_name} {kategorie} {hersteller} {typ} {kurzbeschreibung}".strip()
         
         # Combine process information for embedding similarity
-        process_name = self.preprocess_text(process_row.get('Prozessname', ''))
-        process_text = f"{process_name} {' '.join(process_keywords)}".strip()
+        process_text = self.process_text(process_row, process_keywords)
         
         similarity_scores = {}
         
@@ -261,7 +485,9 @@ class EnhancedProcessBaukastenMapper:
         similarity_scores['fuzzy'] = np.mean(fuzzy_scores) if fuzzy_scores else 0
         
         # 3. Semantic Embedding Similarity (NEW)
-        similarity_scores['embedding'] = self.calculate_embedding_similarity(process_text, baukasten_text)
+        similarity_scores['embedding'] = self.calculate_embedding_similarity(
+            process_text, baukasten_text, baukasten_idx
+        )
         
         # 4. Category-specific scoring
         similarity_scores['category'] = 0.5 if any(kw in kategorie for kw in process_keywords) else 0
@@ -273,14 +499,7 @@ class EnhancedProcessBaukastenMapper:
         similarity_scores['technical'] = self.calculate_technical_match_score(process_keywords, baukasten_row)
         
         # Weighted combination with adaptive weights
-        weights = {
-            'lexical': 1.0,
-            'fuzzy': 0.8,
-            'embedding': 1.2 if self.use_embeddings else 0.0,  # Higher weight for embeddings
-            'category': 1.0,
-            'domain': 1.5,  # Higher weight for domain knowledge
-            'technical': 0.6
-        }
+        weights = self.effective_weights()
         
         total_score = sum(weights[key] * similarity_scores[key] for key in similarity_scores)
         max_possible = sum(weights[key] for key in similarity_scores if key != 'embedding' or self.use_embeddings)
@@ -292,6 +511,36 @@ class EnhancedProcessBaukastenMapper:
         
         return similarity_scores
     
+    def effective_weights(self):
+        """Signal weights used for the final score (embedding weight is 0 without embeddings)"""
+        weights = dict(self.weights)
+        if not self.use_embeddings:
+            weights['embedding'] = 0.0
+        return weights
+    
+    def scoring_fingerprint(self):
+        """
+        Version of everything a process score depends on besides the process itself
+        
+        Returns:
+            str: Hex digest over Baukasten content, rules, weights, threshold rules and embedding setup
+        """
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(self.baukasten_df, index=False).values.tobytes())
+        config = {
+            'memo_version': MEMO_VERSION,
+            'baukasten_columns': list(self.baukasten_df.columns),
+            'rules': {name: {'combine': rule_set.combine, 'cap': rule_set.cap, 'options': rule_set.options,
+                             'rules': rule_set.rules}
+                      for name, rule_set in self.rules.items()},
+            'weights': self.effective_weights(),
+            'threshold_rules': self.threshold_rules,
+            'embeddings': ([self.embedding_backend.identity, self.embedding_precision]
+                           if self.use_embeddings else None),
+        }
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
     def calculate_enhanced_domain_score(self, process_keywords, baukasten_row):
         """
         Enhanced domain-specific similarity with expanded mappings
@@ -303,87 +552,10 @@ class EnhancedProcessBaukastenMapper:
         Returns:
             float: Domain-specific score
         """
-        score = 0
-        kategorie = self.preprocess_text(baukasten_row.get('Bauteilkategorie', ''))
-        bauteil_name = self.preprocess_text(baukasten_row.get('Bauteilnamen', ''))
-        
-        # Enhanced domain mappings
-        enhanced_domain_mappings = {
-            'drucken': {
-                'categories': ['drucker', 'etiketten', 'kennzeichnung', 'topex', 'label'],
-                'weight': 0.5
-            },
-            'applizieren': {
-                'categories': ['roboter', 'greifer', 'werkzeug', 'applikator', 'anbringen'],
-                'weight': 0.4
-            },
-            'greifen': {
-                'categories': ['roboter', 'greifer', 'werkzeug', 'kuka', 'ur'],
-                'weight': 0.4
-            },
-            'manipulieren': {
-                'categories': ['roboter', 'greifer', 'manipulator'],
-                'weight': 0.4
-            },
-            'erkennen': {
-                'categories': ['kamera', 'sensor', 'vision', 'scanner', 'sensopart'],
-                'weight': 0.4
-            },
-            'kontrollieren': {
-                'categories': ['sensor', 'prüf', 'mess', 'kontrolle'],
-                'weight': 0.3
-            },
-            'korrigieren': {
-                'categories': ['roboter', 'aktor', 'steuerung'],
-                'weight': 0.3
-            },
-            'bereitstellen': {
-                'categories': ['transport', 'förder', 'magazin', 'bereitstellung'],
-                'weight': 0.3
-            },
-            'zuführen': {
-                'categories': ['transport', 'förder', 'zuführung', 'magazin'],
-                'weight': 0.3
-            },
-            'prüfen': {
-                'categories': ['sensor', 'prüf', 'mess', 'kamera', 'test'],
-                'weight': 0.4
-            },
-            'palettieren': {
-                'categories': ['roboter', 'transport', 'palettierer', 'kuka'],
-                'weight': 0.4
-            },
-            'lesen': {
-                'categories': ['kamera', 'scanner', 'sensor', 'code', 'barcode'],
-                'weight': 0.3
-            },
-            'isolation': {
-                'categories': ['prüf', 'isolations', 'mess', 'elektrisch'],
-                'weight': 0.3
-            }
-        }
+        rule_set = self.rules['domain']
+        score = self._rule_score('domain', process_keywords, baukasten_row)
         
-        # Check for enhanced domain matches
-        for keyword in process_keywords:
-            if keyword in enhanced_domain_mappings:
-                mapping = enhanced_domain_mappings[keyword]
-                for category_hint in mapping['categories']:
-                    if category_hint in kategorie or category_hint in bauteil_name:
-                        score += mapping['weight']
-                        break
-        
-        # Special high-value matches
-        if 'etikett' in process_keywords:
-            if any(word in kategorie or word in bauteil_name 
-                   for word in ['drucker', 'etikett', 'applikator', 'topex']):
-                score += 0.6
-                
-        if any(robot_word in kategorie for robot_word in ['roboter']):
-            if any(word in process_keywords 
-                   for word in ['applizieren', 'greifen', 'manipulieren', 'palettieren', 'roboter']):
-                score += 0.4
-        
-        return min(score, 1.0)  # Cap at 1.0
+        return min(score, rule_set.cap)
     
     def calculate_technical_match_score(self, process_keywords, baukasten_row):
         """
@@ -396,30 +568,57 @@ class EnhancedProcessBaukastenMapper:
         Returns:
             float: Technical match score
         """
-        score = 0
-        hersteller = self.preprocess_text(baukasten_row.get('Hersteller', ''))
-        typ = self.preprocess_text(baukasten_row.get('Typ', ''))
-        
-        # Manufacturer-specific bonuses
-        manufacturer_bonuses = {
-            'kuka': ['roboter', 'greifen', 'applizieren', 'palettieren'],
-            'topex': ['drucken', 'etikett', 'kennzeichnung'],
-            'sensopart': ['erkennen', 'kamera', 'vision'],
-            'ifm': ['sensor', 'abstand', 'näherung'],
-            'siemens': ['steuerung', 'sps', 'automatisierung']
-        }
+        rule_set = self.rules['technical']
+        baukasten_idx = self.component_features.row_for(baukasten_row) if self.component_features else None
+        if baukasten_idx is not None:
+            typ = self.component_features.fields['Typ'][baukasten_idx]
+        else:
+            typ = self.preprocess_text(baukasten_row.get('Typ', ''))
         
-        for manufacturer, related_keywords in manufacturer_bonuses.items():
-            if manufacturer in hersteller:
-                if any(kw in process_keywords for kw in related_keywords):
-                    score += 0.3
-                    break
+        # Manufacturer-specific bonuses (at most one manufacturer rule counts)
+        score = self._rule_score('technical', process_keywords, baukasten_row)
         
         # Type-specific matches
         if any(kw in typ for kw in process_keywords):
-            score += 0.2
+            score += rule_set.options.get('type_match_weight', 0.2)
             
-        return min(score, 0.4)  # Cap technical score
+        return min(score, rule_set.cap)  # Cap technical score
+    
+    def calculate_rule_scores(self, process_keywords, section):
+        """
+        Vectorized rule score of one process against every Baukasten element
+        
+        Args:
+            process_keywords (list): Keywords from process
+            section (str): Rule section ('domain' or 'technical')
+            
+        Returns:
+            np.ndarray: Uncapped rule score per Baukasten row (without the type bonus)
+        """
+        rule_set = self.rules[section]
+        return rule_set.score(self.rule_hits[section], rule_set.rule_activation(process_keywords))
+    
+    def _rule_score(self, section, process_keywords, baukasten_row):
+        """
+        Uncapped rule score of one pair, read from the process's vectorized score row
+        
+        The activation and the scores against every component are computed once
+        per process (calculate_rule_scores); rows outside the feature table are
+        scored directly.
+        """
+        row_idx = self.component_features.row_for(baukasten_row) if self.component_features else None
+        rule_set = self.rules[section]
+        if row_idx is None or section not in self.rule_hits:
+            hits = self._component_rule_hits(section, baukasten_row)
+            return float(rule_set.score(hits, rule_set.rule_activation(process_keywords)))
+        
+        cached_keywords, rows = self._rule_score_rows
+        if cached_keywords != process_keywords:
+            rows = {}
+            self._rule_score_rows = (list(process_keywords), rows)
+        if section not in rows:
+            rows[section] = self.calculate_rule_scores(process_keywords, section)
+        return float(rows[section][row_idx])
     
     def get_adaptive_threshold(self, all_similarities):
         """
@@ -431,107 +630,276 @@ class EnhancedProcessBaukastenMapper:
         Returns:
             float: Adaptive threshold
         """
-        if not all_similarities:
-            return 0.1
+        # Use statistical approach for threshold: mean, std and max of the positive scores
+        scores = np.asarray(all_similarities, dtype=np.float64)
+        stats = ScoreStats()
+        stats.update_batch(scores[scores > 0])
+        return self.get_adaptive_threshold_from_stats(stats)
+    
+    def get_adaptive_threshold_from_stats(self, stats):
+        """
+        Adaptive threshold from running score statistics (same rules as get_adaptive_threshold)
+        
+        Args:
+            stats (ScoreStats): Running statistics of the positive scores
+            
+        Returns:
+            float: Adaptive threshold
+        """
+        if not stats.count:
+            return self.threshold_rules['low']
+        return self._threshold_rule(stats.mean, stats.std, stats.max)
+    
+    def _threshold_rule(self, mean_score, std_score, max_score):
+        """Threshold rules shared by the list and the running-statistics variants"""
+        # Adaptive threshold: higher if we have good matches, lower otherwise (capped at 0.3)
+        return apply_threshold_rule(mean_score, std_score, max_score, self.threshold_rules)
+    
+    def score_process(self, process_row, keywords=None, start=0, stop=None, candidates=None):
+        """
+        Score one process against every building kit element (or the rows [start, stop))
         
-        scores = [s for s in all_similarities if s > 0]
-        if not scores:
-            return 0.1
+        Args:
+            process_row: DataFrame row with full process information
+            keywords (list): Keywords of the process (extracted if None)
+            start (int): First Baukasten row to score
+            stop (int): End of the Baukasten rows to score (None for all)
+            candidates (set): Only score elements with these Lfd. Nummer (None scores all)
+            
+        Returns:
+            tuple: (Lfd. Nummer array, final score array, signal matrix (elements x SIGNALS))
+        """
+        if keywords is None:
+            keywords = self.extract_keywords(process_row)
         
-        # Use statistical approach for threshold
-        mean_score = np.mean(scores)
-        std_score = np.std(scores)
-        max_score = max(scores)
+        component_ids = []
+        final_scores = []
+        signal_scores = []
+        for lfd_nummer, similarity_breakdown in self._iter_similarities(process_row, keywords, start, stop,
+                                                                        candidates):
+            component_ids.append(lfd_nummer)
+            final_scores.append(similarity_breakdown['final'])
+            signal_scores.append([similarity_breakdown[signal] for signal in SIGNALS])
+        
+        return (
+            np.array(component_ids, dtype=np.int64),
+            np.array(final_scores, dtype=np.float64),
+            np.array(signal_scores, dtype=np.float32).reshape(-1, len(SIGNALS)),
+        )
+    
+    def _iter_similarities(self, process_row, keywords, start=0, stop=None, candidates=None):
+        """Yield (Lfd. Nummer, similarity breakdown) for the Baukasten rows [start, stop) in order"""
+        baukasten_rows = self.baukasten_df.iloc[start:stop]
+        if candidates is not None:
+            baukasten_rows = baukasten_rows[baukasten_rows['Lfd. Nummer'].isin(candidates)]
+        
+        for _, baukasten_row in baukasten_rows.iterrows():
+            lfd_nummer = baukasten_row['Lfd. Nummer']
+            if pd.isna(lfd_nummer):
+                continue
+            yield int(lfd_nummer), self.calculate_similarity(keywords, process_row, baukasten_row)
+    
+    def score_process_streaming(self, process_row, keywords, top_k=None, candidates=None):
+        """
+        Score one process in a single pass without materializing its score vector
         
-        # Adaptive threshold: higher if we have good matches, lower otherwise
-        if max_score > 0.7:
-            threshold = max(0.2, mean_score - 0.5 * std_score)
-        elif max_score > 0.4:
-            threshold = max(0.15, mean_score - 0.3 * std_score)
-        else:
-            threshold = 0.1
+        Each score updates the running mean/variance/max of the positive scores
+        and is offered to a candidate heap of the best top_k above min_threshold,
+        so the adaptive threshold and the matches are final after the pass. Without
+        top_k every candidate above min_threshold is kept, so memory then grows with
+        the number of such candidates.
         
-        return min(threshold, 0.3)  # Cap at 0.3 to avoid being too restrictive
+        Args:
+            process_row: DataFrame row with full process information
+            keywords (list): Keywords of the process
+            top_k (int): Maximum number of candidates kept (None keeps all above the minimum threshold)
+            candidates (set): Only score elements with these Lfd. Nummer (None scores all)
+            
+        Returns:
+            tuple: (candidate Lfd. Nummer, candidate scores, candidate signals, adaptive threshold)
+        """
+        stats = ScoreStats()
+        heap = CandidateHeap(min_threshold(self.threshold_rules), top_k)
+        for lfd_nummer, similarity_breakdown in self._iter_similarities(process_row, keywords,
+                                                                        candidates=candidates):
+            score = similarity_breakdown['final']
+            if score > 0:
+                stats.update(score)
+            heap.push(lfd_nummer, score, [similarity_breakdown[signal] for signal in SIGNALS])
+        
+        return (*heap.arrays(), self.get_adaptive_threshold_from_stats(stats))
     
-    def map_processes_to_baukasten_enhanced(self):
+    def score_process_blocked(self, process_row, keywords, tile_size, top_k=None, store=None,
+                              candidates=None):
         """
-        Enhanced mapping with subprocess support and adaptive thresholding
+        Score one process tile by tile, keeping only the threshold statistics and candidates
+        
+        Each tile is scored row by row (score_process); tiles only bound how many full
+        score rows exist at a time and are the unit spilled to a ScoreStore. Only scores
+        that can pass the adaptive threshold (never below min_threshold) are retained.
+        With top_k they are bounded to the best top_k; without top_k every candidate
+        above min_threshold is kept, so memory grows with their number.
         
+        Args:
+            process_row: DataFrame row with full process information
+            keywords (list): Keywords of the process
+            tile_size (int): Number of Baukasten rows scored per tile
+            top_k (int): Maximum number of candidates kept (None keeps all above the minimum threshold)
+            store (ScoreStore): Optional store the full tiles are spilled to
+            candidates (set): Only score elements with these Lfd. Nummer (None scores all)
+            
         Returns:
-            dict: Enhanced mapping with subprocess information
+            tuple: (candidate Lfd. Nummer, candidate scores, candidate signals, adaptive threshold)
+        """
+        stats = ScoreStats()
+        candidate_ids = np.zeros(0, dtype=np.int64)
+        candidate_scores = np.zeros(0, dtype=np.float64)
+        candidate_signals = np.zeros((0, len(SIGNALS)), dtype=np.float32)
+        store_row = store.row(process_row['Prozessnummer']) if store is not None else None
+        
+        for start in range(0, len(self.baukasten_df), tile_size):
+            component_ids, scores, signals = self.score_process(
+                process_row, keywords, start, start + tile_size, candidates
+            )
+            if store is not None:
+                store.write_tile(store_row, start, scores, signals)
+            
+            stats.update_batch(scores[scores > 0])
+            keep = scores >= min_threshold(self.threshold_rules)
+            candidate_ids = np.concatenate([candidate_ids, component_ids[keep]])
+            candidate_scores = np.concatenate([candidate_scores, scores[keep]])
+            candidate_signals = np.concatenate([candidate_signals, signals[keep]])
+            
+            if top_k is not None and len(candidate_scores) > top_k:
+                # Keep the best top_k in Baukasten order so ties resolve like a full sort
+                best = np.sort(select_top_k(candidate_scores, -np.inf, top_k))
+                candidate_ids = candidate_ids[best]
+                candidate_scores = candidate_scores[best]
+                candidate_signals = candidate_signals[best]
+        
+        return candidate_ids, candidate_scores, candidate_signals, self.get_adaptive_threshold_from_stats(stats)
+    
+    def map_processes_to_baukasten_scored(self, top_k=None, progress_callback=None, tile_size=None,
+                                          spill_dir=None, candidate_ids=None, score_memo=None):
+        """
+        Enhanced mapping with subprocess support, adaptive thresholding and retained scores
+        
+        Args:
+            top_k (int): Maximum number of matches kept per process (None keeps all above threshold)
+            progress_callback (callable): Called as progress_callback(done, total) after each
+                process row; raising from it aborts the run (used for cancellation)
+            tile_size (int): Score the Baukasten in tiles of this many rows, the unit written to
+                spill_dir (None scores each process in one streaming pass, see score_process_streaming)
+            spill_dir (str): Also write the full final and per-signal score matrices to memory-mapped
+                float32 files in this directory, with process and component attribute indexes
+                (see score_store.py, score_query.py and what_if.py)
+            candidate_ids (iterable): Pre-filter; only these Lfd. Nummer are scored, e.g. the
+                result of a property constraint (see property_index.py). None scores all.
+            score_memo (ScoreMemo or str): Memo of scoring results by keyword signature, or the
+                .npz path it is persisted to across runs (see score_memo.py). Without one,
+                processes with identical keywords are still scored once per run.
+            
+        Returns:
+            MappingResult: Ordered matches with final score and signal breakdown per process
         """
         print("🚀 Enhanced mapping with subprocess support and embeddings...")
         
-        all_mappings = {}
-        subprocess_mappings = {}
+        result = MappingResult(top_k=top_k)
+        
+        candidates = None
+        if candidate_ids is not None:
+            if spill_dir is not None:
+                raise ValueError("spill_dir stores full score matrices and cannot be combined with candidate_ids")
+            candidates = {int(c) for c in candidate_ids}
+            print(f"🔎 Pre-filter: scoring {len(candidates)} candidate elements")
+        
+        store = None
+        if spill_dir is not None:
+            tile_size = tile_size or len(self.baukasten_df)
+            valid = self.processes_df.dropna(subset=['Prozessnummer', 'Prozessname'])
+            valid = valid.drop_duplicates('Prozessnummer')  # Each process is scored once
+            store = ScoreStore.create(
+                spill_dir, valid['Prozessnummer'].astype(int), self.baukasten_df['Lfd. Nummer'].astype(int),
+                weights=self.effective_weights(),
+                process_attributes=attribute_columns(valid, PROCESS_ATTRIBUTE_COLUMNS),
+                component_attributes=attribute_columns(self.baukasten_df, FEATURE_FIELDS),
+            )
+        
+        # Spilling needs every full score row, so the memo only applies without it
+        memo = None
+        if store is None:
+            fingerprint = self.scoring_fingerprint()
+            memo = score_memo if isinstance(score_memo, ScoreMemo) else ScoreMemo(fingerprint, score_memo)
+            if memo.config_version != fingerprint:
+                raise ValueError("score_memo was created for a different Baukasten or scoring configuration")
+            variant = f"tiles:{top_k}" if tile_size is not None else f"stream:{top_k}"
+            if candidates is not None:
+                variant += ':' + hashlib.sha256(','.join(map(str, sorted(candidates))).encode()).hexdigest()[:16]
+            embeds = self.effective_weights()['embedding'] > 0
+        
+        def map_process(process_num, process_row, keywords):
+            """Score, threshold and store one process (each process is scored once per run)"""
+            if process_num in result:
+                return result.matches(process_num)
+            
+            memo_key = None
+            if memo is not None:
+                memo_key = memo.key(keywords, self.process_text(process_row, keywords) if embeds else None, variant)
+                cached = memo.get(memo_key)
+                if cached is not None:
+                    # Same keywords as an already scored process: no sweep over the Baukasten
+                    result.add(process_num, *cached)
+                    return result.matches(process_num)
+            
+            if tile_size is not None:
+                component_ids, scores, signals, adaptive_threshold = self.score_process_blocked(
+                    process_row, keywords, tile_size, top_k, store, candidates
+                )
+            else:
+                component_ids, scores, signals, adaptive_threshold = self.score_process_streaming(
+                    process_row, keywords, top_k, candidates
+                )
+            if memo_key is not None:
+                memo.put(memo_key, component_ids, scores, signals, adaptive_threshold)
+            result.add(process_num, component_ids, scores, signals, adaptive_threshold)
+            return result.matches(process_num)
         
-        for _, process_row in self.processes_df.iterrows():
+        total_rows = len(self.processes_df)
+        for row_number, (_, process_row) in enumerate(self.processes_df.iterrows(), 1):
             process_num = process_row['Prozessnummer']
             process_name = process_row['Prozessname']
             process_type = process_row.get('Prozessart', '')
             
             if pd.isna(process_num) or pd.isna(process_name):
+                if progress_callback:
+                    progress_callback(row_number, total_rows)
                 continue
                 
             print(f"\n🔄 Processing: {process_num} - {process_name} ({process_type})")
             
             # Extract keywords from process
             keywords = self.extract_keywords(process_row)
-            
-            # Calculate similarity with all building kit elements
-            similarities = []
-            detailed_similarities = []
-            
-            for _, baukasten_row in self.baukasten_df.iterrows():
-                lfd_nummer = baukasten_row['Lfd. Nummer']
-                if pd.isna(lfd_nummer):
-                    continue
-                    
-                similarity_breakdown = self.calculate_similarity(keywords, process_row, baukasten_row)
-                final_score = similarity_breakdown['final']
-                
-                similarities.append(final_score)
-                detailed_similarities.append({
-                    'lfd_nummer': int(lfd_nummer),
-                    'name': baukasten_row['Bauteilnamen'],
-                    'score': final_score,
-                    'breakdown': similarity_breakdown
-                })
-            
-            # Calculate adaptive threshold
-            adaptive_threshold = self.get_adaptive_threshold(similarities)
-            print(f"   Adaptive threshold: {adaptive_threshold:.3f}")
-            
-            # Filter good matches using adaptive threshold
-            good_matches = [
-                match for match in detailed_similarities 
-                if match['score'] >= adaptive_threshold
-            ]
-            
-            # Sort by score
-            good_matches.sort(key=lambda x: x['score'], reverse=True)
-            
-            # Store main process mappings
-            main_process_baukasten = [match['lfd_nummer'] for match in good_matches]
-            all_mappings[int(process_num)] = main_process_baukasten
+            matches = map_process(int(process_num), process_row, keywords)
+            print(f"   Adaptive threshold: {matches['threshold']:.3f}")
             
             # Print results
+            embed_col, domain_col = SIGNALS.index('embedding'), SIGNALS.index('domain')
             print(f"   Keywords: {keywords}")
-            print(f"   Found {len(good_matches)} good matches:")
-            for i, match in enumerate(good_matches[:5]):  # Show top 5
-                embed_score = match['breakdown'].get('embedding', 0)
-                domain_score = match['breakdown'].get('domain', 0)
-                print(f"    {i+1}. {match['lfd_nummer']} - {match['name']}")
-                print(f"       Score: {match['score']:.3f} (embed: {embed_score:.2f}, domain: {domain_score:.2f})")
+            print(f"   Found {len(matches['ids'])} good matches:")
+            for i in range(min(5, len(matches['ids']))):  # Show top 5
+                lfd_nummer = int(matches['ids'][i])
+                name = self.baukasten_df.loc[
+                    self.baukasten_df['Lfd. Nummer'] == lfd_nummer, 'Bauteilnamen'
+                ].iloc[0]
+                print(f"    {i+1}. {lfd_nummer} - {name}")
+                print(f"       Score: {matches['final'][i]:.3f} "
+                      f"(embed: {matches['signals'][i, embed_col]:.2f}, domain: {matches['signals'][i, domain_col]:.2f})")
             
             # Handle subprocess mappings for main processes
             if process_type == 'Hauptprozess' and int(process_num) in self.subprocess_hierarchy:
                 subprocess_nums = self.subprocess_hierarchy[int(process_num)]
                 print(f"   🔗 Processing subprocesses: {subprocess_nums}")
                 
-                # Collect building kit elements from all subprocesses
-                combined_subprocess_baukasten = set(main_process_baukasten)  # Start with main process
-                
                 for subprocess_num in subprocess_nums:
                     subprocess_row = self.processes_df[
                         self.processes_df['Prozessnummer'] == subprocess_num
@@ -543,49 +911,40 @@ class EnhancedProcessBaukastenMapper:
                         
                         print(f"     └─ Subprocess {subprocess_num}: {subprocess_name}")
                         
-                        # Calculate similarities for subprocess
-                        subprocess_similarities = []
-                        subprocess_detailed = []
-                        
-                        for _, baukasten_row in self.baukasten_df.iterrows():
-                            lfd_nummer = baukasten_row['Lfd. Nummer']
-                            if pd.isna(lfd_nummer):
-                                continue
-                                
-                            similarity_breakdown = self.calculate_similarity(
-                                subprocess_keywords, subprocess_row.iloc[0], baukasten_row
-                            )
-                            final_score = similarity_breakdown['final']
-                            
-                            subprocess_similarities.append(final_score)
-                            subprocess_detailed.append({
-                                'lfd_nummer': int(lfd_nummer),
-                                'name': baukasten_row['Bauteilnamen'],
-                                'score': final_score
-                            })
-                        
-                        # Get good matches for subprocess
-                        subprocess_threshold = self.get_adaptive_threshold(subprocess_similarities)
-                        subprocess_good = [
-                            match for match in subprocess_detailed 
-                            if match['score'] >= subprocess_threshold
-                        ]
-                        subprocess_good.sort(key=lambda x: x['score'], reverse=True)
-                        
-                        # Add to combined set
-                        subprocess_baukasten = [match['lfd_nummer'] for match in subprocess_good]
-                        combined_subprocess_baukasten.update(subprocess_baukasten)
-                        
-                        # Store individual subprocess mapping
-                        all_mappings[int(subprocess_num)] = subprocess_baukasten
-                        
-                        print(f"        Found {len(subprocess_good)} matches for subprocess")
+                        subprocess_matches = map_process(
+                            int(subprocess_num), subprocess_row.iloc[0], subprocess_keywords
+                        )
+                        print(f"        Found {len(subprocess_matches['ids'])} matches for subprocess")
                 
-                # Update main process with combined baukasten elements
-                all_mappings[int(process_num)] = list(combined_subprocess_baukasten)
-                print(f"   📦 Combined baukasten elements: {len(combined_subprocess_baukasten)}")
+                # Update main process with combined baukasten elements, best score first (top_k bounded)
+                combined = result.combine(int(process_num), subprocess_nums)
+                print(f"   📦 Combined baukasten elements: {len(combined)}")
+            
+            if progress_callback:
+                progress_callback(row_number, total_rows)
+        
+        if store is not None:
+            store.flush()
+        if memo is not None:
+            memo.save()
+            print(f"\n🧠 Score memo: {memo.hits} hits, {memo.misses} misses ({len(memo)} entries)")
+        self.last_result = result
+        return result
+    
+    def map_processes_to_baukasten_enhanced(self, top_k=None, candidate_ids=None, score_memo=None):
+        """
+        Enhanced mapping with subprocess support and adaptive thresholding
         
-        return all_mappings
+        Args:
+            top_k (int): Maximum number of matches kept per process (None keeps all above threshold)
+            candidate_ids (iterable): Optional Lfd. Nummer pre-filter
+            score_memo (ScoreMemo or str): Optional persistent score memo (see score_memo.py)
+            
+        Returns:
+            dict: Enhanced mapping with subprocess information
+        """
+        return self.map_processes_to_baukasten_scored(top_k=top_k, candidate_ids=candidate_ids,
+                                                      score_memo=score_memo).to_mappings()
     
     def create_enhanced_filled_matrix(self, mappings):
         """
@@ -647,9 +1006,13 @@ class EnhancedProcessBaukastenMapper:
         
         # Create Excel writer
         with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
-            # Save original sheets
-            self.processes_df.to_excel(writer, sheet_name='Lösungsbibliothek', index=False)
-            self.baukasten_df.to_excel(writer, sheet_name='Baukasten', index=False)
+            # Save original sheets (re-read with all columns, the loaded frames are pruned)
+            read_library_sheet(self.excel_file_path, self.process_sheet, 'Prozessnummer', categorical=()).to_excel(
+                writer, sheet_name='Lösungsbibliothek', index=False
+            )
+            read_library_sheet(self.baukasten_source, 'Baukasten', 'Lfd. Nummer', categorical=()).to_excel(
+                writer, sheet_name='Baukasten', index=False
+            )
             
             # Save original matrix structure for reference
             pd.DataFrame(self.matrix_df.values).to_excel(
@@ -755,10 +1118,13 @@ def main():
     mapper = EnhancedProcessBaukastenMapper('Challenge 2_Bibliothek und Baukasten.xlsx')
     
     # Perform enhanced mapping
-    mappings = mapper.map_processes_to_baukasten_enhanced()
+    # Scores of unchanged processes are reused from the previous run
+    result = mapper.map_processes_to_baukasten_scored(score_memo='score_memo.npz')
+    mappings = result.to_mappings()
     
     # Save enhanced results
     mapper.save_enhanced_results(mappings, 'Enhanced_Challenge_2_Results.xlsx')
+    result.save('enhanced_results.npz')
     
     print("\n" + "=" * 60)
     print("🎉 ENHANCED MAPPING COMPLETED!")
@@ -787,6 +1153,7 @@ def main():
     print(f"\n📁 Results saved to: 'Enhanced_Challenge_2_Results.xlsx'")
     print("   └─ Enhanced-Filled-Matrix sheet contains the main deliverable")
     print("   └─ Additional analysis sheets for validation")
+    print("   └─ Scores and signal breakdown: 'enhanced_results.npz'")
     
     return mappings
 
@@ -0,0 +1,297 @@
+"""
+Diff and drift report between two mapping runs.
+
+Loads two mapping results (enhanced_matrix.json, enhanced_results.npz or the
+Enhanced-Filled-Matrix sheet of a results workbook) into a flat columnar form
+and compares them in one pass of numpy set operations:
+
+    - per process: added and removed Bauteile, Bauteile whose order among the
+      kept ones changed, Jaccard overlap and the Spearman rank correlation of
+      the kept Bauteile
+    - overall: process and pair churn, mean Jaccard and Spearman and, when both
+      sides carry scores, the score drift of the kept pairs
+
+Every (process, Bauteil) pair becomes one int64 key, so the cost is a few sorts
+over the pairs of both runs, independent of how the processes are distributed.
+The report is compact JSON: the summary plus the most changed processes.
+
+Usage:
+    python mapping_diff.py old/enhanced_matrix.json new/enhanced_results.npz --output mapping_diff.json
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LIMIT = 50  # Processes listed in detail
+
+
+class MappingTable:
+    """Ordered process -> Bauteil mapping in CSR layout (like MappingResult.save)"""
+
+    __slots__ = ('process_ids', 'offsets', 'component_ids', 'scores')
+
+    def __init__(self, process_ids, offsets, component_ids, scores=None):
+        """
+        Args:
+            process_ids (np.ndarray): Prozessnummer per process
+            offsets (np.ndarray): Start of each process's Bauteile, plus the total at the end
+            component_ids (np.ndarray): Lfd. Nummer, best match first within each process
+            scores (np.ndarray): Final score per pair (None when the source has no scores)
+        """
+        self.process_ids = np.asarray(process_ids, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.component_ids = np.asarray(component_ids, dtype=np.int64)
+        self.scores = None if scores is None else np.asarray(scores, dtype=np.float64)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Table of a {Prozessnummer: [Lfd. Nummer, ...]} dict (enhanced_matrix.json content)"""
+        process_ids = [int(p) for p in mapping]
+        counts = [len(ids) for ids in mapping.values()]
+        component_ids = [int(c) for ids in mapping.values() for c in ids]
+        return cls(process_ids, np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]), component_ids)
+
+    @classmethod
+    def from_result(cls, result):
+        """Table of a MappingResult, with its final scores"""
+        process_ids = result.process_numbers()
+        matches = [result.matches(p) for p in process_ids]
+        counts = [len(m['ids']) for m in matches]
+        if not matches:
+            return cls([], [0], [], [])
+        return cls(process_ids, np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]),
+                   np.concatenate([m['ids'] for m in matches]), np.concatenate([m['final'] for m in matches]))
+
+    @classmethod
+    def load(cls, path, sheet_name='Enhanced-Filled-Matrix'):
+        """
+        Load a mapping run
+
+        Args:
+            path (str): enhanced_matrix.json, enhanced_results.npz or a results workbook
+            sheet_name (str): Matrix sheet for workbooks
+
+        Returns:
+            MappingTable: Loaded mapping
+        """
+        if path.endswith('.npz'):
+            with np.load(path, allow_pickle=False) as data:
+                return cls(data['process_ids'], data['offsets'], data['component_ids'], data['final'])
+        if path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_mapping(json.load(f))
+
+        # Filled matrix: Prozessnummer in row 1, mapped Bauteile from row 3 down (see create_enhanced_filled_matrix)
+        matrix_df = pd.read_excel(path, sheet_name=sheet_name, header=None)
+        mapping = {}
+        for col in range(1, matrix_df.shape[1]):
+            process_num = matrix_df.iloc[1, col]
+            if pd.isna(process_num):
+                continue
+            mapping[int(process_num)] = [int(v) for v in matrix_df.iloc[3:, col]
+                                         if pd.notna(v) and str(v).strip() != '']
+        return cls.from_mapping(mapping)
+
+    def __len__(self):
+        return len(self.process_ids)
+
+    def pairs(self, process_index):
+        """
+        Flat pairs
+
+        Args:
+            process_index (np.ndarray): Index per entry of process_ids
+
+        Returns:
+            tuple: (process index, rank within the process) per pair
+        """
+        counts = np.diff(self.offsets)
+        ranks = np.arange(len(self.component_ids), dtype=np.int64) - np.repeat(self.offsets[:-1], counts)
+        return np.repeat(process_index, counts), ranks
+
+
+def _group_ranks(groups, order_key):
+    """Rank (0-based) of every element within its group, ordered by order_key"""
+    order = np.lexsort((order_key, groups))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]) if len(order) else order
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - group_start
+    return ranks
+
+
+def _split(process_idx, values, order_key, listed):
+    """{process index: values ordered by order_key} for the listed process indices"""
+    keep = np.isin(process_idx, listed)
+    process_idx, values, order_key = process_idx[keep], values[keep], order_key[keep]
+    order = np.lexsort((order_key, process_idx))
+    bounds = np.searchsorted(process_idx[order], np.r_[listed, listed + 1])
+    values = values[order]
+    return {i: values[lo:hi] for i, lo, hi in zip(listed, bounds[:len(listed)], bounds[len(listed):])}
+
+
+def _mean(values):
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 6) if len(values) else None
+
+
+def diff_mappings(old, new, limit=DEFAULT_LIMIT):
+    """
+    Compare two mapping runs
+
+    Args:
+        old (MappingTable): Reference run
+        new (MappingTable): Compared run
+        limit (int): Number of most changed processes listed in detail (None for all)
+
+    Returns:
+        dict: {"summary": {...}, "processes": [...]} (see module docstring)
+    """
+    processes = np.union1d(old.process_ids, new.process_ids)
+    components, component_idx = np.unique(np.concatenate([old.component_ids, new.component_ids]),
+                                          return_inverse=True)
+    n_processes, n_components = len(processes), max(len(components), 1)
+
+    def keyed(table, component_idx):
+        process_idx, ranks = table.pairs(np.searchsorted(processes, table.process_ids))
+        keys = process_idx * n_components + component_idx
+        # A Bauteil listed twice for one process counts once, at its best rank
+        keys, first = np.unique(keys, return_index=True)
+        return keys, process_idx[first], ranks[first], first
+
+    old_keys, old_proc, old_rank, old_pos = keyed(old, component_idx[:len(old.component_ids)])
+    new_keys, new_proc, new_rank, new_pos = keyed(new, component_idx[len(old.component_ids):])
+    _, old_kept, new_kept = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+    removed = np.ones(len(old_keys), dtype=bool)
+    removed[old_kept] = False
+    added = np.ones(len(new_keys), dtype=bool)
+    added[new_kept] = False
+
+    # Order of the kept Bauteile among themselves, before and after
+    kept_proc = old_proc[old_kept]
+    kept_old_rank = _group_ranks(kept_proc, old_rank[old_kept])
+    kept_new_rank = _group_ranks(kept_proc, new_rank[new_kept])
+    reranked = kept_old_rank != kept_new_rank
+
+    n_old = np.bincount(old_proc, minlength=n_processes)
+    n_new = np.bincount(new_proc, minlength=n_processes)
+    n_kept = np.bincount(kept_proc, minlength=n_processes)
+    n_added = np.bincount(new_proc[added], minlength=n_processes)
+    n_removed = np.bincount(old_proc[removed], minlength=n_processes)
+    n_reranked = np.bincount(kept_proc[reranked], minlength=n_processes)
+
+    union = n_old + n_new - n_kept
+    jaccard = np.divide(n_kept, union, out=np.ones(n_processes), where=union > 0)
+    # Spearman over the kept Bauteile (undefined below two)
+    d2 = np.bincount(kept_proc, weights=(kept_old_rank - kept_new_rank) ** 2.0, minlength=n_processes)
+    n = n_kept.astype(np.float64)
+    spearman = np.full(n_processes, np.nan)
+    defined = n_kept >= 2
+    spearman[defined] = 1.0 - 6.0 * d2[defined] / (n[defined] * (n[defined] ** 2 - 1.0))
+
+    in_old = np.isin(processes, old.process_ids)
+    in_new = np.isin(processes, new.process_ids)
+    changed = (n_added + n_removed + n_reranked) > 0
+    changed |= in_old != in_new
+
+    summary = {
+        'processes': {
+            'old': int(in_old.sum()),
+            'new': int(in_new.sum()),
+            'added': int((in_new & ~in_old).sum()),
+            'removed': int((in_old & ~in_new).sum()),
+            'changed': int(changed.sum()),
+        },
+        'pairs': {
+            'old': len(old_keys),
+            'new': len(new_keys),
+            'added': int(added.sum()),
+            'removed': int(removed.sum()),
+            'kept': len(old_kept),
+            'reranked': int(reranked.sum()),
+        },
+        'churn': round(float((added.sum() + removed.sum()) / max(len(old_keys) + len(new_keys), 1)), 6),
+        'jaccard_mean': _mean(jaccard[in_old & in_new]),
+        'spearman_mean': _mean(spearman[in_old & in_new]),
+    }
+
+    score_delta = None
+    if old.scores is not None and new.scores is not None:
+        score_delta = new.scores[new_pos[new_kept]] - old.scores[old_pos[old_kept]]
+        summary['score_drift'] = {
+            'mean_abs': round(float(np.abs(score_delta).mean()), 6) if len(score_delta) else 0.0,
+            'max_abs': round(float(np.abs(score_delta).max(initial=0.0)), 6),
+            'mean': round(float(score_delta.mean()), 6) if len(score_delta) else 0.0,
+        }
+
+    # Most changed processes first (Bauteile added + removed + re-ranked), ties by Prozessnummer
+    churn = n_added + n_removed + n_reranked
+    listed = np.flatnonzero(changed)
+    listed = listed[np.lexsort((processes[listed], -churn[listed]))][:limit]
+    details = []
+    if len(listed):
+        # Bauteile in the order of the run they appear in; re-ranked ones as [id, old rank, new rank]
+        added_ids = _split(new_proc[added], components[new_keys[added] % n_components], new_rank[added], listed)
+        removed_ids = _split(old_proc[removed], components[old_keys[removed] % n_components], old_rank[removed],
+                             listed)
+        moves = np.column_stack([components[old_keys[old_kept] % n_components],
+                                 old_rank[old_kept], new_rank[new_kept]])[reranked]
+        moved = _split(kept_proc[reranked], moves, moves[:, 2], listed)
+    for i in listed:
+        details.append({
+            'process': int(processes[i]),
+            'status': 'added' if not in_old[i] else 'removed' if not in_new[i] else 'changed',
+            'old': int(n_old[i]),
+            'new': int(n_new[i]),
+            'added': added_ids[i].tolist(),
+            'removed': removed_ids[i].tolist(),
+            'reranked': moved[i].tolist(),
+            'jaccard': round(float(jaccard[i]), 6),
+            'spearman': None if np.isnan(spearman[i]) else round(float(spearman[i]), 6),
+        })
+
+    return {'summary': summary, 'processes': details}
+
+
+def diff_files(old_path, new_path, limit=DEFAULT_LIMIT, sheet_name='Enhanced-Filled-Matrix'):
+    """diff_mappings of two files (see MappingTable.load), labeled with their paths"""
+    report = diff_mappings(MappingTable.load(old_path, sheet_name), MappingTable.load(new_path, sheet_name), limit)
+    return {'old': old_path, 'new': new_path, **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two mapping runs")
+    parser.add_argument('old', help="enhanced_matrix.json, enhanced_results.npz or results workbook")
+    parser.add_argument('new', help="enhanced_matrix.json, enhanced_results.npz or results workbook")
+    parser.add_argument('--sheet', default='Enhanced-Filled-Matrix', help="Matrix sheet for workbooks")
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help="Processes listed in detail")
+    parser.add_argument('--output', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    report = diff_files(args.old, args.new, args.limit, args.sheet)
+    summary = report['summary']
+    print(f"📊 Processes: {summary['processes']['old']} -> {summary['processes']['new']} "
+          f"(+{summary['processes']['added']} -{summary['processes']['removed']}, "
+          f"{summary['processes']['changed']} changed)")
+    print(f"🔗 Pairs: {summary['pairs']['old']} -> {summary['pairs']['new']} "
+          f"(+{summary['pairs']['added']} -{summary['pairs']['removed']}, {summary['pairs']['reranked']} re-ranked), "
+          f"churn {summary['churn']:.1%}")
+    print(f"📈 Mean Jaccard {summary['jaccard_mean']}, mean Spearman {summary['spearman_mean']}")
+    if 'score_drift' in summary:
+        drift = summary['score_drift']
+        print(f"🎯 Score drift: mean |Δ| {drift['mean_abs']}, max |Δ| {drift['max_abs']}")
+    for entry in report['processes'][:10]:
+        print(f"   {entry['process']}: +{len(entry['added'])} -{len(entry['removed'])}, "
+              f"{len(entry['reranked'])} re-ranked, Jaccard {entry['jaccard']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, separators=(',', ':'))
+        print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""
+Asynchronous job queue for mapping runs.
+
+Mapping jobs (a workbook path plus parameters) are accepted by an asyncio
+JobRunner, executed in a bounded worker pool with progress reporting and
+cooperative cancellation, and their hierarchy data is published atomically to
+the directory ``process_data.py`` serves from:
+
+    <data_dir>/releases/<job id>/{process_data,component_data,hauptprozess_map,enhanced_matrix}.json
+    <data_dir>/current -> releases/<job id>      (swapped with a single rename)
+
+Every release also gets mapping_diff.json, the drift report against the data
+it replaces (see mapping_diff.py); its summary is part of the job status.
+
+Submissions with the same input hash (workbook bytes + parameters) are
+deduplicated while a matching job is queued, running or is the current release.
+
+Over HTTP a job maps either a workbook uploaded as the request body or one
+named relative to the workbook directory (``<data_dir>/workbooks`` unless
+``--workbook-dir`` is given); paths outside that directory are rejected.
+Uploads are stored under ``<workbook dir>/uploads/<sha256>.xlsx``.
+
+Scoring is Python-bound and holds the GIL, so the default thread pool runs one
+mapping at a time however many workers it has. ``--executor process`` maps
+jobs in forked worker processes instead (Linux), which inherit the shared
+Baukasten state; their progress and cancellation go through a
+multiprocessing manager.
+
+Usage (JSON over HTTP on localhost, proxied by server.js under /api/jobs):
+    python mapping_jobs.py --data-dir .. --port 5001
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+from create_data_json import excel_to_json, hauptprozess_to_json
+from enhanced_process_baukasten_mapper import EnhancedProcessBaukastenMapper, SharedBaukastenState
+from mapping_diff import MappingTable, diff_mappings
+
+DEFAULT_DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Shared state inherited by forked worker processes
+_WORKER_STATE = None
+
+
+class MappingCancelled(Exception):
+    """Raised inside a running mapping when its job was cancelled"""
+
+
+def resolve_workbook(workbook_dir, name):
+    """
+    Path of a workbook named relative to the workbook directory
+
+    Args:
+        workbook_dir (str): Directory jobs may read workbooks from
+        name (str): Workbook path relative to workbook_dir
+
+    Returns:
+        str: Resolved path (symlinks followed)
+
+    Raises:
+        ValueError: When the name resolves to a path outside workbook_dir
+    """
+    root = os.path.realpath(workbook_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"workbook must be a file inside the workbook directory: {name}")
+    return path
+
+
+def store_upload(workbook_dir, data):
+    """
+    Write uploaded workbook bytes to <workbook_dir>/uploads/<sha256>.xlsx
+
+    Identical uploads share one file, so resubmitting a workbook deduplicates
+    against the job that already maps it.
+
+    Returns:
+        str: Path of the stored workbook
+    """
+    upload_dir = os.path.join(workbook_dir, 'uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f'{hashlib.sha256(data).hexdigest()}.xlsx')
+    if not os.path.exists(path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+def input_hash(workbook_path, params):
+    """
+    Hash of a job's inputs used for deduplication
+
+    Args:
+        workbook_path (str): Workbook to map
+        params (dict): Job parameters
+
+    Returns:
+        str: Hex digest over the workbook bytes and the canonical parameters
+    """
+    digest = hashlib.sha256()
+    with open(workbook_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def publish_release(data_dir, release_id, files):
+    """
+    Move a finished release into place and switch ``current`` to it atomically
+
+    Args:
+        data_dir (str): Directory served by process_data.py
+        release_id (str): Name of the release directory
+        files (dict): File name -> path of the staged file
+
+    Returns:
+        str: Path of the published release directory
+    """
+    releases_dir = os.path.join(data_dir, 'releases')
+    release_dir = os.path.join(releases_dir, release_id)
+    os.makedirs(release_dir, exist_ok=True)
+    for name, staged_path in files.items():
+        os.replace(staged_path, os.path.join(release_dir, name))
+
+    # Readers follow either the old or the new link, never a half-written set
+    tmp_link = os.path.join(data_dir, f'.current-{release_id}')
+    os.symlink(os.path.join('releases', release_id), tmp_link)
+    os.replace(tmp_link, os.path.join(data_dir, 'current'))
+    return release_dir
+
+
+def previous_result(data_dir):
+    """Mapping served from data_dir before a new release (scores preferred), None on the first run"""
+    current = os.path.join(data_dir, 'current')
+    served_dir = current if os.path.isdir(current) else data_dir
+    for name in ('enhanced_results.npz', 'enhanced_matrix.json'):
+        if os.path.exists(os.path.join(served_dir, name)):
+            return os.path.realpath(os.path.join(served_dir, name))
+    return None
+
+
+def run_job(job_id, workbook_path, params, data_dir, baukasten_workbook, shared_state, cancel_event,
+            report_progress):
+    """
+    Map one workbook and publish its release (runs on a worker thread or process)
+
+    Args:
+        job_id (str): Job id, also the name of the release directory
+        workbook_path (str): Workbook to map
+        params (dict): ``top_k`` and ``process_sheet``
+        data_dir (str): Directory process_data.py serves from
+        baukasten_workbook (str): Workbook of the shared Baukasten (None: the job's own workbook)
+        shared_state (SharedBaukastenState): Loaded Baukasten and model shared by all jobs, or None
+        cancel_event: threading or manager Event set when the job is cancelled
+        report_progress (callable): (done, total) -> None; first called with (0, 0) when the job starts
+
+    Returns:
+        tuple: (published release directory, drift report summary or None)
+
+    Raises:
+        MappingCancelled: When cancel_event is set before the release is published
+    """
+    if cancel_event.is_set():
+        raise MappingCancelled()
+    report_progress(0, 0)
+
+    def on_progress(done, total):
+        report_progress(done, total)
+        if cancel_event.is_set():
+            raise MappingCancelled()
+
+    process_sheet = params.get('process_sheet', 'Lösungsbibliothek')
+    mapper = EnhancedProcessBaukastenMapper(workbook_path, shared_state=shared_state, process_sheet=process_sheet)
+    result = mapper.map_processes_to_baukasten_scored(top_k=params.get('top_k'), progress_callback=on_progress)
+
+    staging_dir = os.path.join(data_dir, 'releases', f'.staging-{job_id}')
+    os.makedirs(staging_dir, exist_ok=True)
+    try:
+        baukasten_source = baukasten_workbook or workbook_path
+        files = {name: os.path.join(staging_dir, name) for name in (
+            'process_data.json', 'component_data.json', 'hauptprozess_map.json',
+            'enhanced_matrix.json', 'enhanced_results.npz')}
+        excel_to_json(workbook_path, output_file_path=files['process_data.json'], sheet_name=process_sheet)
+        excel_to_json(baukasten_source, output_file_path=files['component_data.json'], sheet_name='Baukasten')
+        hauptprozess_to_json(workbook_path, files['hauptprozess_map.json'], sheet_name=process_sheet)
+        with open(files['enhanced_matrix.json'], 'w', encoding='utf-8') as f:
+            json.dump(result.to_matrix_json(), f, indent=4, ensure_ascii=False)
+        result.save(files['enhanced_results.npz'])
+
+        diff = None
+        previous = previous_result(data_dir)
+        if previous is not None:
+            report = {'old': previous, 'new': job_id,
+                      **diff_mappings(MappingTable.load(previous), MappingTable.from_result(result))}
+            files['mapping_diff.json'] = os.path.join(staging_dir, 'mapping_diff.json')
+            with open(files['mapping_diff.json'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, separators=(',', ':'))
+            diff = report['summary']
+
+        if cancel_event.is_set():
+            raise MappingCancelled()
+        return publish_release(data_dir, job_id, files), diff
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def _run_job_in_worker(job_id, workbook_path, params, data_dir, baukasten_workbook, cancel_event, progress_queue):
+    """Process-pool entry point using the state inherited from the parent; progress goes to progress_queue"""
+    return run_job(job_id, workbook_path, params, data_dir, baukasten_workbook, _WORKER_STATE, cancel_event,
+                   lambda done, total: progress_queue.put((job_id, done, total)))
+
+
+class MappingJob:
+    """State of one submitted mapping run"""
+
+    def __init__(self, workbook_path, params, digest):
+        self.id = uuid.uuid4().hex[:12]
+        self.workbook_path = workbook_path
+        self.params = params
+        self.input_hash = digest
+        self.status = QUEUED
+        self.progress = {'done': 0, 'total': 0}
+        self.error = None
+        self.release_dir = None
+        self.diff = None  # Summary of the drift report against the replaced data
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.task = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'workbook': self.workbook_path,
+            'params': self.params,
+            'input_hash': self.input_hash,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'release': self.release_dir,
+            'diff': self.diff,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobRunner:
+    """Runs mapping jobs in a bounded executor pool and publishes their results"""
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, max_workers=2, baukasten_workbook=None, keep_releases=5,
+                 workbook_dir=None, executor='thread'):
+        """
+        Args:
+            data_dir (str): Directory process_data.py serves from
+            max_workers (int): Maximum number of mapping runs executing at once (with
+                executor='thread' the GIL still lets only one of them score at a time)
+            baukasten_workbook (str): Optional workbook whose Baukasten and loaded model are
+                shared by all jobs (otherwise every job loads its own)
+            keep_releases (int): Number of published releases kept on disk
+            workbook_dir (str): Only directory HTTP submissions may read workbooks from
+                (default <data_dir>/workbooks); uploads are stored below it
+            executor (str): 'thread' or 'process' (process requires the fork start method
+                so workers inherit the shared Baukasten state instead of reloading it)
+        """
+        global _WORKER_STATE
+        self.data_dir = data_dir
+        self.workbook_dir = workbook_dir or os.path.join(data_dir, 'workbooks')
+        self.max_workers = max_workers
+        self.baukasten_workbook = baukasten_workbook
+        self.keep_releases = keep_releases
+        self.executor = executor
+        self.jobs = {}
+        self._shared_state = None
+        self._shared_state_lock = threading.Lock()
+        self._manager = None
+
+        if executor == 'process':
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise ValueError("executor='process' needs the fork start method, use executor='thread'")
+            context = multiprocessing.get_context('fork')
+            _WORKER_STATE = self._get_shared_state()
+            # Cancel events and progress reports shared with the worker processes
+            self._manager = context.Manager()
+            self._progress_queue = self._manager.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            # Fork all workers now, before the event loop starts its threads
+            self._executor.submit(int).result()
+            threading.Thread(target=self._drain_progress, name='mapping-job-progress', daemon=True).start()
+        elif executor == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mapping-job')
+        else:
+            raise ValueError(f"Unknown executor '{executor}'")
+
+    async def submit(self, workbook_path, params=None):
+        """
+        Accept a mapping job, or return the matching job for identical inputs
+
+        Args:
+            workbook_path (str): Workbook to map
+            params (dict): ``top_k`` and ``process_sheet``
+
+        Returns:
+            MappingJob: New or deduplicated job
+        """
+        params = dict(params or {})
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, input_hash, workbook_path, params)
+
+        current = os.path.realpath(os.path.join(self.data_dir, 'current'))
+        for job in self.jobs.values():
+            if job.input_hash != digest:
+                continue
+            if job.status in ACTIVE_STATES:
+                return job
+            if job.status == SUCCEEDED and job.release_dir and os.path.realpath(job.release_dir) == current:
+                return job
+
+        job = MappingJob(workbook_path, params, digest)
+        if self._manager is not None:
+            job.cancel_event = self._manager.Event()
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job
+
+        Returns:
+            bool: Whether the job was still active
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return False
+        job.cancel_event.set()
+        if job.status == QUEUED:
+            # Not started yet: the worker drops it as soon as it is picked up
+            job.status = CANCELLED
+        return True
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        if self._manager is not None:
+            run = loop.run_in_executor(self._executor, _run_job_in_worker, job.id, job.workbook_path, job.params,
+                                       self.data_dir, self.baukasten_workbook, job.cancel_event,
+                                       self._progress_queue)
+        else:
+            run = loop.run_in_executor(self._executor, self._execute, job)
+        try:
+            job.release_dir, job.diff = await run
+        except MappingCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        else:
+            job.status = SUCCEEDED
+            self._prune_releases()
+        finally:
+            job.finished_at = time.time()
+
+    def _get_shared_state(self):
+        if self.baukasten_workbook is None:
+            return None
+        with self._shared_state_lock:
+            if self._shared_state is None:
+                self._shared_state = SharedBaukastenState(EnhancedProcessBaukastenMapper(self.baukasten_workbook))
+            return self._shared_state
+
+    def _execute(self, job):
+        """Mapping run on a worker thread (loads the shared state on first use)"""
+        return run_job(job.id, job.workbook_path, job.params, self.data_dir, self.baukasten_workbook,
+                       self._get_shared_state(), job.cancel_event,
+                       lambda done, total: self._update_progress(job.id, done, total))
+
+    def _update_progress(self, job_id, done, total):
+        """Progress reported by a worker; the first report marks the job as running"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if job.status == QUEUED:
+            job.status = RUNNING
+        job.progress = {'done': done, 'total': total}
+
+    def _drain_progress(self):
+        """Apply the progress reports of worker processes until shutdown sends None"""
+        while True:
+            try:
+                update = self._progress_queue.get()
+            except (EOFError, OSError):
+                return  # Manager already stopped
+            if update is None:
+                return
+            self._update_progress(*update)
+
+    def _prune_releases(self):
+        """Remove the oldest published releases beyond keep_releases"""
+        releases_dir = os.path.join(self.data_dir, 'releases')
+        current = os.path.realpath(os.path.join(self.data_dir, 'current'))
+        releases = sorted(
+            (entry for entry in os.scandir(releases_dir) if entry.is_dir() and not entry.name.startswith('.')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in releases[:-self.keep_releases]:
+            if os.path.realpath(entry.path) != current:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._progress_queue.put(None)
+            self._manager.shutdown()
+
+
+async def _handle_http(runner, reader, writer):
+    """
+    Minimal JSON-over-HTTP interface: POST /jobs, GET /jobs[/<id>], DELETE /jobs/<id>
+
+    POST /jobs takes either JSON ``{"workbook": <name in the workbook directory>, "params": {...}}``
+    or the workbook itself as the body (any other Content-Type) with ``top_k`` and
+    ``process_sheet`` in the query string.
+    """
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+        target, _, query = request_line[1].partition('?')
+        method, path = request_line[0], target.rstrip('/')
+        parts = [p for p in path.split('/') if p]
+        status, payload = 404, {'error': 'not found'}
+
+        if parts[:1] == ['jobs']:
+            if method == 'POST' and len(parts) == 1:
+                if headers.get('content-type', 'application/json').startswith('application/json'):
+                    request = json.loads(body or b'{}')
+                    if not isinstance(request, dict):
+                        raise ValueError("request body must be a JSON object")
+                    if not request.get('workbook'):
+                        raise ValueError("missing 'workbook'")
+                    workbook = resolve_workbook(runner.workbook_dir, request['workbook'])
+                    params = request.get('params')
+                else:
+                    if not body:
+                        raise ValueError("empty workbook upload")
+                    workbook = store_upload(runner.workbook_dir, body)
+                    params = dict(parse_qsl(query))
+                    if 'top_k' in params:
+                        params['top_k'] = int(params['top_k'])
+                job = await runner.submit(workbook, params)
+                status, payload = 202, job.to_dict()
+            elif method == 'GET' and len(parts) == 1:
+                status, payload = 200, [job.to_dict() for job in runner.jobs.values()]
+            elif len(parts) == 2 and runner.get(parts[1]) is not None:
+                if method == 'GET':
+                    status, payload = 200, runner.get(parts[1]).to_dict()
+                elif method == 'DELETE':
+                    runner.cancel(parts[1])
+                    status, payload = 202, runner.get(parts[1]).to_dict()
+    except FileNotFoundError:
+        status, payload = 404, {'error': "workbook not found"}
+    except OSError as e:
+        # e.g. the name is a directory or not readable
+        status, payload = 400, {'error': f"workbook not readable: {e.strerror}"}
+    except (ValueError, IndexError, asyncio.IncompleteReadError) as e:
+        status, payload = 400, {'error': str(e)}
+
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+    await writer.drain()
+    writer.close()
+
+
+async def serve(runner, host='127.0.0.1', port=5001):
+    server = await asyncio.start_server(lambda r, w: _handle_http(runner, r, w), host, port)
+    print(f"Mapping job service listening at http://{host}:{port}/jobs")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asynchronous mapping job service")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Directory process_data.py serves from")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Concurrent mapping runs (with --executor thread only one scores at a time)")
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help="process maps jobs in forked worker processes (Linux)")
+    parser.add_argument('--baukasten', default=None, help="Workbook whose Baukasten is shared by all jobs")
+    parser.add_argument('--keep-releases', type=int, default=5)
+    parser.add_argument('--workbook-dir', default=None,
+                        help="Directory submitted workbook names are resolved in (default: <data-dir>/workbooks)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    runner = JobRunner(args.data_dir, max_workers=args.workers, baukasten_workbook=args.baukasten,
+                       keep_releases=args.keep_releases, workbook_dir=args.workbook_dir,
+                       executor=args.executor)
+    try:
+        asyncio.run(serve(runner, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Score-retaining mapping results for the Enhanced Process-Baukasten Mapper.
+
+Instead of bare ``lfd_nummer`` lists, a MappingResult keeps for every process
+a bounded top-K of matches together with their final score and the per-signal
+breakdown as float32 arrays. Results are stored column-wise (CSR style: one
+offsets array plus flat match columns) and serialize to a single ``.npz``
+file that ``create_data_json.py`` and ``process_data.py`` read directly.
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+# Order of the per-signal columns
+SIGNALS = ('lexical', 'fuzzy', 'embedding', 'category', 'domain', 'technical')
+
+# Default signal weights of calculate_similarity (embedding only counts when embeddings are used)
+DEFAULT_WEIGHTS = {
+    'lexical': 1.0,
+    'fuzzy': 0.8,
+    'embedding': 1.2,  # Higher weight for embeddings
+    'category': 1.0,
+    'domain': 1.5,  # Higher weight for domain knowledge
+    'technical': 0.6
+}
+
+# Constants of the adaptive threshold rules (see apply_threshold_rule)
+DEFAULT_THRESHOLD_RULES = {
+    'high_max': 0.7,    # Max score above which the "good matches" rule applies
+    'high_floor': 0.2,
+    'high_std': 0.5,
+    'mid_max': 0.4,     # Max score above which the "medium matches" rule applies
+    'mid_floor': 0.15,
+    'mid_std': 0.3,
+    'low': 0.1,         # Threshold for weak score distributions and empty processes
+    'cap': 0.3,         # Upper bound to avoid being too restrictive
+}
+
+# Kind of a process entry
+KIND_SCORED = 0    # Scored directly against the Baukasten
+KIND_COMBINED = 1  # Main process merged with its subprocesses
+
+
+def select_top_k(scores, threshold, top_k=None):
+    """
+    Indices of the scores above threshold, best first
+
+    Uses argpartition so only the selected top-K are sorted. Ties keep the
+    original component order, like a stable descending sort.
+
+    Args:
+        scores (np.ndarray): Final score per component
+        threshold (float): Minimum score to keep
+        top_k (int): Maximum number of matches (None for unbounded)
+
+    Returns:
+        np.ndarray: Selected component indices ordered by descending score
+    """
+    candidates = np.flatnonzero(scores >= threshold)
+    if top_k is not None and len(candidates) > top_k:
+        # Include every candidate tied with the K-th best so the stable order decides
+        kth_score = np.partition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+        candidates = candidates[scores[candidates] >= kth_score]
+    order = np.argsort(-scores[candidates], kind='stable')
+    return candidates[order][:top_k]
+
+
+def apply_threshold_rule(mean_score, std_score, max_score, rules=DEFAULT_THRESHOLD_RULES):
+    """
+    Adaptive threshold from the statistics of the positive scores
+
+    Works on scalars as well as on arrays with one entry per process.
+
+    Args:
+        mean_score: Mean of the positive scores
+        std_score: Population standard deviation of the positive scores
+        max_score: Maximum positive score
+        rules (dict): Threshold constants (see DEFAULT_THRESHOLD_RULES)
+
+    Returns:
+        float or np.ndarray: Adaptive threshold
+    """
+    threshold = np.where(
+        max_score > rules['high_max'],
+        np.maximum(rules['high_floor'], mean_score - rules['high_std'] * std_score),
+        np.where(
+            max_score > rules['mid_max'],
+            np.maximum(rules['mid_floor'], mean_score - rules['mid_std'] * std_score),
+            rules['low'],
+        ),
+    )
+    threshold = np.minimum(threshold, rules['cap'])
+    return float(threshold) if threshold.ndim == 0 else threshold
+
+
+def min_threshold(rules=DEFAULT_THRESHOLD_RULES):
+    """Lowest threshold the rules can produce; scores below it never match"""
+    return min(rules['low'], rules['high_floor'], rules['mid_floor'], rules['cap'])
+
+
+class ScoreStats:
+    """Running count, mean, variance and max of the positive scores of one process"""
+
+    __slots__ = ('count', 'mean', 'm2', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.max = float('-inf')
+
+    def update(self, value):
+        """
+        Add one score (Welford update)
+
+        Args:
+            value (float): Positive score
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value > self.max:
+            self.max = value
+
+    def update_batch(self, values):
+        """
+        Merge a batch of scores (Chan et al. parallel variance update)
+
+        Args:
+            values (np.ndarray): Positive scores of one tile
+        """
+        n_b = len(values)
+        if not n_b:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        if not self.count:
+            # First batch: exactly np.mean / np.std of the batch
+            self.count, self.mean, self.m2, self.max = n_b, mean_b, m2_b, float(values.max())
+            return
+        n_a = self.count
+        total = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / total
+        self.m2 += m2_b + delta * delta * n_a * n_b / total
+        self.count = total
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def std(self):
+        """Population standard deviation (as np.std)"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+class CandidateHeap:
+    """
+    Best scores at or above a floor, bounded to top_k, filled one component at a time
+
+    The floor is min_threshold: whatever threshold the rules produce later, no
+    score below it can match, and the top_k best above it contain the top_k
+    best above any higher threshold. Ties keep the earlier component, like
+    select_top_k.
+    """
+
+    __slots__ = ('floor', 'top_k', '_entries', '_count')
+
+    def __init__(self, floor, top_k=None):
+        """
+        Args:
+            floor (float): Minimum score kept
+            top_k (int): Maximum number of candidates kept (None keeps all above the floor)
+        """
+        self.floor = floor
+        self.top_k = top_k
+        self._entries = []  # (score, -arrival, component id, signals); a min-heap when bounded
+        self._count = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, component_id, score, signals):
+        """
+        Offer one scored component
+
+        Args:
+            component_id (int): Lfd. Nummer
+            score (float): Final score
+            signals (list): Signal scores in SIGNALS order
+        """
+        if not score >= self.floor:  # Also drops NaN, which never passes a threshold
+            return
+        entry = (score, -self._count, component_id, signals)
+        self._count += 1
+        if self.top_k is None:
+            self._entries.append(entry)
+        elif len(self._entries) < self.top_k:
+            heapq.heappush(self._entries, entry)
+        elif self._entries and entry[:2] > self._entries[0][:2]:
+            # Evicts the lowest score, the latest arrival among equal scores
+            heapq.heapreplace(self._entries, entry)
+
+    def arrays(self):
+        """
+        Kept candidates in arrival order
+
+        Returns:
+            tuple: (Lfd. Nummer int64 array, final score float64 array, signals float32 (n, SIGNALS))
+        """
+        entries = sorted(self._entries, key=lambda entry: -entry[1])
+        return (
+            np.array([entry[2] for entry in entries], dtype=np.int64),
+            np.array([entry[0] for entry in entries], dtype=np.float64),
+            np.array([entry[3] for entry in entries], dtype=np.float32).reshape(-1, len(SIGNALS)),
+        )
+
+
+class MappingResult:
+    """Top-K matches with scores and signal breakdown for every process"""
+
+    def __init__(self, top_k=None):
+        """
+        Args:
+            top_k (int): Maximum number of matches kept per process (None for unbounded)
+        """
+        self.top_k = top_k
+        self._entries = {}  # process number -> (kind, threshold, ids, final, signals)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, process_num):
+        return int(process_num) in self._entries
+
+    def process_numbers(self):
+        """Process numbers in insertion order"""
+        return list(self._entries)
+
+    def add(self, process_num, component_ids, scores, signals, threshold):
+        """
+        Select and store the matches of one scored process
+
+        Args:
+            process_num (int): Prozessnummer
+            component_ids (np.ndarray): Lfd. Nummer per Baukasten row
+            scores (np.ndarray): Final score per Baukasten row
+            signals (np.ndarray): Signal scores, shape (rows, len(SIGNALS))
+            threshold (float): Adaptive threshold of the process
+
+        Returns:
+            np.ndarray: Selected Lfd. Nummer ordered by descending score
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        selected = select_top_k(scores, threshold, self.top_k)
+        ids = np.asarray(component_ids, dtype=np.int64)[selected]
+        self._entries[int(process_num)] = (
+            KIND_SCORED,
+            float(threshold),
+            ids,
+            scores[selected].astype(np.float32),
+            np.asarray(signals, dtype=np.float32)[selected],
+        )
+        return ids
+
+    def combine(self, process_num, member_process_nums):
+        """
+        Merge a main process with its subprocesses, keeping each component's best score
+
+        The merged list is cut back to the result's top_k, so a combined process
+        holds at most as many matches as any other.
+
+        Args:
+            process_num (int): Main process number (must already be scored)
+            member_process_nums (list): Subprocess numbers to merge in
+
+        Returns:
+            np.ndarray: Merged Lfd. Nummer ordered by descending score
+        """
+        members = [int(process_num)] + [int(p) for p in member_process_nums if int(p) in self._entries]
+        ids = np.concatenate([self._entries[p][2] for p in members])
+        final = np.concatenate([self._entries[p][3] for p in members])
+        signals = np.concatenate([self._entries[p][4] for p in members])
+
+        # Best score per component, first occurrence wins ties
+        order = np.lexsort((np.arange(len(ids)), -final))
+        unique_ids, first = np.unique(ids[order], return_index=True)
+        best = order[first]
+        best = best[np.lexsort((best, -final[best]))]
+        # Every member was thresholded already: only the top-K bound is applied again
+        best = best[select_top_k(final[best], -np.inf, self.top_k)]
+
+        threshold = self._entries[int(process_num)][1]
+        self._entries[int(process_num)] = (KIND_COMBINED, threshold, ids[best], final[best], signals[best])
+        return ids[best]
+
+    def matches(self, process_num):
+        """
+        Matches of one process
+
+        Returns:
+            dict: ``ids``, ``final`` and ``signals`` arrays plus ``threshold`` and ``combined``
+        """
+        kind, threshold, ids, final, signals = self._entries[int(process_num)]
+        return {
+            'ids': ids,
+            'final': final,
+            'signals': signals,
+            'threshold': threshold,
+            'combined': kind == KIND_COMBINED,
+        }
+
+    def ids(self, process_num):
+        """Ordered Lfd. Nummer list of one process"""
+        return [int(x) for x in self._entries[int(process_num)][2]]
+
+    def to_mappings(self):
+        """
+        Plain mapping in the format used by save_enhanced_results
+
+        Returns:
+            dict: {Prozessnummer: [Lfd. Nummer, ...]}
+        """
+        return {process_num: self.ids(process_num) for process_num in self._entries}
+
+    def to_matrix_json(self):
+        """Mapping in the enhanced_matrix.json format (string keys)"""
+        return {str(process_num): self.ids(process_num) for process_num in self._entries}
+
+    def save(self, output_file_path):
+        """
+        Write the result as a columnar .npz file
+
+        Args:
+            output_file_path (str): Target path (``.npz``)
+        """
+        process_nums = list(self._entries)
+        entries = [self._entries[p] for p in process_nums]
+        counts = np.array([len(entry[2]) for entry in entries], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        def column(idx, dtype, width=None):
+            parts = [entry[idx] for entry in entries]
+            if parts:
+                return np.concatenate(parts).astype(dtype)
+            return np.zeros((0, width) if width else 0, dtype=dtype)
+
+        np.savez_compressed(
+            output_file_path,
+            process_ids=np.array(process_nums, dtype=np.int64),
+            kinds=np.array([entry[0] for entry in entries], dtype=np.int8),
+            thresholds=np.array([entry[1] for entry in entries], dtype=np.float32),
+            offsets=offsets,
+            component_ids=column(2, np.int64),
+            final=column(3, np.float32),
+            signals=column(4, np.float32, len(SIGNALS)),
+            signal_names=np.array(SIGNALS),
+            top_k=np.array(-1 if self.top_k is None else self.top_k, dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, input_file_path):
+        """
+        Read a result written by ``save``
+
+        Args:
+            input_file_path (str): Path to the ``.npz`` file
+
+        Returns:
+            MappingResult: Loaded result
+        """
+        with np.load(input_file_path, allow_pickle=False) as data:
+            top_k = int(data['top_k'])
+            result = cls(top_k=None if top_k < 0 else top_k)
+            offsets = data['offsets']
+            for i, process_num in enumerate(data['process_ids']):
+                lo, hi = offsets[i], offsets[i + 1]
+                result._entries[int(process_num)] = (
+                    int(data['kinds'][i]),
+                    float(data['thresholds'][i]),
+                    data['component_ids'][lo:hi],
+                    data['final'][lo:hi],
+                    data['signals'][lo:hi],
+                )
+        return result
@@ -0,0 +1,150 @@
+"""
+Persistent memo of per-process scoring results.
+
+Scoring a process depends only on its keyword set (plus, when embeddings
+contribute, the embedded process text) and on the Baukasten and scoring
+configuration. Processes with the same keywords, such as versioned variants
+or subprocesses reused by several Hauptprozesse, therefore get identical
+scores. ScoreMemo keys a scoring result by
+
+    canonical keyword signature | process text hash | variant (candidates, tiling)
+
+inside one configuration version (a fingerprint of Baukasten content, rules,
+weights, threshold rules and embedding setup, see
+EnhancedProcessBaukastenMapper.scoring_fingerprint). Only the matches above
+the adaptive threshold are kept, which is all MappingResult.add can select,
+so a hit reproduces the selection of a full sweep exactly.
+
+The memo is saved as one .npz file (CSR layout like MappingResult). A file
+written under another configuration version is ignored and replaced.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from mapping_results import SIGNALS
+
+MEMO_VERSION = 1
+KEY_SEPARATOR = '\x1f'
+
+
+def keyword_signature(keywords):
+    """Canonical, order-independent form of a keyword list"""
+    return KEY_SEPARATOR.join(sorted(set(keywords)))
+
+
+def text_hash(text):
+    """Short stable hash of a process text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ScoreMemo:
+    """Scoring results of processes by keyword signature, for one configuration version"""
+
+    def __init__(self, config_version, path=None):
+        """
+        Args:
+            config_version (str): Fingerprint of Baukasten and scoring configuration
+            path (str): .npz file the memo is loaded from and saved to (None keeps it in memory)
+        """
+        self.config_version = config_version
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # key -> (component ids, scores, signals, threshold)
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def key(keywords, process_text=None, variant=''):
+        """
+        Memo key of one process
+
+        Args:
+            keywords (list): Keywords of the process
+            process_text (str): Embedded process text (None when embeddings do not contribute)
+            variant (str): Anything else the scores depend on (candidate filter, tiling)
+
+        Returns:
+            str: Key
+        """
+        return '|'.join([keyword_signature(keywords), text_hash(process_text) if process_text else '', variant])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """(component ids, scores, signals, threshold) or None; counts hits and misses"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, key, component_ids, scores, signals, threshold):
+        """
+        Remember the scoring result of one process
+
+        Args:
+            key (str): See ``key``
+            component_ids (np.ndarray): Lfd. Nummer per scored element
+            scores (np.ndarray): Final score per element
+            signals (np.ndarray): Signal matrix (elements x SIGNALS)
+            threshold (float): Adaptive threshold of the process
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        # Baukasten order is kept, so select_top_k breaks ties exactly as on the full arrays
+        keep = scores >= threshold
+        entry = (np.asarray(component_ids, dtype=np.int64)[keep], scores[keep],
+                 np.asarray(signals, dtype=np.float32).reshape(-1, len(SIGNALS))[keep], float(threshold))
+        with self._lock:
+            self._entries[key] = entry
+            self._dirty = True
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            if int(data['memo_version']) != MEMO_VERSION or str(data['config_version']) != self.config_version:
+                return
+            offsets = data['offsets']
+            for i, key in enumerate(data['keys']):
+                lo, hi = offsets[i], offsets[i + 1]
+                self._entries[str(key)] = (data['component_ids'][lo:hi], data['scores'][lo:hi],
+                                           data['signals'][lo:hi], float(data['thresholds'][i]))
+
+    def save(self):
+        """Write the memo to its path if it changed (temp file, then rename)"""
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            entries = [self._entries[key] for key in keys]
+            self._dirty = False
+        counts = [len(entry[0]) for entry in entries]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        def column(idx, dtype, width=None):
+            if entries:
+                return np.concatenate([entry[idx] for entry in entries]).astype(dtype)
+            return np.zeros((0, width) if width else 0, dtype=dtype)
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                memo_version=np.array(MEMO_VERSION),
+                config_version=np.array(self.config_version),
+                keys=np.array(keys, dtype=str),
+                offsets=offsets,
+                component_ids=column(0, np.int64),
+                scores=column(1, np.float64),
+                signals=column(2, np.float32, len(SIGNALS)),
+                thresholds=np.array([entry[3] for entry in entries], dtype=np.float64),
+            )
+        os.replace(tmp_path, self.path)
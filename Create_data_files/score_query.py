@@ -0,0 +1,213 @@
+"""
+Slicing of persisted score matrices by process and component attributes.
+
+A mapping run with ``spill_dir`` (or ``batch_mapping.py --score-matrices``)
+writes the full final and per-signal process x component matrices as
+memory-mapped float32 files together with process and component attribute
+indexes (see score_store.py). ScoreQuery resolves attribute filters on the
+small indexes first and then reads only the selected matrix rows, block by
+block, so the full matrix never has to fit in RAM:
+
+    query = ScoreQuery('scores')
+    robots = query.slice(component={'Bauteilkategorie': 'Roboter'})
+    per_type = query.distribution('Prozessart', component={'Bauteilkategorie': 'Roboter'})
+
+A filter maps an attribute (or ``id`` for Prozessnummer / Lfd. Nummer) to a
+value, a collection of accepted values, or a predicate.
+
+Usage:
+    python score_query.py scores/ --component Bauteilkategorie=Roboter --group-by Prozessart
+    python score_query.py scores/ --process Prozessart=Hauptprozess --matrix domain --output slice.npz
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from mapping_results import ScoreStats
+from score_store import FINAL, ScoreStore
+
+BLOCK_ROWS = 1024  # Matrix rows read from disk at a time
+HISTOGRAM_BINS = 10
+
+
+def _matcher(condition):
+    """Predicate for one filter condition"""
+    if callable(condition):
+        return condition
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        accepted = set(condition)
+        return lambda value: value in accepted
+    return lambda value: value == condition
+
+
+class ScoreQuery:
+    """Attribute filters, slices and grouped score distributions over a ScoreStore"""
+
+    def __init__(self, store):
+        """
+        Args:
+            store (ScoreStore or str): Store written by a mapping run with spill_dir
+        """
+        self.store = ScoreStore(store) if isinstance(store, str) else store
+        self.process_ids = self.store.process_ids
+        self.component_ids = self.store.component_ids
+
+    def _indices(self, axis, filters):
+        """Ascending row (axis='process') or column (axis='component') indices matching all filters"""
+        ids = self.process_ids if axis == 'process' else self.component_ids
+        if not filters:
+            return np.arange(len(ids))
+        attributes = self.store.attributes[axis]
+        keep = np.ones(len(ids), dtype=bool)
+        for name, condition in filters.items():
+            values = ids.tolist() if name == 'id' else attributes.get(name)
+            if values is None:
+                raise KeyError(f"Unknown {axis} attribute '{name}', expected one of {['id'] + list(attributes)}")
+            match = _matcher(condition)
+            keep &= np.fromiter((bool(match(value)) for value in values), dtype=bool, count=len(ids))
+        return np.flatnonzero(keep)
+
+    def rows(self, **filters):
+        """Matrix rows of the processes matching all filters"""
+        return self._indices('process', filters)
+
+    def columns(self, **filters):
+        """Matrix columns of the components matching all filters"""
+        return self._indices('component', filters)
+
+    def _blocks(self, rows, columns, matrix, block_rows):
+        """Yield (row offset, float32 block) of matrix[rows][:, columns], reading block_rows rows at a time"""
+        if matrix not in self.store.matrices:
+            raise KeyError(f"Unknown matrix '{matrix}', expected one of {list(self.store.matrices)}")
+        data = self.store.matrices[matrix]
+        all_columns = len(columns) == data.shape[1]
+        for start in range(0, len(rows), block_rows):
+            block = data[rows[start:start + block_rows]]  # Only these rows are read
+            yield start, block if all_columns else block[:, columns]
+
+    def slice(self, process=None, component=None, matrix=FINAL, block_rows=BLOCK_ROWS):
+        """
+        Scores of the selected processes and components
+
+        Args:
+            process (dict): Process attribute filters (None selects all)
+            component (dict): Component attribute filters (None selects all)
+            matrix (str): 'final' or a signal name
+            block_rows (int): Matrix rows read at a time
+
+        Returns:
+            dict: ``process_ids``, ``component_ids`` and the float32 ``scores`` (processes x components)
+        """
+        rows, columns = self.rows(**(process or {})), self.columns(**(component or {}))
+        scores = np.empty((len(rows), len(columns)), dtype=np.float32)
+        for start, block in self._blocks(rows, columns, matrix, block_rows):
+            scores[start:start + len(block)] = block
+        return {'process_ids': self.process_ids[rows], 'component_ids': self.component_ids[columns],
+                'scores': scores}
+
+    def distribution(self, group_by, process=None, component=None, matrix=FINAL, bins=HISTOGRAM_BINS,
+                     block_rows=BLOCK_ROWS):
+        """
+        Score distribution per value of a process or component attribute, streamed block by block
+
+        Args:
+            group_by (str): Process attribute (e.g. 'Prozessart') or component attribute
+                (e.g. 'Bauteilkategorie') to group by
+            process (dict): Process attribute filters
+            component (dict): Component attribute filters
+            matrix (str): 'final' or a signal name
+            bins (int): Histogram bins over [0, 1] (scores outside fall into the outer bins)
+            block_rows (int): Matrix rows read at a time
+
+        Returns:
+            dict: {attribute value: {"count", "positive", "mean", "std", "max", "histogram"}}
+        """
+        process_attributes = self.store.attributes['process']
+        component_attributes = self.store.attributes['component']
+        if group_by in process_attributes:
+            axis, labels = 'process', process_attributes[group_by]
+        elif group_by in component_attributes:
+            axis, labels = 'component', component_attributes[group_by]
+        else:
+            raise KeyError(f"Unknown attribute '{group_by}'")
+
+        rows, columns = self.rows(**(process or {})), self.columns(**(component or {}))
+        selected = rows if axis == 'process' else columns
+        groups = {}
+        for position, index in enumerate(selected):
+            groups.setdefault(labels[index], []).append(position)
+        groups = {label: np.asarray(positions) for label, positions in groups.items()}
+
+        edges = np.linspace(0.0, 1.0, bins + 1)
+        stats = {label: ScoreStats() for label in groups}
+        histograms = {label: np.zeros(bins, dtype=np.int64) for label in groups}
+        positives = dict.fromkeys(groups, 0)
+        for start, block in self._blocks(rows, columns, matrix, block_rows):
+            for label, positions in groups.items():
+                if axis == 'process':
+                    positions = positions[(positions >= start) & (positions < start + len(block))]
+                    values = block[positions - start].ravel()
+                else:
+                    values = block[:, positions].ravel()
+                if not len(values):
+                    continue
+                stats[label].update_batch(values)
+                positives[label] += int((values > 0).sum())
+                histograms[label] += np.histogram(np.clip(values, 0.0, 1.0), bins=edges)[0]
+
+        return {
+            label: {
+                'count': stats[label].count,
+                'positive': positives[label],
+                'mean': stats[label].mean if stats[label].count else None,
+                'std': stats[label].std if stats[label].count else None,
+                'max': stats[label].max if stats[label].count else None,
+                'histogram': histograms[label].tolist(),
+            }
+            for label in groups
+        }
+
+
+def _parse_filters(specs):
+    """``attribute=value`` arguments to filters; repeated attributes accept any of their values"""
+    accepted = {}
+    for spec in specs or ():
+        name, _, value = spec.partition('=')
+        accepted.setdefault(name.strip(), set()).add(value.strip())
+    # Command-line values are strings: compare with the string form of the stored values
+    return {name: (lambda value, values=values: str(value) in values) for name, values in accepted.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice persisted score matrices by process and component attributes")
+    parser.add_argument('store', help="Score store directory written with spill_dir / --score-matrices")
+    parser.add_argument('--process', action='append', help="Process filter attribute=value (repeatable)")
+    parser.add_argument('--component', action='append', help="Component filter attribute=value (repeatable)")
+    parser.add_argument('--matrix', default=FINAL, help="'final' or a signal name")
+    parser.add_argument('--group-by', default=None, help="Print the score distribution per value of this attribute")
+    parser.add_argument('--bins', type=int, default=HISTOGRAM_BINS)
+    parser.add_argument('--output', default=None, help="Write the slice as .npz")
+    args = parser.parse_args()
+
+    query = ScoreQuery(args.store)
+    process, component = _parse_filters(args.process), _parse_filters(args.component)
+
+    if args.group_by:
+        report = query.distribution(args.group_by, process, component, args.matrix, args.bins)
+        print(json.dumps({str(label): values for label, values in report.items()}, indent=2, ensure_ascii=False))
+        return
+
+    result = query.slice(process, component, args.matrix)
+    scores = result['scores']
+    print(f"📐 {args.matrix}: {scores.shape[0]} processes x {scores.shape[1]} components")
+    if scores.size:
+        print(f"   mean {scores.mean():.4f}, max {scores.max():.4f}, positive {int((scores > 0).sum())}")
+    if args.output:
+        np.savez(args.output, **result)
+        print(f"💾 Slice written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
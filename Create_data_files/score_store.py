@@ -0,0 +1,145 @@
+"""
+On-disk process x component score matrices for the Enhanced Process-Baukasten Mapper.
+
+A ScoreStore is a directory with one memory-mapped float32 matrix per signal
+(plus the final score), written tile by tile during blocked scoring so the
+full matrices never have to fit in RAM:
+
+    meta.json                  shape, signal names, weights used for ``final``
+    process_ids.npy            Prozessnummer of every row
+    component_ids.npy          Lfd. Nummer of every column
+    process_attributes.json    {column: value per row}, e.g. Prozessart (optional)
+    component_attributes.json  {column: value per column}, e.g. Bauteilkategorie (optional)
+    <signal>.f32               raw float32 matrix of shape (processes, components)
+
+The attribute files let score_query.py slice the matrices by process or
+component attributes while reading only the selected rows.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from mapping_results import SIGNALS
+
+FINAL = 'final'
+ATTRIBUTE_FILES = {'process': 'process_attributes.json', 'component': 'component_attributes.json'}
+
+
+def attribute_columns(df, columns):
+    """
+    Columnar attribute index of a DataFrame (missing values become None)
+
+    Args:
+        df (pd.DataFrame): Process or Baukasten rows, in matrix order
+        columns (iterable): Columns to keep (absent ones are skipped)
+
+    Returns:
+        dict: {column: list of JSON values}
+    """
+    return {column: [None if value is None or value != value else value for value in df[column].tolist()]
+            for column in columns if column in df.columns}
+
+
+class ScoreStore:
+    """Directory of memory-mapped per-signal score matrices"""
+
+    def __init__(self, directory, mode='r'):
+        """
+        Open an existing store.
+
+        Args:
+            directory (str): Store directory
+            mode (str): 'r' for read-only, 'r+' to update in place
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.process_ids = np.load(os.path.join(directory, 'process_ids.npy'))
+        self.component_ids = np.load(os.path.join(directory, 'component_ids.npy'))
+        self.shape = tuple(self.meta['shape'])
+        self.matrices = {
+            name: np.memmap(self._matrix_path(directory, name), dtype=np.float32, mode=mode, shape=self.shape)
+            for name in self.meta['matrices']
+        }
+        self.attributes = {}
+        for axis, name in ATTRIBUTE_FILES.items():
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.attributes[axis] = json.load(f)
+            else:
+                self.attributes[axis] = {}  # Stores written before attribute indexes existed
+        self._row_of = {int(p): i for i, p in enumerate(self.process_ids)}
+        self._column_of = {int(c): i for i, c in enumerate(self.component_ids)}
+
+    @staticmethod
+    def _matrix_path(directory, name):
+        return os.path.join(directory, f'{name}.f32')
+
+    @classmethod
+    def create(cls, directory, process_ids, component_ids, signals=SIGNALS, weights=None,
+               process_attributes=None, component_attributes=None):
+        """
+        Allocate a new store (files are sparse until written)
+
+        Args:
+            directory (str): Store directory (created if missing)
+            process_ids (list): Prozessnummer per row
+            component_ids (list): Lfd. Nummer per column
+            signals (tuple): Signal matrices to allocate besides ``final``
+            weights (dict): Signal weights the final scores were combined with
+            process_attributes (dict): {column: value per row} (see attribute_columns)
+            component_attributes (dict): {column: value per column}
+
+        Returns:
+            ScoreStore: Store opened for writing
+        """
+        os.makedirs(directory, exist_ok=True)
+        shape = (len(process_ids), len(component_ids))
+        np.save(os.path.join(directory, 'process_ids.npy'), np.asarray(process_ids, dtype=np.int64))
+        np.save(os.path.join(directory, 'component_ids.npy'), np.asarray(component_ids, dtype=np.int64))
+        matrices = [FINAL] + list(signals)
+        for name in matrices:
+            np.memmap(cls._matrix_path(directory, name), dtype=np.float32, mode='w+', shape=shape).flush()
+        for axis, attributes, size in (('process', process_attributes, shape[0]),
+                                       ('component', component_attributes, shape[1])):
+            if not attributes:
+                continue
+            if any(len(values) != size for values in attributes.values()):
+                raise ValueError(f"Every {axis} attribute needs one value per {axis}")
+            with open(os.path.join(directory, ATTRIBUTE_FILES[axis]), 'w', encoding='utf-8') as f:
+                json.dump(attributes, f, ensure_ascii=False, default=str)
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'shape': shape, 'matrices': matrices, 'signals': list(signals),
+                       'weights': weights}, f, indent=2)
+        return cls(directory, mode='r+')
+
+    def row(self, process_num):
+        """Row index of a Prozessnummer"""
+        return self._row_of[int(process_num)]
+
+    def column(self, lfd_nummer):
+        """Column index of a Lfd. Nummer"""
+        return self._column_of[int(lfd_nummer)]
+
+    def write_tile(self, row, start, final, signals):
+        """
+        Write the scores of one process for components [start, start + len(final))
+
+        Args:
+            row (int): Process row
+            start (int): First component column of the tile
+            final (np.ndarray): Final scores of the tile
+            signals (np.ndarray): Signal scores, shape (tile, len(SIGNALS))
+        """
+        stop = start + len(final)
+        self.matrices[FINAL][row, start:stop] = final
+        for col, signal in enumerate(self.meta['signals']):
+            self.matrices[signal][row, start:stop] = signals[:, col]
+
+    def flush(self):
+        for matrix in self.matrices.values():
+            if matrix.mode != 'r':
+                matrix.flush()
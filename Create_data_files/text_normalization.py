@@ -0,0 +1,97 @@
+"""
+Column-wise text normalization for the Enhanced Process-Baukasten Mapper.
+
+preprocess_text (lowercase, punctuation to spaces, collapsed whitespace) used
+to run cell by cell, two regex substitutions per field of every process and
+Baukasten row. normalize_series applies the same steps to whole columns with
+pandas string methods, once after loading. ProcessTokenTable keeps the
+resulting keyword list of every process row (ComponentFeatureTable does the
+same for the Baukasten), so the scoring paths only look tokens up.
+"""
+
+import numpy as np
+import pandas as pd
+
+PUNCTUATION = r'[^\w\s]'
+WHITESPACE = r'\s+'
+
+# Process columns extract_keywords reads, in the order keywords are collected
+KEYWORD_FIELDS = ('Prozessname', 'Merkmalsklasse 1', 'Merkmalsklasse 2', 'Merkmalsklasse 3', 'Prozessart',
+                  'Randbedingung 1', 'Randbedingung 2')
+NO_VALUE = '-'  # Placeholder in Merkmalsklasse/Randbedingung cells
+
+
+def normalize_series(series):
+    """
+    Column-wise equivalent of EnhancedProcessBaukastenMapper.preprocess_text
+
+    Args:
+        series (pd.Series): Raw column (any dtype, missing values allowed)
+
+    Returns:
+        pd.Series: Normalized strings, '' for missing values
+    """
+    missing = series.isna().to_numpy()
+    # Object dtype keeps Python's Unicode-aware regex semantics for \w (umlauts stay letters)
+    text = series.astype(object).where(~missing, '').astype(str).astype(object)
+    text = (text.str.lower()
+                .str.replace(PUNCTUATION, ' ', regex=True)
+                .str.replace(WHITESPACE, ' ', regex=True)
+                .str.strip())
+    return text.where(~missing, '')
+
+
+def normalize_columns(df, columns):
+    """{column: list of normalized strings}, '' for columns the frame does not have"""
+    return {
+        column: normalize_series(df[column]).tolist() if column in df.columns else [''] * len(df)
+        for column in columns
+    }
+
+
+class ProcessTokenTable:
+    """Normalized name and keyword list of every process row"""
+
+    __slots__ = ('process_numbers', 'names', 'keywords')
+
+    def __init__(self, processes_df):
+        """
+        Args:
+            processes_df (pd.DataFrame): Loaded Lösungsbibliothek
+        """
+        fields = normalize_columns(processes_df, KEYWORD_FIELDS)
+        self.process_numbers = processes_df['Prozessnummer'].to_numpy()
+        self.names = fields['Prozessname']
+
+        self.keywords = []
+        for name, m1, m2, m3, art, r1, r2 in zip(*(fields[column] for column in KEYWORD_FIELDS)):
+            # Same collection order as extract_keywords, so the de-duplicated lists match
+            keywords = name.split()
+            for merkmal in (m1, m2, m3):
+                if merkmal and merkmal != NO_VALUE:
+                    keywords.extend(merkmal.split())
+            if art:
+                keywords.append(art)
+            for randbedingung in (r1, r2):
+                if randbedingung and randbedingung != NO_VALUE:
+                    keywords.extend(randbedingung.split())
+            self.keywords.append(list(set(keywords)))
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def row_for(self, process_row):
+        """
+        Resolve the table row of a processes_df row
+
+        Args:
+            process_row: DataFrame row containing process information
+
+        Returns:
+            int or None: Row index, None if the row is not from the table's frame
+        """
+        row_idx = process_row.name
+        if isinstance(row_idx, (int, np.integer)) and 0 <= row_idx < len(self.keywords) \
+                and self.process_numbers[row_idx] == process_row.get('Prozessnummer'):
+            return int(row_idx)
+        return None
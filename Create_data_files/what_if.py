@@ -0,0 +1,267 @@
+"""
+What-if evaluation of signal weights and threshold rules without rescoring.
+
+One mapping run with ``spill_dir`` persists the raw lexical, fuzzy, embedding,
+category, domain and technical matrices (see score_store.py). WhatIfEvaluator
+recombines them under new weights, applies the adaptive threshold rules to
+all processes at once and scores the selection against a labeled reference
+mapping, e.g. a filled ``Bibliothek-Baukasten-Matrix`` sheet or a matrix JSON
+(the matrix sheet of the challenge workbook itself is empty).
+
+Scores are recombined in row tiles read from the memory-mapped matrices, so
+only the resulting final matrix is held in RAM.
+
+Usage:
+    python what_if.py scores/ --reference enhanced_matrix.json --hierarchy hauptprozess_map.json
+"""
+
+import argparse
+import itertools
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from mapping_results import DEFAULT_THRESHOLD_RULES, DEFAULT_WEIGHTS, apply_threshold_rule
+from score_store import ScoreStore
+
+TILE_ROWS = 1024  # Process rows recombined per step
+
+
+def load_reference_mapping(path, sheet_name='Bibliothek-Baukasten-Matrix'):
+    """
+    Load a labeled process -> component mapping
+
+    Args:
+        path (str): Workbook with a filled matrix sheet, or a JSON file in the
+            enhanced_matrix.json format
+        sheet_name (str): Matrix sheet name for workbooks
+
+    Returns:
+        dict: {Prozessnummer: set of Lfd. Nummer}, processes without labels are left out
+    """
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {int(p): {int(c) for c in ids} for p, ids in data.items() if ids}
+
+    matrix_df = pd.read_excel(path, sheet_name=sheet_name, header=None)
+    reference = {}
+    for col in range(1, matrix_df.shape[1]):
+        process_num = matrix_df.iloc[1, col]
+        if pd.isna(process_num):
+            continue
+        labels = {int(v) for v in matrix_df.iloc[3:, col] if pd.notna(v) and str(v).strip() != ''}
+        if labels:
+            reference[int(process_num)] = labels
+    return reference
+
+
+class WhatIfEvaluator:
+    """Vectorized recombination and thresholding of persisted per-signal score matrices"""
+
+    def __init__(self, store, hierarchy=None, tile_rows=TILE_ROWS):
+        """
+        Args:
+            store (ScoreStore or str): Store written by a mapping run with spill_dir
+            hierarchy (dict): Optional {main process: [subprocesses]}; main processes are
+                then evaluated on the union of their own and their subprocesses' matches
+            tile_rows (int): Process rows read from every signal matrix per recombination step
+        """
+        self.store = ScoreStore(store) if isinstance(store, str) else store
+        self.signals = self.store.meta['signals']
+        # {signal: matrix}, the store's memmaps; an entry may be replaced by an in-memory matrix
+        self.signal_matrices = {s: self.store.matrices[s] for s in self.signals}
+        self.shape = self.store.shape
+        self.tile_rows = max(1, int(tile_rows))
+        self.hierarchy = {int(k): [int(s) for s in v] for k, v in (hierarchy or {}).items()}
+        self.process_ids = self.store.process_ids
+        self.component_ids = self.store.component_ids
+        # Weights the stored run was scored with (embedding is 0 when embeddings were unavailable)
+        self.base_weights = self.store.meta.get('weights') or dict(DEFAULT_WEIGHTS)
+
+    def recombine(self, weights):
+        """
+        Final scores under new signal weights
+
+        Args:
+            weights (dict): Weight per signal (missing signals count as 0)
+
+        Returns:
+            np.ndarray: Final score matrix (processes, components), capped at 1.0
+        """
+        w = {s: np.float32(weights.get(s, 0.0)) for s in self.signals}
+        total = np.float32(sum(w.values()))
+        final = np.zeros(self.shape, dtype=np.float32)
+        if total <= 0:
+            return final
+        # Signals with weight 0 are never read
+        active = [s for s in self.signals if w[s]]
+        for start in range(0, self.shape[0], self.tile_rows):
+            tile = final[start:start + self.tile_rows]
+            for signal in active:
+                tile += w[signal] * self.signal_matrices[signal][start:start + self.tile_rows]
+            tile /= total
+            np.minimum(tile, 1.0, out=tile)
+        return final
+
+    @staticmethod
+    def thresholds(final, rules=DEFAULT_THRESHOLD_RULES):
+        """
+        Adaptive threshold of every process at once
+
+        Args:
+            final (np.ndarray): Final score matrix (processes, components)
+            rules (dict): Threshold constants
+
+        Returns:
+            np.ndarray: Threshold per process
+        """
+        positive = final > 0
+        count = positive.sum(axis=1)
+        safe_count = np.maximum(count, 1)
+        values = np.where(positive, final, 0.0).astype(np.float64)
+        mean = values.sum(axis=1) / safe_count
+        var = (np.where(positive, values - mean[:, None], 0.0) ** 2).sum(axis=1) / safe_count
+        max_score = np.where(positive, values, -np.inf).max(axis=1)
+        threshold = apply_threshold_rule(mean, np.sqrt(var), max_score, rules)
+        return np.where(count > 0, threshold, rules['low'])
+
+    def select(self, weights=None, rules=DEFAULT_THRESHOLD_RULES):
+        """
+        Selection matrix for one configuration (weights default to the stored run's)
+
+        Returns:
+            np.ndarray: Boolean matrix (processes, components), main processes include
+            their subprocesses' matches
+        """
+        final = self.recombine(weights or self.base_weights)
+        return self._merge_hierarchy(final >= self.thresholds(final, rules)[:, None])
+
+    def _merge_hierarchy(self, selected):
+        """Add the subprocess selections to their main process rows (in place)"""
+        for main_process, subprocesses in self.hierarchy.items():
+            if main_process not in self.store._row_of:
+                continue
+            rows = [self.store.row(p) for p in subprocesses if p in self.store._row_of]
+            if rows:
+                selected[self.store.row(main_process)] |= selected[rows].any(axis=0)
+        return selected
+
+    def to_mappings(self, selected, final):
+        """Ordered {Prozessnummer: [Lfd. Nummer, ...]} from a selection matrix"""
+        mappings = {}
+        for row, process_num in enumerate(self.process_ids):
+            cols = np.flatnonzero(selected[row])
+            cols = cols[np.argsort(-final[row, cols], kind='stable')]
+            mappings[int(process_num)] = [int(c) for c in self.component_ids[cols]]
+        return mappings
+
+    def reference_matrix(self, reference):
+        """
+        Boolean label matrix aligned with the store plus the rows that have labels
+
+        Args:
+            reference (dict): Output of load_reference_mapping
+
+        Returns:
+            tuple: (label matrix, boolean row mask of labeled processes)
+        """
+        labels = np.zeros(self.shape, dtype=bool)
+        labeled = np.zeros(len(self.process_ids), dtype=bool)
+        for process_num, components in reference.items():
+            if process_num not in self.store._row_of:
+                continue
+            row = self.store.row(process_num)
+            labeled[row] = True
+            for lfd_nummer in components:
+                if lfd_nummer in self.store._column_of:
+                    labels[row, self.store.column(lfd_nummer)] = True
+        return labels, labeled
+
+    @staticmethod
+    def metrics(selected, labels, labeled):
+        """Micro precision, recall and F1 over the labeled processes"""
+        selected, labels = selected[labeled], labels[labeled]
+        true_positive = int((selected & labels).sum())
+        predicted = int(selected.sum())
+        actual = int(labels.sum())
+        precision = true_positive / predicted if predicted else 0.0
+        recall = true_positive / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {'precision': precision, 'recall': recall, 'f1': f1,
+                'predicted': predicted, 'true_positive': true_positive, 'labeled': actual}
+
+    def evaluate(self, reference, weights=None, rules=DEFAULT_THRESHOLD_RULES):
+        """Metrics of one configuration against a reference mapping"""
+        labels, labeled = self.reference_matrix(reference)
+        return self.metrics(self.select(weights, rules), labels, labeled)
+
+    def grid_search(self, reference, weight_grid, rule_grid=None, top_n=10):
+        """
+        Evaluate every combination of weight and threshold settings
+
+        Args:
+            reference (dict): Output of load_reference_mapping
+            weight_grid (dict): Signal -> list of weights to try (others keep the stored run's)
+            rule_grid (dict): Threshold constant -> list of values to try
+            top_n (int): Number of best configurations returned
+
+        Returns:
+            list: Configurations with their metrics, best F1 first
+        """
+        labels, labeled = self.reference_matrix(reference)
+        if not labeled.any():
+            raise ValueError("Reference mapping has no labeled process in the score store")
+        rule_grid = rule_grid or {}
+
+        weight_keys, rule_keys = list(weight_grid), list(rule_grid)
+        results = []
+        for weight_values in itertools.product(*(weight_grid[k] for k in weight_keys)):
+            weights = dict(self.base_weights, **dict(zip(weight_keys, weight_values)))
+            final = self.recombine(weights)
+            for rule_values in itertools.product(*(rule_grid[k] for k in rule_keys)):
+                rules = dict(DEFAULT_THRESHOLD_RULES, **dict(zip(rule_keys, rule_values)))
+                selected = self._merge_hierarchy(final >= self.thresholds(final, rules)[:, None])
+                results.append({'weights': weights, 'rules': rules,
+                                **self.metrics(selected, labels, labeled)})
+
+        results.sort(key=lambda r: r['f1'], reverse=True)
+        return results[:top_n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search weights and thresholds on persisted scores")
+    parser.add_argument('store', help="Score store directory written with spill_dir")
+    parser.add_argument('--reference', required=True, help="Workbook with a filled matrix sheet or matrix JSON")
+    parser.add_argument('--sheet', default='Bibliothek-Baukasten-Matrix')
+    parser.add_argument('--hierarchy', default=None, help="hauptprozess_map.json to merge subprocess matches")
+    parser.add_argument('--grid', default=None,
+                        help='JSON {"weights": {signal: [..]}, "rules": {constant: [..]}}')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    hierarchy = None
+    if args.hierarchy:
+        with open(args.hierarchy, 'r', encoding='utf-8') as f:
+            hierarchy = json.load(f)
+    reference = load_reference_mapping(args.reference, args.sheet)
+    if not reference:
+        print(f"Error: '{args.reference}' has no labeled process (sheet '{args.sheet}' is empty?). "
+              "Pass a workbook with a filled matrix sheet or a matrix JSON such as enhanced_matrix.json.",
+              file=sys.stderr)
+        sys.exit(1)
+    evaluator = WhatIfEvaluator(args.store, hierarchy=hierarchy)
+
+    grid = json.loads(args.grid) if args.grid else {
+        'weights': {'domain': [1.0, 1.5, 2.0], 'fuzzy': [0.4, 0.8], 'embedding': [0.0, 1.2]},
+        'rules': {'cap': [0.25, 0.3, 0.35]},
+    }
+    print(f"Baseline: {evaluator.evaluate(reference)}")
+    for result in evaluator.grid_search(reference, grid.get('weights', {}), grid.get('rules'), args.top):
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
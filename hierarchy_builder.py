@@ -0,0 +1,206 @@
+"""
+Arbitrary-depth process hierarchy over the Verknüpfungen Prozessebene links.
+
+hauptprozess_map links a process to its sub-processes. A sub-process with
+links of its own continues the tree, to any depth:
+
+    Hauptprozess -> partial solution -> sub-process -> ... -> Bauteil
+
+Every hauptprozess_map key becomes a process entry whose children are its
+linked sub-processes (or one "Direct Components" node with its Bauteile when
+it has no links). A sub-process node lists its own sub-processes first, then
+its Bauteile (enhanced_matrix) as leaves, so three-level inputs give exactly
+the former Hauptprozess -> partial solution -> Bauteil tree.
+
+The links are made acyclic once: a depth-first pass from the roots (in
+hauptprozess_map order) drops every link back to a process on the current
+path and records it in HierarchyBuilder.cycles (see warnings()) instead of
+printing it, so the served hierarchy is unaffected. Subtrees are then
+assembled bottom-up in an iterative post-order pass, each process exactly
+once; a sub-process linked from several parents is one node dict referenced
+by all of them. Code that
+rewrites nodes in place calls unshare_subtrees first.
+"""
+
+UNKNOWN_PROCESS = ('', '')  # Prozessart, Merkmalsklasse 1
+UNKNOWN_COMPONENT = ('', '', '', '')  # Bauteilkategorie, Hersteller, Typ, Beschreibung
+
+
+def component_leaf(component_id, info=None, score=None):
+    """
+    Bauteil leaf entry
+
+    Args:
+        component_id (str): Lfd. Nummer
+        info (tuple): (name, Bauteilkategorie, Hersteller, Typ, Beschreibung), None when unknown
+        score (float): Mapping score (omitted when None)
+    """
+    name, kategorie, hersteller, typ, beschreibung = info or ((f"Component {component_id}",) + UNKNOWN_COMPONENT)
+    entry = {
+        "id": component_id,
+        "name": name,
+        "attributes": {
+            "Bauteilkategorie": kategorie,
+            "Hersteller": hersteller,
+            "Typ": typ,
+            "Beschreibung": beschreibung
+        }
+    }
+    if score is not None:
+        entry["attributes"]["Score"] = score
+    return entry
+
+
+def _process_node(process_id, info, children):
+    name, prozessart, merkmalsklasse = info
+    return {
+        "id": process_id,
+        "name": name,
+        "attributes": {
+            "Prozessart": prozessart,
+            "Merkmalsklasse 1": merkmalsklasse
+        },
+        "children": children
+    }
+
+
+def acyclic_links(links, root_ids):
+    """
+    Drop the links that close a cycle
+
+    Args:
+        links (dict): {process id: [sub-process ids]}
+        root_ids (list): Traversal start points, in order
+
+    Returns:
+        tuple: ({process id: [kept sub-process ids]}, [(parent id, child id) dropped])
+    """
+    ON_PATH, DONE = 1, 2
+    state = {}
+    kept = {}
+    cycles = []
+    for root_id in list(root_ids) + list(links):
+        if root_id in state:
+            continue
+        state[root_id] = ON_PATH
+        kept[root_id] = []
+        stack = [(root_id, iter(links.get(root_id, ())))]
+        while stack:
+            process_id, children = stack[-1]
+            child_id = next(children, None)
+            if child_id is None:
+                state[process_id] = DONE
+                stack.pop()
+                continue
+            if state.get(child_id) == ON_PATH:
+                cycles.append((process_id, child_id))
+                continue
+            kept[process_id].append(child_id)
+            if child_id not in state:
+                state[child_id] = ON_PATH
+                kept[child_id] = []
+                stack.append((child_id, iter(links.get(child_id, ()))))
+    return kept, cycles
+
+
+class HierarchyBuilder:
+    """Memoizing builder of process entries over an acyclic view of the links"""
+
+    def __init__(self, links, root_ids, process_info, leaves, has_mappings):
+        """
+        Args:
+            links (dict): {process id: [sub-process ids]} (hauptprozess_map)
+            root_ids (list): Hauptprozess ids in output order
+            process_info (callable): process id -> (name, Prozessart, Merkmalsklasse 1) or None
+            leaves (callable): process id -> list of Bauteil leaf entries (new dicts per call)
+            has_mappings (callable): process id -> whether any Bauteil is mapped to it (before filtering)
+        """
+        self.root_ids = list(root_ids)
+        self.links, self.cycles = acyclic_links(links, self.root_ids)
+        self.process_info = process_info
+        self.leaves = leaves
+        self.has_mappings = has_mappings
+        self._nodes = {}
+
+    def warnings(self):
+        """Messages for the links dropped because they close a cycle"""
+        return [f"link {parent_id} -> {child_id} closes a cycle and is ignored" for parent_id, child_id in self.cycles]
+
+    def reachable(self, start_ids):
+        """Process ids below start_ids (inclusive), for batch-loading their rows"""
+        seen = set()
+        stack = list(start_ids)
+        while stack:
+            process_id = stack.pop()
+            if process_id not in seen:
+                seen.add(process_id)
+                stack.extend(self.links.get(process_id, ()))
+        return seen
+
+    def node(self, process_id):
+        """
+        Sub-process node with its complete subtree, built once per process
+
+        Args:
+            process_id (str): Process id
+
+        Returns:
+            dict: {"id", "name", "attributes", "children"}
+        """
+        # Post-order without recursion: a node is built once all its sub-processes are
+        stack = [(process_id, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if current in self._nodes:
+                continue
+            children = self.links.get(current, ())
+            if not expanded:
+                stack.append((current, True))
+                stack.extend((child_id, False) for child_id in reversed(children) if child_id not in self._nodes)
+                continue
+            info = self.process_info(current) or ((f"Partial Solution {current}",) + UNKNOWN_PROCESS)
+            self._nodes[current] = _process_node(
+                current, info, [self._nodes[child_id] for child_id in children] + self.leaves(current))
+        return self._nodes[process_id]
+
+    def entry(self, root_id):
+        """Process entry of one Hauptprozess as served by /api/mindmaps"""
+        info = self.process_info(root_id) or ((f"Process {root_id}",) + UNKNOWN_PROCESS)
+        data = _process_node(root_id, info, [self.node(child_id) for child_id in self.links.get(root_id, ())])
+        # Processes with no partial solutions but with building blocks
+        if not self.links.get(root_id) and self.has_mappings(root_id):
+            data["children"].append({
+                "id": f"direct_{root_id}",
+                "name": "Direct Components",
+                "attributes": {},
+                "children": self.leaves(root_id)
+            })
+        return {"id": f"Process_{root_id}", "title": info[0], "data": data}
+
+    def entries(self, root_ids=None):
+        """Process entries of the given Hauptprozesse (default: all roots)"""
+        return [self.entry(root_id) for root_id in (self.root_ids if root_ids is None else root_ids)]
+
+
+def unshare_subtrees(roots):
+    """
+    Give every position in a hierarchy its own node dicts (in place)
+
+    Args:
+        roots (list): Node dicts, e.g. the ``data`` of every process entry
+    """
+    seen = {id(root) for root in roots}
+    stack = list(roots)
+    while stack:
+        children = stack.pop().get('children')
+        if not children:
+            continue
+        for i, child in enumerate(children):
+            if id(child) in seen:
+                # Shallow copy with its own children list; its children are copied when reached
+                child = dict(child)
+                if 'children' in child:
+                    child['children'] = list(child['children'])
+                children[i] = child
+            seen.add(id(child))
+            stack.append(child)
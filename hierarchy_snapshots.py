@@ -0,0 +1,250 @@
+"""
+Versioned snapshots of the mind-map hierarchy with structural diffs.
+
+Every distinct hierarchy built by process_data.py (identified by the hash of
+its input files) is stored once as a numbered snapshot:
+
+    snapshots/index.json     [{"version", "source_hash", "created"}, ...]
+    snapshots/v<N>.json      hierarchy of version N
+
+Only the newest ``keep`` snapshots are retained. changes_since(V) diffs
+snapshot V against the newest one and returns patch operations addressed by
+node id paths ([Process node id, sub-process id, ..., Bauteil id], any depth):
+
+    {"op": "add",     "path": [...], "kind": k, "index": i, "node": {...}}
+    {"op": "remove",  "path": [...], "kind": k}
+    {"op": "update",  "path": [...], "kind": k, "changes": {"name": [old, new], "attributes.Typ": [old, new]}}
+    {"op": "reorder", "path": [...], "children": [child ids in new order]}
+
+``kind`` is the type of the node, not its depth: "process" (Hauptprozess
+entry), "partial_solution" (sub-process or Direct Components node at any
+depth) or "component" (Bauteil leaf).
+
+A version that is no longer retained yields ``"full": true`` plus the whole
+snapshot, so clients can always resynchronize.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DEFAULT_KEEP = 10
+LOCK_TIMEOUT = 10.0  # Seconds after which a lock directory is considered stale
+
+
+def _node_id(node):
+    return str(node['id'])
+
+
+def _node_children(node):
+    """Children of a process entry (under data) or of a tree node"""
+    if 'data' in node:
+        return node['data'].get('children', [])
+    return node.get('children', [])
+
+
+def _node_kind(node):
+    """Type of a node: process entry, inner (sub-process / Direct Components) node or Bauteil leaf"""
+    if 'data' in node:
+        return 'process'
+    return 'partial_solution' if 'children' in node else 'component'
+
+
+def _node_fields(node):
+    """Comparable scalar fields of a node, flattened ("attributes.Typ")"""
+    fields = {}
+    for key in ('title', 'name'):
+        if key in node:
+            fields[key] = node[key]
+    if 'data' in node:
+        fields['name'] = node['data'].get('name')
+        attributes = node['data'].get('attributes', {})
+    else:
+        attributes = node.get('attributes', {})
+    for key, value in attributes.items():
+        fields[f'attributes.{key}'] = value
+    return fields
+
+
+def diff_hierarchies(old, new):
+    """
+    Structural patch turning one hierarchy into another
+
+    Args:
+        old (list): process_data.build_hierarchy output
+        new (list): process_data.build_hierarchy output
+
+    Returns:
+        list: Patch operations (see module docstring), parents before children
+    """
+    ops = []
+    # (path of the parent, old children, new children); the root list has the empty path
+    stack = [([], old, new)]
+    while stack:
+        path, old_children, new_children = stack.pop()
+        old_by_id = {_node_id(n): n for n in old_children}
+        new_by_id = {_node_id(n): n for n in new_children}
+
+        for node_id in old_by_id:
+            if node_id not in new_by_id:
+                ops.append({"op": "remove", "path": path + [node_id], "kind": _node_kind(old_by_id[node_id])})
+
+        for index, node in enumerate(new_children):
+            node_id = _node_id(node)
+            if node_id not in old_by_id:
+                ops.append({"op": "add", "path": path + [node_id], "kind": _node_kind(node), "index": index,
+                            "node": node})
+                continue
+            old_node = old_by_id[node_id]
+            old_fields, new_fields = _node_fields(old_node), _node_fields(node)
+            changes = {
+                key: [old_fields.get(key), new_fields.get(key)]
+                for key in list(old_fields) + [k for k in new_fields if k not in old_fields]
+                if old_fields.get(key) != new_fields.get(key)
+            }
+            if changes:
+                ops.append({"op": "update", "path": path + [node_id], "kind": _node_kind(node), "changes": changes})
+            stack.append((path + [node_id], _node_children(old_node), _node_children(node)))
+
+        kept_old = [i for i in old_by_id if i in new_by_id]
+        kept_new = [_node_id(n) for n in new_children if _node_id(n) in old_by_id]
+        if kept_old != kept_new:
+            ops.append({"op": "reorder", "path": path, "children": [_node_id(n) for n in new_children]})
+    return ops
+
+
+def summarize(ops):
+    """Counts of added/removed/updated processes, sub-process nodes (any depth) and component links"""
+    kinds = {'process': 'processes', 'partial_solution': 'partial_solutions', 'component': 'components'}
+    summary = {key: {'added': 0, 'removed': 0, 'updated': 0} for key in kinds.values()}
+    verbs = {'add': 'added', 'remove': 'removed', 'update': 'updated'}
+    for op in ops:
+        if op['op'] in verbs:
+            summary[kinds[op['kind']]][verbs[op['op']]] += 1
+    return summary
+
+
+class SnapshotStore:
+    """Numbered hierarchy snapshots in one directory, newest ``keep`` retained"""
+
+    def __init__(self, directory, keep=DEFAULT_KEEP):
+        """
+        Args:
+            directory (str): Snapshot directory (created on first record)
+            keep (int): Number of snapshots retained
+        """
+        self.directory = directory
+        self.keep = keep
+
+    def _path(self, version):
+        return os.path.join(self.directory, f'v{version}.json')
+
+    def _write_json(self, path, payload, **kwargs):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, **kwargs)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _lock(self):
+        """Exclusive lock across processes (mkdir is atomic on every platform)"""
+        lock_dir = os.path.join(self.directory, '.lock')
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.mkdir(lock_dir)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    # Left behind by a crashed writer
+                    os.rmdir(lock_dir)
+                    deadline = time.monotonic() + LOCK_TIMEOUT
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.rmdir(lock_dir)
+
+    def versions(self):
+        """Retained snapshot entries, oldest first"""
+        try:
+            with open(os.path.join(self.directory, 'index.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def latest(self):
+        """Newest snapshot entry or None"""
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def load(self, version):
+        """Hierarchy of a retained version (None when it was pruned)"""
+        try:
+            with open(self._path(version), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def record(self, source_hash, build_output):
+        """
+        Snapshot version for the current inputs, creating it when the inputs changed
+
+        Args:
+            source_hash (str): Hash of the hierarchy inputs
+            build_output (callable): () -> hierarchy list, only called for a new version
+
+        Returns:
+            tuple: (version, hierarchy)
+        """
+        latest = self.latest()
+        if latest and latest['source_hash'] == source_hash:
+            output = self.load(latest['version'])
+            if output is not None:
+                return latest['version'], output
+
+        output = build_output()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock():
+            versions = self.versions()
+            if versions and versions[-1]['source_hash'] == source_hash:
+                # Recorded by a concurrent request in the meantime
+                return versions[-1]['version'], output
+            version = versions[-1]['version'] + 1 if versions else 1
+            self._write_json(self._path(version), output, separators=(',', ':'))
+            versions.append({
+                'version': version,
+                'source_hash': source_hash,
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            })
+            for entry in versions[:-self.keep]:
+                try:
+                    os.remove(self._path(entry['version']))
+                except FileNotFoundError:
+                    pass
+            self._write_json(os.path.join(self.directory, 'index.json'), versions[-self.keep:], indent=2)
+        return version, output
+
+    def changes_since(self, since, source_hash, build_output):
+        """
+        Patch from version ``since`` to the current hierarchy
+
+        Args:
+            since (int): Version the client has
+            source_hash (str): Hash of the current hierarchy inputs
+            build_output (callable): () -> current hierarchy list
+
+        Returns:
+            dict: {"version", "since", "full", "ops", "summary"} or, when ``since`` is
+            no longer retained, {"version", "since", "full": true, "snapshot"}
+        """
+        version, output = self.record(source_hash, build_output)
+        if since == version:
+            return {"version": version, "since": since, "full": False, "ops": [], "summary": summarize([])}
+        base = self.load(since) if 0 < since < version else None
+        if base is None:
+            return {"version": version, "since": since, "full": True, "snapshot": output}
+        ops = diff_hierarchies(base, output)
+        return {"version": version, "since": since, "full": False, "ops": ops, "summary": summarize(ops)}
@@ -0,0 +1,286 @@
+"""
+SQLite store of the mind-map inputs.
+
+hierarchy.sqlite holds the content of the four JSON inputs of process_data.py
+(plus the mapper's scores) as indexed tables:
+
+    processes   (id, name, prozessart, merkmalsklasse_1, record)
+    components  (id, name, bauteilkategorie, hersteller, typ, beschreibung, record)
+    roots       (position, process_id)                        hauptprozess_map key order
+    links       (parent_id, position, child_id)               hauptprozess_map values
+    mappings    (process_id, position, component_id, score)   enhanced_matrix.json
+
+``record`` keeps the complete sheet row as JSON. Tree, subtree and lookup
+requests become indexed queries over the rows involved instead of parsing
+every file on each request. The database runs in WAL mode and write_store
+replaces all rows in one transaction, so readers keep serving the previous
+state until the new one is committed.
+
+When hierarchy.sqlite exists it is authoritative: process_data.py serves the
+hierarchy from it without reading or hashing the JSON files, which may be
+absent, and builds the search, property and mapping indexes from its rows
+(HierarchyStore.inputs). Every write_store records a new generation stamp,
+which keys the response and snapshot caches in place of the input file hashes.
+"""
+
+import json
+import os
+import sqlite3
+import uuid
+
+from hierarchy_builder import HierarchyBuilder, component_leaf
+
+STORE_VERSION = 3
+STORE_FILE = 'hierarchy.sqlite'
+CHUNK_SIZE = 500  # Ids bound per IN (...) query, below SQLite's host parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS processes (
+    id TEXT PRIMARY KEY, name, prozessart, merkmalsklasse_1, record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS components (
+    id TEXT PRIMARY KEY, name, bauteilkategorie, hersteller, typ, beschreibung, record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roots (position INTEGER PRIMARY KEY, process_id TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS links (
+    parent_id TEXT NOT NULL, position INTEGER NOT NULL, child_id TEXT NOT NULL,
+    PRIMARY KEY (parent_id, position)
+);
+CREATE TABLE IF NOT EXISTS mappings (
+    process_id TEXT NOT NULL, position INTEGER NOT NULL, component_id TEXT NOT NULL, score REAL,
+    PRIMARY KEY (process_id, position)
+);
+CREATE INDEX IF NOT EXISTS roots_process ON roots (process_id);
+CREATE INDEX IF NOT EXISTS links_child ON links (child_id);
+CREATE INDEX IF NOT EXISTS mappings_component ON mappings (component_id);
+"""
+
+class StoreError(Exception):
+    """Raised when a database is missing or was written by an incompatible version"""
+
+
+def connect(db_path):
+    """Connection with WAL journaling, so a writer does not block readers"""
+    conn = sqlite3.connect(db_path, timeout=10.0)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+
+def write_store(db_path, data):
+    """
+    Replace the content of a store with one set of inputs (single transaction)
+
+    Args:
+        db_path (str): Database file (created when missing)
+        data (dict): Inputs in the shape of process_data.load_data (the four JSON
+            documents plus ``mapping_scores`` {(process id, component id): score})
+
+    Returns:
+        str: Generation stamp of the written content
+    """
+    generation = uuid.uuid4().hex
+    conn = connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            for table in ('processes', 'components', 'roots', 'links', 'mappings'):
+                conn.execute(f'DELETE FROM {table}')
+
+            # Later rows win on duplicate ids, as in process_data.build_lookups
+            conn.executemany(
+                'INSERT OR REPLACE INTO processes VALUES (?, ?, ?, ?, ?)',
+                ((str(int(p['Prozessnummer'])), p['Prozessname'], p['Prozessart'], p.get('Merkmalsklasse 1', ''),
+                  json.dumps(p, ensure_ascii=False))
+                 for p in data['process_data'] if p['Prozessnummer']))
+            conn.executemany(
+                'INSERT OR REPLACE INTO components VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((str(c['Lfd. Nummer']), c['Bauteilnamen'], c['Bauteilkategorie'], c['Hersteller'], c['Typ'],
+                  c.get('Beschreibung', ''), json.dumps(c, ensure_ascii=False))
+                 for c in data['component_data'] if c['Lfd. Nummer']))
+
+            hauptprozess_map = data['hauptprozess_map']
+            conn.executemany('INSERT INTO roots VALUES (?, ?)', enumerate(hauptprozess_map))
+            conn.executemany(
+                'INSERT INTO links VALUES (?, ?, ?)',
+                ((parent_id, position, str(child_id))
+                 for parent_id, children in hauptprozess_map.items()
+                 for position, child_id in enumerate(children)))
+
+            scores = data.get('mapping_scores', {})
+            conn.executemany(
+                'INSERT INTO mappings VALUES (?, ?, ?, ?)',
+                ((process_id, position, str(component_id), scores.get((process_id, str(component_id))))
+                 for process_id, component_ids in data['enhanced_matrix'].items()
+                 for position, component_id in enumerate(component_ids)))
+
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (STORE_VERSION,))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (generation,))
+    finally:
+        conn.close()
+    return generation
+
+
+def _placeholders(values):
+    return ','.join('?' * len(values))
+
+
+def _chunks(values):
+    """Consecutive slices of at most CHUNK_SIZE values"""
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+class HierarchyStore:
+    """Read side of hierarchy.sqlite producing process_data.build_hierarchy entries"""
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): Database written by write_store
+        """
+        if not os.path.exists(db_path):
+            raise StoreError(f"Store '{db_path}' not found")
+        # Read-only URI: a reader never creates or modifies the database
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=10.0)
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.DatabaseError as e:
+            raise StoreError(f"Store '{db_path}' is not readable: {e}")
+        if row is None or row[0] != STORE_VERSION:
+            raise StoreError(f"Unsupported store version in '{db_path}'")
+        # Changes with every write_store, so it identifies the served content
+        self.generation = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Lookups
+
+    def process(self, process_id):
+        """Full sheet row of a process (None when unknown)"""
+        row = self.conn.execute('SELECT record FROM processes WHERE id = ?', (str(process_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def component(self, component_id):
+        """Full sheet row of a Bauteil (None when unknown)"""
+        row = self.conn.execute('SELECT record FROM components WHERE id = ?', (str(component_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def inputs(self):
+        """
+        Stored content in the shape of process_data.load_data (rows in insertion order)
+
+        Used to build the search, property and mapping indexes when the store
+        replaces the JSON files.
+        """
+        links = {}
+        for parent_id, child_id in self.conn.execute('SELECT parent_id, child_id FROM links '
+                                                     'ORDER BY parent_id, position'):
+            links.setdefault(parent_id, []).append(child_id)
+        enhanced_matrix, mapping_scores = {}, {}
+        for process_id, component_id, score in self.conn.execute(
+                'SELECT process_id, component_id, score FROM mappings ORDER BY rowid'):
+            enhanced_matrix.setdefault(process_id, []).append(component_id)
+            if score is not None:
+                mapping_scores[(process_id, component_id)] = score
+        return {
+            'hauptprozess_map': {process_id: links.get(process_id, []) for (process_id,) in
+                                 self.conn.execute('SELECT process_id FROM roots ORDER BY position')},
+            'enhanced_matrix': enhanced_matrix,
+            'process_data': [json.loads(r) for (r,) in self.conn.execute('SELECT record FROM processes ORDER BY rowid')],
+            'component_data': [json.loads(r) for (r,) in
+                               self.conn.execute('SELECT record FROM components ORDER BY rowid')],
+            'mapping_scores': mapping_scores,
+        }
+
+    # Tree
+
+    def _process_info(self, process_ids):
+        info = {}
+        for chunk in _chunks(process_ids):
+            rows = self.conn.execute(
+                f'SELECT id, name, prozessart, merkmalsklasse_1 FROM processes WHERE id IN ({_placeholders(chunk)})',
+                chunk)
+            info.update((row[0], row[1:]) for row in rows)
+        return info
+
+    def _mapping_rows(self, process_ids):
+        """{process id: [(component id, score, Bauteil columns or None)]} in mapping order"""
+        rows = {process_id: [] for process_id in process_ids}
+        for chunk in _chunks(process_ids):
+            for process_id, component_id, score, known, *columns in self.conn.execute(
+                    'SELECT m.process_id, m.component_id, m.score, c.id IS NOT NULL, c.name, c.bauteilkategorie, '
+                    'c.hersteller, c.typ, c.beschreibung FROM mappings m LEFT JOIN components c ON c.id = m.component_id '
+                    f'WHERE m.process_id IN ({_placeholders(chunk)}) ORDER BY m.process_id, m.position',
+                    chunk):
+                rows[process_id].append((component_id, score, columns if known else None))
+        return rows
+
+    def _leaves(self, mapping_rows, component_filter):
+        """Bauteil leaf entries of one node (new dicts per call, callers annotate them in place)"""
+        return [component_leaf(component_id, columns, score) for component_id, score, columns in mapping_rows
+                if component_filter is None or int(component_id) in component_filter]
+
+    def _builder(self, start_ids, component_filter):
+        """
+        HierarchyBuilder with process and mapping rows loaded for the processes below start_ids
+
+        All links are read, so cyclic links are cut exactly as for the JSON inputs.
+        """
+        root_ids = [row[0] for row in self.conn.execute('SELECT process_id FROM roots ORDER BY position')]
+        links = {}
+        for parent_id, child_id in self.conn.execute('SELECT parent_id, child_id FROM links '
+                                                     'ORDER BY parent_id, position'):
+            links.setdefault(parent_id, []).append(child_id)
+
+        info, mapping_rows = {}, {}
+        builder = HierarchyBuilder(links, root_ids, info.get,
+                                   lambda process_id: self._leaves(mapping_rows[process_id], component_filter),
+                                   lambda process_id: bool(mapping_rows[process_id]))
+        process_ids = sorted(builder.reachable(start_ids))
+        if process_ids:
+            info.update(self._process_info(process_ids))
+            mapping_rows.update(self._mapping_rows(process_ids))
+        return builder
+
+    def hierarchy(self, component_filter=None):
+        """
+        Complete hierarchy, identical to process_data.build_hierarchy on the same inputs
+
+        Args:
+            component_filter (set): Only keep Bauteil leaves with these Lfd. Nummer (None keeps all)
+
+        Returns:
+            list: Process entries
+        """
+        root_ids = [row[0] for row in self.conn.execute('SELECT process_id FROM roots ORDER BY position')]
+        return self._builder(root_ids, component_filter).entries()
+
+    def subtree(self, node_id, component_filter=None):
+        """
+        Hierarchy below one node, touching only its process and mapping rows
+
+        Args:
+            node_id (str): Hauptprozess id or ``Process_<id>`` (returns its process entry) or
+                sub-process id at any depth (returns that node with its subtree)
+            component_filter (set): Only keep Bauteil leaves with these Lfd. Nummer (None keeps all)
+
+        Returns:
+            dict: Process entry or sub-process node, None when the id is not in the hierarchy
+        """
+        node_id = str(node_id)
+        root_id = node_id[len('Process_'):] if node_id.startswith('Process_') else node_id
+        if self.conn.execute('SELECT 1 FROM roots WHERE process_id = ?', (root_id,)).fetchone():
+            return self._builder([root_id], component_filter).entry(root_id)
+
+        if self.conn.execute('SELECT 1 FROM links WHERE child_id = ? LIMIT 1', (node_id,)).fetchone() is None:
+            return None
+        return self._builder([node_id], component_filter).node(node_id)
@@ -0,0 +1,101 @@
+"""
+Persisted indexes and caches kept in step with the files they are derived from.
+
+The mapping, search and property indexes and the layout cache are all built
+from a few input files and stored next to them. load_or_build validates a
+persisted object in two steps:
+
+    1. size and modification time of every source file (one stat each); when
+       they match the recorded signature the object is served as is
+    2. otherwise the SHA-256 of the sources; when the content is unchanged
+       (e.g. the files were copied) only the new signature is recorded,
+       else the object is rebuilt
+
+Cached objects carry ``source_hash`` and ``source_signature`` attributes and
+a ``save(path)`` method. Only stdlib is imported here, so hashing never pays
+for numpy.
+"""
+
+import hashlib
+import os
+
+
+def file_hash(file_path):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_hash(directory, names, salt=''):
+    """
+    Combined SHA-256 of several files in a directory (missing files are skipped)
+
+    Args:
+        directory (str): Directory containing the files
+        names (tuple): File names, hashed in this order
+        salt (str): Extra text mixed in, e.g. a format version or parameters
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256(salt.encode())
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            digest.update(f'{name}:{file_hash(path)}'.encode())
+    return digest.hexdigest()
+
+
+def file_signature(file_path):
+    """[size, mtime in ns] of a file (None when missing), the cheap staleness check before hashing"""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_or_build(cache_path, source_paths, load, build, salt=''):
+    """
+    Load a persisted object, rebuilding it when missing or stale
+
+    Args:
+        cache_path (str): File the object is persisted in
+        source_paths (list): Files the object is derived from (missing files are skipped)
+        load (callable): cache_path -> object; raises ValueError, KeyError or OSError when unusable
+        build (callable): () -> new object
+        salt (str): Format version or parameters the object also depends on
+
+    Returns:
+        Object matching the current sources
+    """
+    signature = [salt] + [file_signature(path) for path in source_paths]
+    cached = None
+    if os.path.exists(cache_path):
+        try:
+            cached = load(cache_path)
+        except (ValueError, KeyError, OSError):
+            cached = None
+        if cached is not None and cached.source_signature == signature:
+            return cached
+
+    digest = hashlib.sha256(salt.encode())
+    for path in source_paths:
+        if os.path.exists(path):
+            digest.update(f'{os.path.basename(path)}:{file_hash(path)}'.encode())
+    source_hash = digest.hexdigest()
+
+    if cached is None or cached.source_hash != source_hash:
+        cached = build()
+        cached.source_hash = source_hash
+    # Same content under a new size/time (e.g. a copy): keep the object, record the new signature
+    cached.source_signature = signature
+    try:
+        cached.save(cache_path)
+    except OSError:
+        # Read-only data directory: serve the in-memory object
+        pass
+    return cached
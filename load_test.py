@@ -0,0 +1,393 @@
+"""
+Load-test harness for the /api/mindmaps path.
+
+Starts a local stand-in for server.js that answers GET /api/mindmaps in one of
+four modes and drives it with concurrent closed-loop clients:
+
+    snapshot   like server.js: the ``python process_data.py --snapshot`` manifest
+               is cached until an input file's size or mtime changes, then the
+               precompressed response file it names is streamed (or 304)
+    spawn      one ``python process_data.py`` per request, output re-serialized
+               (server.js before precompressed snapshots)
+    resident   process_data.load_data + build_hierarchy in the server process
+    cached     resident, with the JSON body cached until an input file changes
+
+Clients send ``--accept-encoding`` (browser default), so snapshot responses are
+measured with the encoding a browser would receive.
+
+Data sizes are synthetic copies of the bundled JSON inputs (every copy shifts
+Prozessnummer and Lfd. Nummer), so scale 10 serves ten times the hierarchy.
+For every mode x data size x concurrency level it reports throughput,
+p50/p95/p99 latency and the CPU time and peak RSS of the Python side (the
+stand-in server plus the process_data.py children it spawned).
+
+Usage:
+    python load_test.py --modes snapshot spawn cached --scales 1 10 --concurrency 1 4 16 --requests 200
+    python load_test.py --url http://localhost:5000/api/mindmaps --concurrency 1 8   # real server
+"""
+
+import argparse
+import http.client
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import process_data
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(BASE_PATH, 'process_data.py')
+INPUT_FILES = ('hauptprozess_map.json', 'enhanced_matrix.json', 'process_data.json', 'component_data.json')
+MODES = ('snapshot', 'spawn', 'resident', 'cached')
+ACCEPT_ENCODING = 'gzip, deflate, br'
+ID_STRIDE = 1_000_000  # Id offset between synthetic copies
+
+
+def scale_data(source_dir, target_dir, scale):
+    """
+    Write ``scale`` id-shifted copies of the JSON inputs into target_dir
+
+    Args:
+        source_dir (str): Directory with the bundled inputs
+        target_dir (str): Output directory (created if missing)
+        scale (int): Number of copies (1 copies the inputs unchanged)
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    data = {name: process_data.load_json_file(os.path.join(source_dir, name)) for name in INPUT_FILES}
+    shift = lambda value, i: str(int(value) + i * ID_STRIDE)
+
+    hauptprozess_map, enhanced_matrix, processes, components = {}, {}, [], []
+    for i in range(scale):
+        for process_id, partial_solution_ids in data['hauptprozess_map.json'].items():
+            hauptprozess_map[shift(process_id, i)] = [shift(ps, i) for ps in partial_solution_ids]
+        for process_id, component_ids in data['enhanced_matrix.json'].items():
+            enhanced_matrix[shift(process_id, i)] = [int(shift(c, i)) for c in component_ids]
+        for p in data['process_data.json']:
+            processes.append(dict(p, Prozessnummer=int(shift(p['Prozessnummer'], i)) if p['Prozessnummer'] else p['Prozessnummer']))
+        for c in data['component_data.json']:
+            components.append(dict(c, **{'Lfd. Nummer': int(shift(c['Lfd. Nummer'], i)) if c['Lfd. Nummer'] else c['Lfd. Nummer']}))
+
+    for name, payload in zip(INPUT_FILES, (hauptprozess_map, enhanced_matrix, processes, components)):
+        with open(os.path.join(target_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+
+def python_side_usage():
+    """CPU seconds and peak RSS (MiB) of this process and its waited-for children"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in KiB on Linux
+    return {
+        'cpu_seconds': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'server_max_rss_mb': own.ru_maxrss / 1024,
+        'child_max_rss_mb': children.ru_maxrss / 1024,
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """GET /api/mindmaps in the server's mode, GET /stats for resource usage"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._send(200, json.dumps(python_side_usage()).encode())
+        if urlsplit(self.path).path != '/api/mindmaps':
+            return self._send(404, b'Not found', 'text/plain')
+        if self.server.mode == 'snapshot':
+            return self._send_snapshot()
+        try:
+            body = self.server.render()
+        except Exception as e:
+            return self._send(500, f'Server error: {e}'.encode(), 'text/plain')
+        self._send(200, body)
+
+    def _send_snapshot(self):
+        """Same as server.js sendHierarchySnapshot: pick the variant, answer 304 or stream the file"""
+        try:
+            variants = self.server.snapshot_manifest()['variants']
+        except Exception as e:
+            return self._send(500, f'Server error: {e}'.encode(), 'text/plain')
+
+        accepted = {value.split(';')[0].strip() for value in self.headers.get('Accept-Encoding', '').split(',')}
+        encoding = next((e for e in ('br', 'gzip') if e in variants and e in accepted), 'identity')
+        variant = variants[encoding]
+        etags = {v['etag'] for v in variants.values()}
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and any(tag.strip().removeprefix('W/') in etags | {'*'} for tag in if_none_match.split(',')):
+            self.send_response(304)
+            self.send_header('ETag', variant['etag'])
+            self.end_headers()
+            return
+
+        with open(variant['path'], 'rb') as f:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(variant['length']))
+            self.send_header('ETag', variant['etag'])
+            if encoding != 'identity':
+                self.send_header('Content-Encoding', encoding)
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local stand-in for server.js serving one data directory in one mode"""
+
+    daemon_threads = True
+
+    def __init__(self, address, mode, data_dir):
+        super().__init__(address, StandInHandler)
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.data_dir = data_dir
+        self._cache_key = None
+        self._cache_body = None
+        self._cache_lock = threading.Lock()
+        self._manifest_key = None
+        self._manifest = None
+
+    def render(self):
+        """Response body of one /api/mindmaps request"""
+        if self.mode == 'spawn':
+            # Same as server.js sendProcessData: run the script, fail on a non-zero exit, re-serialize
+            return json.dumps(json.loads(self._run_script()), ensure_ascii=False).encode('utf-8')
+
+        if self.mode == 'resident':
+            return self._build()
+
+        key = tuple(os.stat(os.path.join(self.data_dir, name)).st_mtime_ns for name in INPUT_FILES)
+        with self._cache_lock:
+            if key != self._cache_key:
+                self._cache_body = self._build()
+                self._cache_key = key
+            return self._cache_body
+
+    def snapshot_manifest(self):
+        """Manifest of ``process_data.py --snapshot``, only re-run when an input's (size, mtime) changed"""
+        key = tuple((stat.st_size, stat.st_mtime_ns) for stat in
+                    (os.stat(os.path.join(self.data_dir, name)) for name in INPUT_FILES))
+        with self._cache_lock:
+            if key != self._manifest_key:
+                self._manifest = json.loads(self._run_script('--snapshot'))
+                self._manifest_key = key
+            return self._manifest
+
+    def _run_script(self, *args):
+        completed = subprocess.run([sys.executable, SCRIPT_PATH, *args, '--data-dir', self.data_dir],
+                                   capture_output=True, check=False)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.decode('utf-8', 'replace'))
+        return completed.stdout
+
+    def _build(self):
+        data_path = process_data.resolve_data_path(self.data_dir)
+        output = process_data.build_hierarchy(process_data.load_data(data_path))
+        return json.dumps(output, ensure_ascii=False).encode('utf-8')
+
+
+def serve(mode, data_dir, port):
+    """Run the stand-in server in the foreground (used as the server subprocess)"""
+    server = StandInServer(('127.0.0.1', port), mode, data_dir)
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+def start_stand_in(mode, data_dir):
+    """
+    Start the stand-in server as a separate process, so its CPU and RSS are not
+    mixed with the load generator's
+
+    Returns:
+        tuple: (subprocess.Popen, base URL)
+    """
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, '--data-dir', data_dir,
+                             '--port', '0'], stdout=subprocess.PIPE, text=True)
+    port = int(proc.stdout.readline())
+    return proc, f'http://127.0.0.1:{port}'
+
+
+def fetch(url, headers=None):
+    """GET a URL on a fresh connection (like a browser tab); returns (status, body bytes as sent)"""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+    try:
+        conn.request('GET', parts.path + (f'?{parts.query}' if parts.query else ''), headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_load(url, concurrency, requests, warmup=2, accept_encoding=ACCEPT_ENCODING):
+    """
+    Closed-loop load: ``concurrency`` clients issue ``requests`` requests in total
+
+    Args:
+        accept_encoding (str): Accept-Encoding header of every request ('' for identity)
+
+    Returns:
+        dict: Throughput, latency percentiles (ms), errors and response size (as transferred)
+    """
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    for _ in range(warmup):
+        fetch(url, headers)
+
+    latencies = []
+    errors = []
+    sizes = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                status, body = fetch(url, headers)
+                ok = status == 200
+            except OSError as e:
+                ok, status, body = False, str(e), b''
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                    sizes.append(len(body))
+                else:
+                    errors.append(status)
+
+    wall_start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'response_kb': round(sizes[0] / 1024, 1) if sizes else None,
+    }
+
+
+def run_scenarios(modes, scales, concurrency_levels, requests, source_dir=BASE_PATH,
+                  accept_encoding=ACCEPT_ENCODING):
+    """
+    Sweep modes x data scales x concurrency levels against local stand-in servers
+
+    Returns:
+        list: One result dict per scenario
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='mindmap_load_')
+    try:
+        for scale in scales:
+            data_dir = os.path.join(work_dir, f'scale_{scale}')
+            scale_data(source_dir, data_dir, scale)
+            for mode in modes:
+                proc, base_url = start_stand_in(mode, data_dir)
+                try:
+                    for concurrency in concurrency_levels:
+                        before = json.loads(fetch(f'{base_url}/stats')[1])
+                        result = run_load(f'{base_url}/api/mindmaps', concurrency, requests,
+                                          accept_encoding=accept_encoding)
+                        after = json.loads(fetch(f'{base_url}/stats')[1])
+                        result.update({
+                            'mode': mode,
+                            'scale': scale,
+                            'cpu_ms_per_request': round(
+                                (after['cpu_seconds'] - before['cpu_seconds']) * 1000 / max(requests, 1), 2),
+                            'server_max_rss_mb': round(after['server_max_rss_mb'], 1),
+                            'child_max_rss_mb': round(after['child_max_rss_mb'], 1),
+                        })
+                        print_result(result)
+                        results.append(result)
+                finally:
+                    proc.terminate()
+                    proc.wait()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def print_result(result):
+    print(f"{result.get('mode', 'url'):>8} x{result.get('scale', '-'):<4} c={result['concurrency']:<3} "
+          f"{result['throughput_rps']:>8} req/s  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+          f"p99 {result['p99_ms']} ms  errors {result['errors']}"
+          + (f"  cpu {result['cpu_ms_per_request']} ms/req  rss {result['server_max_rss_mb']}"
+             f"/{result['child_max_rss_mb']} MiB" if 'cpu_ms_per_request' in result else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the /api/mindmaps path")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=100, help="Requests per scenario")
+    parser.add_argument('--url', default=None, help="Drive a running server instead of the stand-in")
+    parser.add_argument('--accept-encoding', default=ACCEPT_ENCODING,
+                        help="Accept-Encoding sent by the clients ('' requests identity)")
+    parser.add_argument('--output', default=None, help="Write all results as JSON")
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--data-dir', default=BASE_PATH, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.data_dir, args.port)
+
+    if args.url:
+        results = []
+        for concurrency in args.concurrency:
+            result = run_load(args.url, concurrency, args.requests, accept_encoding=args.accept_encoding)
+            print_result(result)
+            results.append(result)
+    else:
+        results = run_scenarios(args.modes, args.scales, args.concurrency, args.requests,
+                                accept_encoding=args.accept_encoding)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
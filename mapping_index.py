@@ -0,0 +1,252 @@
+"""
+Bipartite process <-> component index over enhanced_matrix.json.
+
+enhanced_matrix.json only lists components per process. MappingIndex stores
+the same edges twice in CSR form (process -> components and
+component -> processes) as flat integer arrays, so where-used, shared
+component and co-occurrence lookups only touch the rows involved instead of
+scanning every mapping. Ids are found by binary search over a sorted
+permutation, so a lookup needs no dict over all ids either.
+
+The index is persisted next to the matrix as enhanced_matrix.index.npz (same
+CSR layout as the mapper's enhanced_results.npz) and its arrays are read on
+first use. Staleness is checked by index_cache.load_or_build (size and
+modification time first, SHA-256 only when they changed). Without numpy the
+index is built in memory from the matrix on every call.
+"""
+
+import json
+import zipfile
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Re-exported: callers import the hashing helpers from here
+from index_cache import file_hash, file_signature, files_hash, load_or_build  # noqa: F401
+
+INDEX_VERSION = 3
+ARRAYS = ('process_ids', 'component_ids', 'process_order', 'component_order', 'process_offsets',
+          'process_indices', 'component_offsets', 'component_indices')
+
+
+def _numpy():
+    """numpy, imported on first use (None when missing), so importing this module stays cheap"""
+    try:
+        import numpy
+    except ImportError:  # Persisting the index needs numpy; lookups work on plain arrays
+        return None
+    return numpy
+
+
+def index_path_for(matrix_path):
+    """enhanced_matrix.json -> enhanced_matrix.index.npz"""
+    root, _ = os.path.splitext(matrix_path)
+    return f'{root}.index.npz'
+
+
+def _csr(rows, n_rows):
+    """Offsets and sorted, de-duplicated column indices from a list of column lists"""
+    offsets = array('l', [0])
+    indices = array('l')
+    for r in range(n_rows):
+        indices.extend(sorted(set(rows[r])))
+        offsets.append(len(indices))
+    return offsets, indices
+
+
+def _row(ids, order, key):
+    """Row of key in ids (None when missing), by binary search over the sorted permutation order"""
+    position = bisect_left(order, key, key=lambda row: ids[row])
+    if position < len(order) and ids[order[position]] == key:
+        return int(order[position])
+    return None
+
+
+class MappingIndex:
+    """CSR adjacency in both directions of the process <-> component mapping"""
+
+    def __init__(self, arrays, source_hash=None, source_signature=None):
+        """
+        Args:
+            arrays (Mapping): The ARRAYS by name, either in memory or an open .npz read on access:
+                process_ids / component_ids: Prozessnummer / Lfd. Nummer (str) per row
+                process_order / component_order: Rows sorted by id
+                process_offsets, process_indices: CSR process row -> component rows
+                component_offsets, component_indices: CSR component row -> process rows
+            source_hash (str): SHA-256 of the matrix file the index was built from
+            source_signature (list): Signature recorded by index_cache.load_or_build
+        """
+        self._arrays = arrays
+        self.source_hash = source_hash
+        self.source_signature = source_signature
+
+    def __getattr__(self, name):
+        # Arrays are read from the .npz on first use, so a lookup only loads what it touches
+        if name not in ARRAYS:
+            raise AttributeError(name)
+        value = self.__dict__[name] = self._arrays[name]
+        return value
+
+    @classmethod
+    def from_matrix(cls, enhanced_matrix, source_hash=None, source_signature=None):
+        """
+        Build the index from an enhanced_matrix mapping
+
+        Args:
+            enhanced_matrix (dict): {Prozessnummer: [Lfd. Nummer, ...]}
+            source_hash (str): Hash recorded for staleness checks
+            source_signature (list): Signature recorded for staleness checks
+
+        Returns:
+            MappingIndex: New index
+        """
+        process_ids = [str(p) for p in enhanced_matrix]
+        component_row = {}
+        process_rows = []
+        for components in enhanced_matrix.values():
+            row = []
+            for c in components:
+                row.append(component_row.setdefault(str(c), len(component_row)))
+            process_rows.append(row)
+
+        component_rows = [[] for _ in component_row]
+        for p, row in enumerate(process_rows):
+            for c in row:
+                component_rows[c].append(p)
+
+        component_ids = list(component_row)
+        process_offsets, process_indices = _csr(process_rows, len(process_ids))
+        component_offsets, component_indices = _csr(component_rows, len(component_ids))
+        return cls({
+            'process_ids': process_ids,
+            'component_ids': component_ids,
+            'process_order': array('l', sorted(range(len(process_ids)), key=process_ids.__getitem__)),
+            'component_order': array('l', sorted(range(len(component_ids)), key=component_ids.__getitem__)),
+            'process_offsets': process_offsets,
+            'process_indices': process_indices,
+            'component_offsets': component_offsets,
+            'component_indices': component_indices,
+        }, source_hash, source_signature)
+
+    def save(self, index_path):
+        """Write the index as .npz (written to a temp file, then renamed); needs numpy"""
+        np = _numpy()
+        arrays = {name: np.array(getattr(self, name), dtype=str if name.endswith('_ids') else np.int64)
+                  for name in ARRAYS}
+        tmp_path = f'{index_path}.{os.getpid()}.tmp'
+        # Uncompressed, so loading an array is a plain read
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=np.array(INDEX_VERSION), source_hash=np.array(self.source_hash or ''),
+                     source_signature=np.array(json.dumps(self.source_signature)), **arrays)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path):
+        """
+        Open an index written by ``save``; its arrays are read on first use
+
+        Raises:
+            ValueError: When the file is damaged or was written by another index version
+        """
+        try:
+            data = _numpy().load(index_path, allow_pickle=False)
+        except (zipfile.BadZipFile, EOFError) as e:
+            raise ValueError(f"Unreadable index '{index_path}': {e}")
+        if int(data['version']) != INDEX_VERSION:
+            data.close()
+            raise ValueError(f"Unsupported index version in '{index_path}'")
+        return cls(data, str(data['source_hash']) or None, json.loads(str(data['source_signature'])))
+
+    def _process_row(self, process_id):
+        return _row(self.process_ids, self.process_order, str(process_id))
+
+    def _component_row(self, component_id):
+        return _row(self.component_ids, self.component_order, str(component_id))
+
+    def _process_rows_of(self, component_row):
+        offsets = self.component_offsets
+        return self.component_indices[offsets[component_row]:offsets[component_row + 1]].tolist()
+
+    def _component_rows_of(self, process_row):
+        offsets = self.process_offsets
+        return self.process_indices[offsets[process_row]:offsets[process_row + 1]].tolist()
+
+    def where_used(self, component_id):
+        """Prozessnummer of every process a Bauteil is mapped to"""
+        row = self._component_row(component_id)
+        if row is None:
+            return []
+        return [str(self.process_ids[p]) for p in self._process_rows_of(row)]
+
+    def components_of(self, process_id):
+        """Lfd. Nummer of every Bauteil mapped to a process"""
+        row = self._process_row(process_id)
+        if row is None:
+            return []
+        return [str(self.component_ids[c]) for c in self._component_rows_of(row)]
+
+    def shared_components(self, process_a, process_b):
+        """Bauteile mapped to both processes (merge of two sorted CSR rows)"""
+        row_a = self._process_row(process_a)
+        row_b = self._process_row(process_b)
+        if row_a is None or row_b is None:
+            return []
+        a, b = self._component_rows_of(row_a), self._component_rows_of(row_b)
+        shared = []
+        i = j = 0
+        while i < len(a) and j < len(b):
+            if a[i] == b[j]:
+                shared.append(str(self.component_ids[a[i]]))
+                i += 1
+                j += 1
+            elif a[i] < b[j]:
+                i += 1
+            else:
+                j += 1
+        return shared
+
+    def co_occurring(self, component_id, limit=None):
+        """
+        Bauteile mapped to the same processes as a given Bauteil
+
+        Args:
+            component_id: Lfd. Nummer
+            limit (int): Maximum number of results (None for all)
+
+        Returns:
+            list: [{"id": Lfd. Nummer, "count": shared processes}, ...], most frequent first
+        """
+        row = self._component_row(component_id)
+        if row is None:
+            return []
+        counts = Counter()
+        for p in self._process_rows_of(row):
+            counts.update(self._component_rows_of(p))
+        del counts[row]
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"id": str(self.component_ids[c]), "count": n} for c, n in ranked]
+
+
+def load_or_build_index(matrix_path, index_path=None, load_matrix=None):
+    """
+    Load the persisted index, rebuilding it when missing or stale
+
+    Args:
+        matrix_path (str): Path to enhanced_matrix.json, or to the file load_matrix reads
+        index_path (str): Index path (defaults to <matrix>.index.npz)
+        load_matrix (callable): () -> enhanced_matrix mapping (default: parse matrix_path)
+
+    Returns:
+        MappingIndex: Index matching the current matrix file
+    """
+    def build():
+        if load_matrix is not None:
+            return MappingIndex.from_matrix(load_matrix())
+        with open(matrix_path, 'r', encoding='utf-8') as f:
+            return MappingIndex.from_matrix(json.load(f))
+
+    if _numpy() is None:
+        return build()
+    return load_or_build(index_path or index_path_for(matrix_path), [matrix_path], MappingIndex.load, build,
+                         salt=f'mapping-index-{INDEX_VERSION}')
@@ -0,0 +1,262 @@
+"""
+Tidy-tree (Reingold-Tilford) layout of the mind-map hierarchy.
+
+Implements the linear-time variant of Buchheim, Jünger and Leipert with the
+same spacing rules as d3.tree (siblings one unit apart, cousins two), so the
+coordinates match what src/components/MindMap.js would compute for the fully
+expanded tree. Both walks are iterative, so hierarchies with thousands of
+Bauteil leaves neither hit the recursion limit nor stall the browser.
+
+Every node of a laid-out process gets
+
+    "layout": {"x": breadth px, "y": depth px, "depth": level,
+               "extent": [min x, max x] of its subtree}
+
+and laid-out hierarchies are cached as mindmap_layout.json next to the inputs.
+"""
+
+import json
+import os
+
+from hierarchy_builder import unshare_subtrees
+from index_cache import load_or_build
+
+LAYOUT_VERSION = 1
+
+# Pixel spacing between adjacent leaves and between levels (MindMap.js uses depth * 260)
+BREADTH_SPACING = 80
+DEPTH_SPACING = 260
+
+
+class _LayoutNode:
+    """Working state of one node during the Buchheim walks"""
+
+    __slots__ = ('data', 'parent', 'children', 'number', 'x', 'prelim', 'mod', 'thread',
+                 'ancestor', 'change', 'shift', 'midpoint', 'depth')
+
+    def __init__(self, data, parent, number, depth):
+        self.data = data
+        self.parent = parent
+        self.children = []
+        self.number = number  # 1-based position among the siblings
+        self.prelim = 0.0
+        self.mod = 0.0
+        self.thread = None
+        self.ancestor = self
+        self.change = 0.0
+        self.shift = 0.0
+        self.midpoint = 0.0
+        self.depth = depth
+        self.x = 0.0
+
+    def left(self):
+        return self.thread or (self.children[0] if self.children else None)
+
+    def right(self):
+        return self.thread or (self.children[-1] if self.children else None)
+
+    def left_brother(self):
+        return self.parent.children[self.number - 2] if self.parent and self.number > 1 else None
+
+    def leftmost_sibling(self):
+        return self.parent.children[0] if self.parent and self.number > 1 else None
+
+
+def _separation(a, b):
+    """d3.tree default: 1 between siblings, 2 between cousins"""
+    return 1.0 if a.parent is b.parent else 2.0
+
+
+def _build(root_data):
+    """Working tree of a hierarchy dict plus its nodes in pre-order"""
+    root = _LayoutNode(root_data, None, 1, 0)
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        for number, child_data in enumerate(node.data.get('children') or [], 1):
+            node.children.append(_LayoutNode(child_data, node, number, node.depth + 1))
+        stack.extend(reversed(node.children))
+    return root, order
+
+
+def _move_subtree(wl, wr, shift):
+    subtrees = wr.number - wl.number
+    wr.change -= shift / subtrees
+    wr.shift += shift
+    wl.change += shift / subtrees
+    wr.prelim += shift
+    wr.mod += shift
+
+
+def _execute_shifts(v):
+    shift = change = 0.0
+    for w in reversed(v.children):
+        w.prelim += shift
+        w.mod += shift
+        change += w.change
+        shift += w.shift + change
+
+
+def _apportion(v, default_ancestor):
+    """Push subtree v right of its left siblings' contours"""
+    w = v.left_brother()
+    if w is None:
+        return default_ancestor
+    v_ir = v_or = v
+    v_il = w
+    v_ol = v.leftmost_sibling()
+    s_ir = s_or = v.mod
+    s_il = v_il.mod
+    s_ol = v_ol.mod
+    while v_il.right() and v_ir.left():
+        v_il = v_il.right()
+        v_ir = v_ir.left()
+        v_ol = v_ol.left()
+        v_or = v_or.right()
+        v_or.ancestor = v
+        shift = (v_il.prelim + s_il) - (v_ir.prelim + s_ir) + _separation(v_il, v_ir)
+        if shift > 0:
+            ancestor = v_il.ancestor if v_il.ancestor.parent is v.parent else default_ancestor
+            _move_subtree(ancestor, v, shift)
+            s_ir += shift
+            s_or += shift
+        s_il += v_il.mod
+        s_ir += v_ir.mod
+        s_ol += v_ol.mod
+        s_or += v_or.mod
+    if v_il.right() and not v_or.right():
+        v_or.thread = v_il.right()
+        v_or.mod += s_il - s_or
+    else:
+        if v_ir.left() and not v_ol.left():
+            v_ol.thread = v_ir.left()
+            v_ol.mod += s_ir - s_ol
+        default_ancestor = v
+    return default_ancestor
+
+
+def _place(w):
+    """Preliminary x of w relative to its left brother (first-walk step for w)"""
+    brother = w.left_brother()
+    if not w.children:
+        w.prelim = brother.prelim + _separation(brother, w) if brother else 0.0
+    elif brother:
+        w.prelim = brother.prelim + _separation(brother, w)
+        w.mod = w.prelim - w.midpoint
+    else:
+        w.prelim = w.midpoint
+
+
+def layout_tree(root_data, breadth_spacing=BREADTH_SPACING, depth_spacing=DEPTH_SPACING):
+    """
+    Compute a tidy-tree layout and attach it to every node in place
+
+    Args:
+        root_data (dict): Node with an optional ``children`` list (e.g. a process entry's ``data``)
+        breadth_spacing (float): Pixels between adjacent siblings
+        depth_spacing (float): Pixels between levels
+
+    Returns:
+        dict: {"width", "height"} of the laid-out tree in pixels
+    """
+    # Shared sub-process subtrees get one copy per position, each with its own coordinates
+    unshare_subtrees([root_data])
+    root, order = _build(root_data)
+
+    # First walk in post-order: lay out each subtree, then pack its children left to right
+    for v in reversed(order):
+        if v.children:
+            default_ancestor = v.children[0]
+            for w in v.children:
+                _place(w)
+                default_ancestor = _apportion(w, default_ancestor)
+            _execute_shifts(v)
+            v.midpoint = (v.children[0].prelim + v.children[-1].prelim) / 2
+    _place(root)
+
+    # Second walk in pre-order: accumulate modifiers into final positions
+    modsum = {id(root): 0.0}
+    for v in order:
+        m = modsum.pop(id(v))
+        v.x = v.prelim + m
+        for w in v.children:
+            modsum[id(w)] = m + v.mod
+
+    min_x = min(v.x for v in order)
+    extents = {}
+    for v in reversed(order):
+        lo = hi = v.x
+        for w in v.children:
+            w_lo, w_hi = extents[id(w)]
+            lo, hi = min(lo, w_lo), max(hi, w_hi)
+        extents[id(v)] = (lo, hi)
+
+    for v in order:
+        lo, hi = extents[id(v)]
+        v.data['layout'] = {
+            'x': round((v.x - min_x) * breadth_spacing, 2),
+            'y': v.depth * depth_spacing,
+            'depth': v.depth,
+            'extent': [round((lo - min_x) * breadth_spacing, 2), round((hi - min_x) * breadth_spacing, 2)],
+        }
+    lo, hi = extents[id(root)]
+    return {
+        'width': round((hi - lo) * breadth_spacing, 2),
+        'height': max(v.depth for v in order) * depth_spacing,
+    }
+
+
+def layout_hierarchy(output, breadth_spacing=BREADTH_SPACING, depth_spacing=DEPTH_SPACING):
+    """Lay out every process entry of process_data.build_hierarchy output (in place)"""
+    unshare_subtrees([process_entry['data'] for process_entry in output])
+    for process_entry in output:
+        process_entry['layout'] = layout_tree(process_entry['data'], breadth_spacing, depth_spacing)
+    return output
+
+
+class LayoutCache:
+    """Laid-out hierarchy persisted as mindmap_layout.json (see index_cache.load_or_build)"""
+
+    def __init__(self, output, source_hash=None, source_signature=None):
+        self.output = output
+        self.source_hash = source_hash
+        self.source_signature = source_signature
+
+    def save(self, cache_path):
+        """Write the cache as JSON (written to a temp file, then renamed)"""
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source_hash': self.source_hash, 'source_signature': self.source_signature,
+                       'output': self.output}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+
+    @classmethod
+    def load(cls, cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        return cls(cached['output'], cached.get('source_hash'), cached.get('source_signature'))
+
+
+def load_or_build_layout(data_path, build_output, source_files, breadth_spacing=BREADTH_SPACING,
+                         depth_spacing=DEPTH_SPACING, cache_path=None):
+    """
+    Laid-out hierarchy from the cache, recomputed when inputs or spacing change
+
+    Args:
+        data_path (str): Directory with the inputs
+        build_output (callable): () -> hierarchy list (process_data.build_hierarchy)
+        source_files (tuple): Input file names the hierarchy depends on (missing files are skipped)
+        breadth_spacing (float): Pixels between adjacent siblings
+        depth_spacing (float): Pixels between levels
+        cache_path (str): Cache file (defaults to <data_path>/mindmap_layout.json)
+
+    Returns:
+        list: Hierarchy with layout attributes
+    """
+    cache_path = cache_path or os.path.join(data_path, 'mindmap_layout.json')
+    return load_or_build(
+        cache_path, [os.path.join(data_path, name) for name in source_files], LayoutCache.load,
+        lambda: LayoutCache(layout_hierarchy(build_output(), breadth_spacing, depth_spacing)),
+        salt=f'{LAYOUT_VERSION}:{breadth_spacing}:{depth_spacing}').output
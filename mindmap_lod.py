@@ -0,0 +1,175 @@
+"""
+Level-of-detail aggregation of Bauteil leaves in the mind-map hierarchy.
+
+The Bauteil leaves of wide nodes (partial solutions and deeper sub-processes)
+are replaced by one aggregate node per Bauteilkategorie (or Hersteller) value
+with its count and a few representative Bauteile. At most ``max_groups``
+aggregates are emitted per node; the remaining values share one "Weitere"
+group, so a response stays bounded however many components map to a process.
+
+Aggregate ids encode where the group lives,
+
+    group|<Process node id>|<parent node id>|<field>|<value>
+
+so process_data.py --expand <id> (GET /api/mindmaps/groups/<id>) returns
+exactly the leaves behind one aggregate.
+"""
+
+from collections import Counter
+from urllib.parse import quote, unquote
+
+from hierarchy_builder import unshare_subtrees
+
+GROUP_FIELDS = ('Bauteilkategorie', 'Hersteller')
+GROUP_PREFIX = 'group'
+OTHER_VALUE = '*'  # Value part of the id of the "Weitere" group
+
+MAX_LEAVES = 10  # Nodes with at most this many leaves are left as they are
+MAX_GROUPS = 8
+REPRESENTATIVES = 3
+
+
+class GroupNotFound(KeyError):
+    """Raised when an aggregate id does not resolve to a node of the hierarchy"""
+
+
+def group_id(process_node_id, parent_id, field, value):
+    """Stable id of one aggregate node"""
+    return '|'.join([GROUP_PREFIX, quote(process_node_id, safe=''), quote(parent_id, safe=''), field,
+                     quote(value, safe='')])
+
+
+def parse_group_id(aggregate_id):
+    """
+    Split an aggregate id
+
+    Returns:
+        tuple: (process node id, parent node id, field, value)
+    """
+    parts = aggregate_id.split('|')
+    if len(parts) != 5 or parts[0] != GROUP_PREFIX or parts[3] not in GROUP_FIELDS:
+        raise GroupNotFound(aggregate_id)
+    return unquote(parts[1]), unquote(parts[2]), parts[3], unquote(parts[4])
+
+
+def _leaf_value(leaf, field):
+    return str(leaf.get('attributes', {}).get(field) or '').strip()
+
+
+def _ranked_values(leaves, field, max_groups):
+    """Group values by descending count (ties by value); the tail is folded into OTHER_VALUE"""
+    counts = Counter(_leaf_value(leaf, field) for leaf in leaves)
+    ranked = sorted(counts, key=lambda value: (-counts[value], value))
+    if len(ranked) > max_groups:
+        return ranked[:max_groups - 1], True
+    return ranked, False
+
+
+def _group_leaves(leaves, field, max_groups):
+    """{value: leaves} in display order, OTHER_VALUE last when values were folded"""
+    kept, folded = _ranked_values(leaves, field, max_groups)
+    groups = {value: [] for value in kept}
+    if folded:
+        groups[OTHER_VALUE] = []
+    kept = set(kept)
+    for leaf in leaves:
+        value = _leaf_value(leaf, field)
+        groups[value if value in kept else OTHER_VALUE].append(leaf)
+    return groups
+
+
+def _aggregate_node(process_node_id, parent_id, field, value, leaves, representatives):
+    if value == OTHER_VALUE:
+        name = f"Weitere ({len(leaves)})"
+    else:
+        name = f"{value or f'Ohne {field}'} ({len(leaves)})"
+    # Leaves keep the mapper's best-first order; with scores, show the best scored ones
+    shown = leaves[:representatives]
+    scored = [leaf for leaf in leaves if 'Score' in leaf.get('attributes', {})]
+    if scored:
+        shown = sorted(scored, key=lambda leaf: -leaf['attributes']['Score'])[:representatives]
+    return {
+        "id": group_id(process_node_id, parent_id, field, value),
+        "name": name,
+        "attributes": {
+            "group_by": field,
+            "value": None if value == OTHER_VALUE else value,
+            "count": len(leaves),
+        },
+        "representatives": [{"id": leaf['id'], "name": leaf['name']} for leaf in shown],
+        "expandable": True,
+    }
+
+
+def _inner_nodes(process_entry):
+    """Nodes below a process entry that have children (partial solutions and deeper sub-processes)"""
+    stack = list(reversed(process_entry['data']['children']))
+    while stack:
+        node = stack.pop()
+        if 'children' in node:
+            yield node
+            stack.extend(reversed(node['children']))
+
+
+def _split_children(node):
+    """(sub-process children, Bauteil leaves) of a node"""
+    subprocesses = [child for child in node['children'] if 'children' in child]
+    leaves = [child for child in node['children'] if 'children' not in child]
+    return subprocesses, leaves
+
+
+def aggregate_hierarchy(output, field='Bauteilkategorie', max_leaves=MAX_LEAVES, max_groups=MAX_GROUPS,
+                        representatives=REPRESENTATIVES):
+    """
+    Replace the Bauteil leaves of wide nodes by aggregate nodes (in place)
+
+    Args:
+        output (list): process_data.build_hierarchy output
+        field (str): Leaf attribute to group by (see GROUP_FIELDS)
+        max_leaves (int): Nodes with at most this many leaves keep them
+        max_groups (int): Maximum aggregates per node (the last one collects the rest)
+        representatives (int): Example Bauteile listed per aggregate
+
+    Returns:
+        list: The aggregated hierarchy
+    """
+    if field not in GROUP_FIELDS:
+        raise ValueError(f"Cannot group by '{field}', expected one of {GROUP_FIELDS}")
+    # Every position of a shared sub-process is aggregated on its own copy
+    unshare_subtrees([process_entry['data'] for process_entry in output])
+    for process_entry in output:
+        for node in list(_inner_nodes(process_entry)):
+            subprocesses, leaves = _split_children(node)
+            if len(leaves) <= max_leaves:
+                continue
+            node['children'] = subprocesses + [
+                _aggregate_node(process_entry['id'], node['id'], field, value, group, representatives)
+                for value, group in _group_leaves(leaves, field, max_groups).items()
+            ]
+            node['attributes'] = dict(node['attributes'], Bauteile=len(leaves))
+    return output
+
+
+def expand_group(output, aggregate_id, max_groups=MAX_GROUPS):
+    """
+    Leaves behind one aggregate node
+
+    Args:
+        output (list): Un-aggregated process_data.build_hierarchy output
+        aggregate_id (str): Id of an aggregate node
+        max_groups (int): Must match the value used for aggregation (decides the "Weitere" group)
+
+    Returns:
+        list: Full Bauteil leaf entries of the group
+    """
+    process_node_id, parent_id, field, value = parse_group_id(aggregate_id)
+    for process_entry in output:
+        if process_entry['id'] != process_node_id:
+            continue
+        for node in _inner_nodes(process_entry):
+            if node['id'] == parent_id:
+                groups = _group_leaves(_split_children(node)[1], field, max_groups)
+                if value not in groups:
+                    raise GroupNotFound(aggregate_id)
+                return groups[value]
+    raise GroupNotFound(aggregate_id)
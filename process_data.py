@@ -157,10 +157,19 @@
 
 
 
+import argparse
+import hashlib
 import json
 import sys
 import os
 
+from hierarchy_builder import HierarchyBuilder, component_leaf
+
+# Inputs the hierarchy is built from when no SQLite store exists (caches and snapshots are keyed by their hashes)
+HIERARCHY_FILES = ('hauptprozess_map.json', 'enhanced_matrix.json', 'process_data.json',
+                   'component_data.json', 'enhanced_results.npz')
+STORE_FILE = 'hierarchy.sqlite'  # hierarchy_store.STORE_FILE, without importing it when no store exists
+
 def load_json_file(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -175,133 +184,357 @@ def load_json_file(file_path):
         print(f"Error: Failed to decode '{file_path}' as UTF-8: {e}", file=sys.stderr)
         sys.exit(1)
 
-# Get the directory of the script
-base_path = os.path.dirname(os.path.abspath(__file__))
-hauptprozess_map = load_json_file(f'{base_path}/hauptprozess_map.json')
-enhanced_matrix = load_json_file(f'{base_path}/enhanced_matrix.json')
-process_data = load_json_file(f'{base_path}/process_data.json')
-component_data = load_json_file(f'{base_path}/component_data.json')
-
-# Create lookup dictionaries with additional attributes
-process_lookup = {
-    str(int(p['Prozessnummer'])): {
-        'name': p['Prozessname'],
-        'Prozessart': p['Prozessart'],
-        'Merkmalsklasse 1': p.get('Merkmalsklasse 1', '')
-    } for p in process_data if p['Prozessnummer']
-}
-
-component_lookup = {
-    str(c['Lfd. Nummer']): {
-        'name': c['Bauteilnamen'],
-        'Bauteilkategorie': c['Bauteilkategorie'],
-        'Hersteller': c['Hersteller'],
-        'Typ': c['Typ'],
-        'Beschreibung': c.get('Beschreibung', '')
-    } for c in component_data if c['Lfd. Nummer']
-}
-
-# Initialize output list
-output = []
-
-# Iterate through hauptprozess_map to build the hierarchy
-for process_id, partial_solution_ids in hauptprozess_map.items():
-    process_info = process_lookup.get(process_id, {
-        'name': f"Process {process_id}",
-        'Prozessart': '',
-        'Merkmalsklasse 1': ''
-    })
-    
-    # Initialize process entry
-    process_entry = {
-        "id": f"Process_{process_id}",
-        "title": process_info['name'],
-        "data": {
-            "id": process_id,
-            "name": process_info['name'],
-            "attributes": {
-                "Prozessart": process_info['Prozessart'],
-                "Merkmalsklasse 1": process_info['Merkmalsklasse 1']
-            },
-            "children": []
-        }
+def load_mapping_scores(file_path):
+    """
+    Load final scores from the mapper's enhanced_results.npz, if present.
+    Returns {(process_id, component_id): score}; empty when the file or numpy is missing.
+    """
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        import numpy as np
+    except ImportError:
+        return {}
+    scores = {}
+    with np.load(file_path, allow_pickle=False) as data:
+        offsets = data['offsets']
+        component_ids = data['component_ids']
+        final = data['final']
+        for i, process_id in enumerate(data['process_ids']):
+            for j in range(offsets[i], offsets[i + 1]):
+                scores[(str(int(process_id)), str(int(component_ids[j])))] = round(float(final[j]), 3)
+    return scores
+
+def resolve_data_path(base_path):
+    """Directory holding the JSON inputs"""
+    # Mapping jobs publish complete data sets under current/ (see Create_data_files/mapping_jobs.py)
+    if os.path.isdir(os.path.join(base_path, 'current')):
+        return os.path.join(base_path, 'current')
+    return base_path
+
+def load_data(data_path):
+    """Load the four JSON inputs (and optional mapping scores) from data_path"""
+    return {
+        'hauptprozess_map': load_json_file(f'{data_path}/hauptprozess_map.json'),
+        'enhanced_matrix': load_json_file(f'{data_path}/enhanced_matrix.json'),
+        'process_data': load_json_file(f'{data_path}/process_data.json'),
+        'component_data': load_json_file(f'{data_path}/component_data.json'),
+        'mapping_scores': load_mapping_scores(f'{data_path}/enhanced_results.npz'),
     }
-    
-    # Add partial solutions (Level 2)
-    for ps_id in partial_solution_ids:
-        ps_info = process_lookup.get(ps_id, {
-            'name': f"Partial Solution {ps_id}",
-            'Prozessart': '',
-            'Merkmalsklasse 1': ''
-        })
-        ps_entry = {
-            "id": ps_id,
-            "name": ps_info['name'],
-            "attributes": {
-                "Prozessart": ps_info['Prozessart'],
-                "Merkmalsklasse 1": ps_info['Merkmalsklasse 1']
-            },
-            "children": []
-        }
-        
-        # Add building blocks (Level 3)
-        building_blocks = enhanced_matrix.get(ps_id, [])
-        for bb_id in building_blocks:
-            bb_info = component_lookup.get(str(bb_id), {
-                'name': f"Component {bb_id}",
-                'Bauteilkategorie': '',
-                'Hersteller': '',
-                'Typ': '',
-                'Beschreibung': ''
-            })
-            bb_entry = {
-                "id": str(bb_id),
-                "name": bb_info['name'],
-                "attributes": {
-                    "Bauteilkategorie": bb_info['Bauteilkategorie'],
-                    "Hersteller": bb_info['Hersteller'],
-                    "Typ": bb_info['Typ'],
-                    "Beschreibung": bb_info['Beschreibung']
-                }
-            }
-            ps_entry["children"].append(bb_entry)
-        
-        process_entry["data"]["children"].append(ps_entry)
-    
-    # Add processes with no partial solutions but with building blocks
-    if not partial_solution_ids and process_id in enhanced_matrix and enhanced_matrix[process_id]:
-        dummy_ps_entry = {
-            "id": f"direct_{process_id}",
-            "name": "Direct Components",
-            "attributes": {},
-            "children": []
-        }
-        for bb_id in enhanced_matrix[process_id]:
-            bb_info = component_lookup.get(str(bb_id), {
-                'name': f"Component {bb_id}",
-                'Bauteilkategorie': '',
-                'Hersteller': '',
-                'Typ': '',
-                'Beschreibung': ''
-            })
-            bb_entry = {
-                "id": str(bb_id),
-                "name": bb_info['name'],
-                "attributes": {
-                    "Bauteilkategorie": bb_info['Bauteilkategorie'],
-                    "Hersteller": bb_info['Hersteller'],
-                    "Typ": bb_info['Typ'],
-                    "Beschreibung": bb_info['Beschreibung']
-                }
-            }
-            dummy_ps_entry["children"].append(bb_entry)
-        process_entry["data"]["children"].append(dummy_ps_entry)
-    
-    output.append(process_entry)
 
-# Ensure UTF-8 encoding for stdout
-if hasattr(sys.stdout, 'reconfigure'):
-    sys.stdout.reconfigure(encoding='utf-8')
+def build_lookups(process_data, component_data):
+    """Create lookup dictionaries with additional attributes"""
+    process_lookup = {
+        str(int(p['Prozessnummer'])): {
+            'name': p['Prozessname'],
+            'Prozessart': p['Prozessart'],
+            'Merkmalsklasse 1': p.get('Merkmalsklasse 1', '')
+        } for p in process_data if p['Prozessnummer']
+    }
+
+    component_lookup = {
+        str(c['Lfd. Nummer']): {
+            'name': c['Bauteilnamen'],
+            'Bauteilkategorie': c['Bauteilkategorie'],
+            'Hersteller': c['Hersteller'],
+            'Typ': c['Typ'],
+            'Beschreibung': c.get('Beschreibung', '')
+        } for c in component_data if c['Lfd. Nummer']
+    }
+    return process_lookup, component_lookup
+
+def hierarchy_builder(data, component_filter=None):
+    """
+    HierarchyBuilder over the JSON inputs (see hierarchy_builder.py)
+
+    Args:
+        data (dict): Inputs loaded by load_data
+        component_filter (set): Only keep Bauteil leaves with these Lfd. Nummer (None keeps all)
+    """
+    hauptprozess_map = data['hauptprozess_map']
+    enhanced_matrix = data['enhanced_matrix']
+    mapping_scores = data['mapping_scores']
+    process_lookup, component_lookup = build_lookups(data['process_data'], data['component_data'])
+
+    def process_info(process_id):
+        info = process_lookup.get(process_id)
+        return (info['name'], info['Prozessart'], info['Merkmalsklasse 1']) if info else None
+
+    def leaves(process_id):
+        entries = []
+        for bb_id in enhanced_matrix.get(process_id, []):
+            if component_filter is not None and int(bb_id) not in component_filter:
+                continue
+            bb_info = component_lookup.get(str(bb_id))
+            if bb_info is not None:
+                bb_info = (bb_info['name'], bb_info['Bauteilkategorie'], bb_info['Hersteller'], bb_info['Typ'],
+                           bb_info['Beschreibung'])
+            entries.append(component_leaf(str(bb_id), bb_info, mapping_scores.get((process_id, str(bb_id)))))
+        return entries
+
+    return HierarchyBuilder(hauptprozess_map, list(hauptprozess_map), process_info, leaves,
+                            lambda process_id: bool(enhanced_matrix.get(process_id)))
+
+def build_hierarchy(data, component_filter=None):
+    """
+    Build the Process -> sub-process (any depth) -> Bauteil hierarchy served by /api/mindmaps
+
+    Args:
+        data (dict): Inputs loaded by load_data
+        component_filter (set): Only keep Bauteil leaves with these Lfd. Nummer (None keeps all)
+    """
+    return hierarchy_builder(data, component_filter).entries()
+
+def open_store(data_path):
+    """
+    HierarchyStore over data_path/hierarchy.sqlite, or None when the JSON files have to be read instead
+
+    A readable store is authoritative (the JSON files need not exist); the JSON
+    files are only used when no store was written or it was written by an
+    incompatible version.
+    """
+    if not os.path.exists(os.path.join(data_path, STORE_FILE)):
+        return None
+    from hierarchy_store import HierarchyStore, StoreError
+    try:
+        return HierarchyStore(os.path.join(data_path, STORE_FILE))
+    except StoreError:
+        return None
+
+def load_inputs(data_path):
+    """Inputs in the shape of load_data, from the SQLite store when present, otherwise from the JSON files"""
+    store = open_store(data_path)
+    if store is None:
+        return load_data(data_path)
+    with store:
+        return store.inputs()
+
+def input_files(data_path):
+    """Files the inputs are read from: the SQLite store when it is served, otherwise the JSON inputs"""
+    store = open_store(data_path)
+    if store is None:
+        return HIERARCHY_FILES
+    store.close()
+    return (STORE_FILE,)
+
+def inputs_hash(data_path, salt=''):
+    """
+    Key of the current input state: the store generation when hierarchy.sqlite is served,
+    otherwise the combined hash of the JSON inputs
+
+    Args:
+        data_path (str): Directory with the inputs
+        salt (str): Extra text mixed in, e.g. the request variant
+    """
+    store = open_store(data_path)
+    if store is not None:
+        with store:
+            return hashlib.sha256(f'{STORE_FILE}:{store.generation}:{salt}'.encode()).hexdigest()
+    from index_cache import files_hash
+    return files_hash(data_path, HIERARCHY_FILES, salt)
+
+def load_hierarchy(data_path, component_filter=None):
+    """Hierarchy from the SQLite store when present, otherwise built from the JSON files"""
+    store = open_store(data_path)
+    if store is None:
+        return build_hierarchy(load_data(data_path), component_filter)
+    with store:
+        return store.hierarchy(component_filter)
+
+def load_subtree(data_path, node_id, component_filter=None):
+    """
+    Hierarchy below one node (None when the id is not in the hierarchy)
+
+    Args:
+        data_path (str): Directory with the inputs
+        node_id (str): Hauptprozess id or Process_<id> (process entry) or sub-process id at any depth
+        component_filter (set): Only keep Bauteil leaves with these Lfd. Nummer (None keeps all)
+    """
+    store = open_store(data_path)
+    if store is not None:
+        with store:
+            return store.subtree(node_id, component_filter)
+    builder = hierarchy_builder(load_data(data_path), component_filter)
+    root_id = node_id[len('Process_'):] if node_id.startswith('Process_') else node_id
+    if root_id in builder.root_ids:
+        return builder.entry(root_id)
+    if any(node_id in children for children in builder.links.values()):
+        return builder.node(node_id)
+    return None
+
+def write_json(payload, indent=2):
+    """Write JSON to stdout as UTF-8 with no ASCII escaping"""
+    # Ensure UTF-8 encoding for stdout
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    json.dump(payload, sys.stdout, indent=indent, ensure_ascii=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the mind-map hierarchy (default) or answer lookups")
+    parser.add_argument('--where-used', metavar='BAUTEIL', help="Processes that use a Bauteil")
+    parser.add_argument('--components-of', metavar='PROZESS', help="Bauteile mapped to a process")
+    parser.add_argument('--shared', nargs=2, metavar='PROZESS', help="Bauteile shared by two processes")
+    parser.add_argument('--co-occurring', metavar='BAUTEIL', help="Bauteile most often mapped together with a Bauteil")
+    parser.add_argument('--search', metavar='QUERY', help="Ranked processes and Bauteile matching a (partial) name")
+    parser.add_argument('--kind', choices=['process', 'component'], help="Restrict --search to one kind")
+    parser.add_argument('--where', action='append', metavar='CONSTRAINT',
+                        help="Only keep Bauteile matching a property constraint, e.g. 'Traglast>=5' (repeatable)")
+    parser.add_argument('--find-components', action='store_true',
+                        help="With --where: list the matching Bauteile instead of the hierarchy")
+    parser.add_argument('--layout', action='store_true',
+                        help="Attach precomputed tidy-tree coordinates to every node (cached in mindmap_layout.json)")
+    parser.add_argument('--lod', choices=['Bauteilkategorie', 'Hersteller'],
+                        help="Group the Bauteile of wide nodes into expandable aggregates by this attribute")
+    parser.add_argument('--lod-max-leaves', type=int, default=10,
+                        help="With --lod: nodes with at most this many Bauteile are not grouped")
+    parser.add_argument('--expand', metavar='GROUP_ID', help="Bauteile behind one --lod aggregate node")
+    parser.add_argument('--versioned', action='store_true',
+                        help="Return {version, hierarchy}; every distinct input state is kept as a snapshot")
+    parser.add_argument('--since', type=int, metavar='VERSION',
+                        help="Return the structural changes from a snapshot version to the current hierarchy")
+    parser.add_argument('--keep-snapshots', type=int, default=10, help="Number of snapshots retained")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Print the manifest of the minified, gzip/brotli precompressed hierarchy response "
+                             "(kept under responses/) instead of the hierarchy")
+    parser.add_argument('--subtree', metavar='NODE',
+                        help="Hierarchy below one Hauptprozess (id or Process_<id>) or sub-process")
+    parser.add_argument('--process', metavar='PROZESS', help="Full sheet row of a process")
+    parser.add_argument('--component', metavar='BAUTEIL', help="Full sheet row of a Bauteil")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--data-dir', default=None, help="Directory with the JSON inputs (defaults to this script's)")
+    args = parser.parse_args(argv)
+
+    # Get the directory of the script
+    base_path = args.data_dir or os.path.dirname(os.path.abspath(__file__))
+    data_path = resolve_data_path(base_path)
+
+    if args.search is not None:
+        from search_index import SOURCE_FILES, load_or_build_search_index
+        sources = input_files(data_path)
+        index = load_or_build_search_index(data_path, load_inputs,
+                                           source_files=SOURCE_FILES if sources == HIERARCHY_FILES else sources)
+        write_json({"query": args.search, "hits": index.search(args.search, limit=args.limit, kind=args.kind)})
+        return
+
+    if args.process or args.component:
+        store = open_store(data_path)
+        if store is not None:
+            with store:
+                record = store.process(args.process) if args.process else store.component(args.component)
+        elif args.process:
+            record = next((p for p in load_json_file(f'{data_path}/process_data.json')
+                           if p['Prozessnummer'] and str(int(p['Prozessnummer'])) == args.process), None)
+        else:
+            record = next((c for c in load_json_file(f'{data_path}/component_data.json')
+                           if c['Lfd. Nummer'] and str(c['Lfd. Nummer']) == args.component), None)
+        if record is None:
+            print(f"Error: Unknown {'process' if args.process else 'Bauteil'} '{args.process or args.component}'",
+                  file=sys.stderr)
+            sys.exit(1)
+        write_json(record)
+        return
+
+    if args.where_used or args.components_of or args.shared or args.co_occurring:
+        from mapping_index import load_or_build_index
+        if input_files(data_path) == HIERARCHY_FILES:
+            index = load_or_build_index(f'{data_path}/enhanced_matrix.json')
+        else:
+            index = load_or_build_index(os.path.join(data_path, STORE_FILE),
+                                        os.path.join(data_path, 'enhanced_matrix.index.npz'),
+                                        lambda: load_inputs(data_path)['enhanced_matrix'])
+        if args.where_used:
+            write_json({"id": args.where_used, "processes": index.where_used(args.where_used)})
+        elif args.components_of:
+            write_json({"id": args.components_of, "components": index.components_of(args.components_of)})
+        elif args.shared:
+            write_json({"ids": args.shared, "components": index.shared_components(*args.shared)})
+        else:
+            write_json({"id": args.co_occurring,
+                        "components": index.co_occurring(args.co_occurring, limit=args.limit)})
+        return
+
+    component_filter = None
+    if args.where:
+        from property_index import PropertyQueryError, load_or_build_property_index
+        if input_files(data_path) == HIERARCHY_FILES:
+            index = load_or_build_property_index(f'{data_path}/component_data.json')
+        else:
+            index = load_or_build_property_index(os.path.join(data_path, STORE_FILE),
+                                                 os.path.join(data_path, 'property_index.json'),
+                                                 lambda: load_inputs(data_path)['component_data'])
+        try:
+            component_filter = index.filter(args.where)
+        except PropertyQueryError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.find_components:
+            write_json({"where": args.where, "components": sorted(component_filter)})
+            return
+
+    if args.subtree:
+        subtree = load_subtree(data_path, args.subtree, component_filter)
+        if subtree is None:
+            print(f"Error: Unknown node '{args.subtree}'", file=sys.stderr)
+            sys.exit(1)
+        if args.layout:
+            import mindmap_layout
+            mindmap_layout.layout_tree(subtree.get('data', subtree))
+        write_json(subtree)
+        return
+
+    if args.versioned or args.since is not None:
+        from hierarchy_snapshots import SnapshotStore
+        store = SnapshotStore(os.path.join(base_path, 'snapshots'), keep=args.keep_snapshots)
+        source_hash = inputs_hash(data_path)
+        build = lambda: load_hierarchy(data_path)
+        if args.since is not None:
+            write_json(store.changes_since(args.since, source_hash, build))
+        else:
+            version, output = store.record(source_hash, build)
+            write_json({"version": version, "hierarchy": output})
+        return
+
+    if args.expand:
+        from mindmap_lod import GroupNotFound, expand_group
+        try:
+            leaves = expand_group(load_hierarchy(data_path, component_filter), args.expand)
+        except GroupNotFound:
+            print(f"Error: Unknown group '{args.expand}'", file=sys.stderr)
+            sys.exit(1)
+        write_json({"id": args.expand, "children": leaves})
+        return
+
+    def build_output():
+        if args.lod:
+            from mindmap_lod import aggregate_hierarchy
+            output = aggregate_hierarchy(load_hierarchy(data_path, component_filter), args.lod,
+                                         max_leaves=args.lod_max_leaves)
+            if args.layout:
+                import mindmap_layout
+                mindmap_layout.layout_hierarchy(output)
+            return output
+
+        if args.layout:
+            import mindmap_layout
+            if component_filter is None:
+                return mindmap_layout.load_or_build_layout(
+                    data_path, lambda: load_hierarchy(data_path), input_files(data_path))
+            return mindmap_layout.layout_hierarchy(load_hierarchy(data_path, component_filter))
+
+        return load_hierarchy(data_path, component_filter)
+
+    if args.snapshot:
+        # Manifest of the minified, precompressed response (served by server.js with ETags)
+        from response_cache import load_or_build_response
+        variant = json.dumps({'where': args.where, 'lod': args.lod, 'lod_max_leaves': args.lod_max_leaves,
+                              'layout': args.layout}, sort_keys=True)
+        source_hash = inputs_hash(data_path, variant)
+        write_json(load_or_build_response(os.path.join(base_path, 'responses'), source_hash, build_output))
+        return
+
+    # Output JSON to stdout with no ASCII escaping
+    write_json(build_output())
 
-# Output JSON to stdout with no ASCII escaping
-json.dump(output, sys.stdout, indent=2, ensure_ascii=False)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""
+Columnar index over the Eigenschaft/Wert pairs of the Baukasten.
+
+component_data.json stores technical properties as ``Eigenschaft n`` /
+``Wert n`` pairs ("Traglast [kg]" = 6). PropertyIndex normalizes them per
+property name:
+
+    numeric values  -> sorted float arrays in the property's base unit
+                       (lengths in mm, masses in kg); ranges such as
+                       "0,03-1,5 m" keep their lower and upper bound
+    other values    -> folded value -> Lfd. Nummer postings
+
+Range constraints such as ``Traglast>=5`` or ``Reichweite>=0.8m`` are
+answered (a value without unit is in the unit of the property label, so
+``Länge>=8`` on "Länge [m]" means 8 m) with two binary searches per property. Results are sets of
+Lfd. Nummer usable as an API filter (process_data.py --where) and as the
+candidate pre-filter of the mapper (candidate_ids).
+"""
+
+import json
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from index_cache import load_or_build
+from search_index import fold
+
+INDEX_VERSION = 2
+
+# Factor to the base unit of each dimension
+UNIT_FACTORS = {
+    'mm': ('mm', 1.0), 'cm': ('mm', 10.0), 'm': ('mm', 1000.0),
+    'g': ('kg', 0.001), 'kg': ('kg', 1.0), 't': ('kg', 1000.0),
+}
+
+_NAME_RE = re.compile(r'^\s*(.*?)\s*(?:\[\s*([^\]]*?)\s*\])?\s*$')
+_NUMBER = r'[-+]?\d+(?:[.,]\d+)?'
+_VALUE_RE = re.compile(rf'^\s*({_NUMBER})\s*(?:-\s*({_NUMBER}))?\s*([a-zA-Z]*)\s*$')
+_CONSTRAINT_RE = re.compile(r'^\s*(.+?)\s*(>=|<=|=|>|<)\s*(.+?)\s*$')
+
+
+class PropertyQueryError(ValueError):
+    """Raised for constraints that cannot be parsed or compared"""
+
+
+def parse_property_name(label):
+    """
+    Split a property label into folded key, display name and unit
+
+    Args:
+        label (str): e.g. "Traglast [kg]"
+
+    Returns:
+        tuple: ("traglast", "Traglast", "kg") - unit is '' when absent
+    """
+    name, unit = _NAME_RE.match(str(label)).groups()
+    return fold(name), name, (unit or '').strip()
+
+
+def to_number(text):
+    """Float from a number with decimal point or comma"""
+    return float(str(text).replace(',', '.'))
+
+
+def parse_value(value, unit=''):
+    """
+    Numeric (low, high, base unit) of a property value, or None for non-numeric values
+
+    Args:
+        value: Wert cell (number or text such as "0,03-1,5 m")
+        unit (str): Unit from the property label
+
+    Returns:
+        tuple or None: (low, high, base unit)
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        low = high = float(value)
+        value_unit = ''
+    else:
+        match = _VALUE_RE.match(str(value))
+        if not match:
+            return None
+        low = to_number(match.group(1))
+        high = to_number(match.group(2)) if match.group(2) else low
+        value_unit = match.group(3)
+
+    base_unit, factor = UNIT_FACTORS.get((value_unit or unit).lower(), ((value_unit or unit), 1.0))
+    if value_unit and unit and value_unit.lower() not in UNIT_FACTORS and value_unit != unit:
+        return None
+    return low * factor, high * factor, base_unit
+
+
+def parse_constraint(expression):
+    """
+    Parse a constraint such as "Traglast>=5", "Reichweite >= 0,8 m" or "Protokoll=PROFINET"
+
+    Returns:
+        tuple: (property key, operator, raw value)
+    """
+    match = _CONSTRAINT_RE.match(expression)
+    if not match:
+        raise PropertyQueryError(f"Invalid constraint '{expression}' (expected e.g. 'Traglast>=5')")
+    name, operator, raw_value = match.groups()
+    return parse_property_name(name)[0], operator, raw_value
+
+
+def component_properties(record):
+    """(label, value) pairs of one component record, skipping empty and placeholder entries"""
+    pairs = []
+    for column, label in record.items():
+        if not column.startswith('Eigenschaft '):
+            continue
+        value = record.get(f"Wert {column[len('Eigenschaft '):]}")
+        if not label or str(label).strip() in ('', '-') or value is None or str(value).strip() == '':
+            continue
+        pairs.append((str(label).strip(), value))
+    return pairs
+
+
+class PropertyIndex:
+    """Per-property sorted numeric columns and categorical postings"""
+
+    def __init__(self, numeric, categorical, names, source_hash=None, source_signature=None):
+        """
+        Args:
+            numeric (dict): Key -> {"unit", "label_unit", "low", "low_ids", "high", "high_ids"} with
+                ``low``/``high`` sorted ascending (in the base ``unit``) and the ids aligned to them;
+                ``label_unit`` is the unit of the property label, used for constraints without unit
+            categorical (dict): Key -> {folded value: [Lfd. Nummer, ...]}
+            names (dict): Key -> display name
+            source_hash (str): Hash of the component file the index was built from
+            source_signature (list): Signature recorded by index_cache.load_or_build
+        """
+        self.numeric = {
+            key: {
+                'unit': column['unit'],
+                'label_unit': column['label_unit'],
+                'low': array('d', column['low']),
+                'low_ids': array('l', column['low_ids']),
+                'high': array('d', column['high']),
+                'high_ids': array('l', column['high_ids']),
+            } for key, column in numeric.items()
+        }
+        self.categorical = {key: {v: set(ids) for v, ids in values.items()} for key, values in categorical.items()}
+        self.names = names
+        self.source_hash = source_hash
+        self.source_signature = source_signature
+
+    @classmethod
+    def from_records(cls, records, source_hash=None):
+        """
+        Build the index from Baukasten records (component_data.json or DataFrame.to_dict('records'))
+
+        Returns:
+            PropertyIndex: New index
+        """
+        ranges = {}
+        units = {}
+        label_units = {}
+        categorical = {}
+        names = {}
+        for record in records:
+            lfd_nummer = record.get('Lfd. Nummer')
+            if lfd_nummer is None or lfd_nummer == '' or lfd_nummer != lfd_nummer:
+                continue
+            lfd_nummer = int(lfd_nummer)
+            for label, value in component_properties(record):
+                key, name, unit = parse_property_name(label)
+                names.setdefault(key, name)
+                parsed = parse_value(value, unit)
+                if parsed is not None and units.setdefault(key, parsed[2]) == parsed[2]:
+                    label_units.setdefault(key, unit)
+                    ranges.setdefault(key, []).append((parsed[0], parsed[1], lfd_nummer))
+                else:
+                    categorical.setdefault(key, {}).setdefault(fold(str(value)).strip(), []).append(lfd_nummer)
+
+        numeric = {}
+        for key, entries in ranges.items():
+            by_low = sorted((low, lfd) for low, _, lfd in entries)
+            by_high = sorted((high, lfd) for _, high, lfd in entries)
+            numeric[key] = {
+                'unit': units[key],
+                'label_unit': label_units[key],
+                'low': [v for v, _ in by_low], 'low_ids': [i for _, i in by_low],
+                'high': [v for v, _ in by_high], 'high_ids': [i for _, i in by_high],
+            }
+        return cls(numeric, categorical, names, source_hash)
+
+    def save(self, index_path):
+        """Write the index as JSON (written to a temp file, then renamed)"""
+        payload = {
+            'version': INDEX_VERSION,
+            'source_hash': self.source_hash,
+            'source_signature': self.source_signature,
+            'names': self.names,
+            'numeric': {key: {name: (list(v) if isinstance(v, array) else v) for name, v in column.items()}
+                        for key, column in self.numeric.items()},
+            'categorical': {key: {v: sorted(ids) for v, ids in values.items()}
+                            for key, values in self.categorical.items()},
+        }
+        tmp_path = f'{index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path):
+        """Read an index written by ``save``"""
+        with open(index_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in '{index_path}'")
+        return cls(payload['numeric'], payload['categorical'], payload['names'], payload.get('source_hash'),
+                   payload.get('source_signature'))
+
+    def properties(self):
+        """Indexed properties: {display name: unit or None for categorical}"""
+        listing = {self.names[key]: column['unit'] for key, column in self.numeric.items()}
+        for key in self.categorical:
+            listing.setdefault(self.names[key], None)
+        return listing
+
+    def _numeric_ids(self, key, operator, raw_value):
+        """Lfd. Nummer whose value range satisfies the constraint"""
+        column = self.numeric[key]
+        # Without a unit the value is in the label's unit ("Länge [m]": Länge>=8 is 8 m)
+        parsed = parse_value(raw_value, column['label_unit'])
+        if parsed is None:
+            raise PropertyQueryError(f"'{raw_value}' is not a number for {self.names[key]}")
+        value_unit = _VALUE_RE.match(str(raw_value)).group(3)
+        if parsed[2] != column['unit']:
+            raise PropertyQueryError(f"Unit '{value_unit or column['label_unit']}' does not match {self.names[key]} [{column['unit']}]")
+        value = parsed[0]
+
+        low, high = column['low'], column['high']
+        # A range value satisfies >= / > when its upper bound does, <= / < when its lower bound does
+        if operator == '>=':
+            return set(column['high_ids'][bisect_left(high, value):])
+        if operator == '>':
+            return set(column['high_ids'][bisect_right(high, value):])
+        if operator == '<=':
+            return set(column['low_ids'][:bisect_right(low, value)])
+        if operator == '<':
+            return set(column['low_ids'][:bisect_left(low, value)])
+        return (set(column['high_ids'][bisect_left(high, value):])
+                & set(column['low_ids'][:bisect_right(low, value)]))
+
+    def matching(self, constraint):
+        """
+        Lfd. Nummer satisfying one constraint
+
+        Args:
+            constraint (str): e.g. "Traglast>=5" (numeric) or "Protokoll=PROFINET" (categorical)
+
+        Returns:
+            set: Matching Lfd. Nummer
+
+        Raises:
+            PropertyQueryError: Unknown property, unparsable value or unsupported operator
+        """
+        key, operator, raw_value = parse_constraint(constraint)
+        if key in self.numeric:
+            return self._numeric_ids(key, operator, raw_value)
+        if key in self.categorical:
+            if operator != '=':
+                raise PropertyQueryError(f"{self.names[key]} is not numeric, only '=' is supported")
+            return set(self.categorical[key].get(fold(raw_value).strip(), ()))
+        raise PropertyQueryError(f"Unknown property '{_CONSTRAINT_RE.match(constraint).group(1)}' in '{constraint}'")
+
+    def filter(self, constraints):
+        """Lfd. Nummer satisfying all constraints (smallest result set first)"""
+        result = None
+        for ids in sorted((self.matching(c) for c in constraints), key=len):
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result if result is not None else set()
+
+
+def load_or_build_property_index(component_file_path, index_path=None, load_records=None):
+    """
+    Load the persisted property index, rebuilding it when missing or stale
+
+    Args:
+        component_file_path (str): Path to component_data.json, or to the file load_records reads
+        index_path (str): Index path (defaults to property_index.json next to it)
+        load_records (callable): () -> Baukasten records (default: parse component_file_path)
+
+    Returns:
+        PropertyIndex: Index matching the current component file
+    """
+    def build():
+        if load_records is not None:
+            return PropertyIndex.from_records(load_records())
+        with open(component_file_path, 'r', encoding='utf-8') as f:
+            return PropertyIndex.from_records(json.load(f))
+
+    index_path = index_path or os.path.join(os.path.dirname(component_file_path), 'property_index.json')
+    return load_or_build(index_path, [component_file_path], PropertyIndex.load, build,
+                         salt=f'property-index-{INDEX_VERSION}')
@@ -0,0 +1,132 @@
+"""
+Precompressed response snapshots of the mind-map hierarchy.
+
+Every distinct hierarchy response (identified by the hash of the input files
+plus the request variant: where, lod, layout) is serialized once, minified,
+and stored next to its gzip and, when the brotli package is installed,
+brotli variants:
+
+    responses/<key>.json       minified UTF-8 JSON
+    responses/<key>.json.gz    gzip -9 of the same bytes
+    responses/<key>.json.br    brotli quality 11 (optional)
+    responses/<key>.meta.json  manifest, written last
+
+The manifest printed by process_data.py --snapshot names the files and their
+ETags (content hash of the minified bytes, suffixed per encoding), so
+server.js answers matching If-None-Match requests with 304 and otherwise
+streams the precompressed bytes without re-serializing anything. Only the
+``keep`` most recently used snapshots are retained.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_VERSION = 1
+DEFAULT_KEEP = 20
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+SUFFIXES = {'identity': '.json', 'gzip': '.json.gz', 'br': '.json.br'}
+
+
+def serialize(payload):
+    """Minified UTF-8 JSON bytes (no ASCII escaping, like write_json)"""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def content_hash(data):
+    """Short SHA-256 of the serialized bytes, the base of every ETag"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def encode_variants(data):
+    """
+    Precompressed variants of serialized bytes
+
+    Args:
+        data (bytes): Minified JSON
+
+    Returns:
+        dict: {encoding: bytes} with 'identity', 'gzip' and, if available, 'br'
+    """
+    variants = {'identity': data, 'gzip': gzip.compress(data, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=BROTLI_QUALITY)
+    return variants
+
+
+def _write_bytes(path, data):
+    # Per-process temp name: concurrent requests may build the same snapshot
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _variant_path(directory, key, encoding):
+    return os.path.join(directory, key + SUFFIXES[encoding])
+
+
+def _prune(directory, keep):
+    """Remove all but the ``keep`` most recently used snapshots"""
+    metas = [name for name in os.listdir(directory) if name.endswith('.meta.json')]
+    if len(metas) <= keep:
+        return
+    metas.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    for name in metas[keep:]:
+        key = name[:-len('.meta.json')]
+        for path in [os.path.join(directory, name)] + [_variant_path(directory, key, e) for e in SUFFIXES]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def load_or_build_response(directory, source_hash, build_output, keep=DEFAULT_KEEP):
+    """
+    Manifest of the precompressed snapshot for one input state, built on first use
+
+    Args:
+        directory (str): Snapshot directory (created when missing)
+        source_hash (str): Hash of the inputs and the request variant
+        build_output (callable): () -> JSON payload, only called when no snapshot exists
+        keep (int): Number of snapshots retained
+
+    Returns:
+        dict: {"etag", "length", "variants": {encoding: {"path", "etag", "length"}}}
+    """
+    key = hashlib.sha256(f'{RESPONSE_VERSION}:{source_hash}'.encode()).hexdigest()[:32]
+    meta_path = os.path.join(directory, f'{key}.meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if all(os.path.exists(variant['path']) for variant in manifest['variants'].values()):
+            try:
+                os.utime(meta_path)  # Most recently used, kept by _prune
+            except OSError:
+                pass
+            return manifest
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        pass
+
+    data = serialize(build_output())
+    etag = content_hash(data)
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'etag': f'"{etag}"', 'length': len(data), 'variants': {}}
+    for encoding, encoded in encode_variants(data).items():
+        path = os.path.abspath(_variant_path(directory, key, encoding))
+        _write_bytes(path, encoded)
+        manifest['variants'][encoding] = {
+            'path': path,
+            'etag': f'"{etag}"' if encoding == 'identity' else f'"{etag}-{encoding}"',
+            'length': len(encoded),
+        }
+    _write_bytes(meta_path, serialize(manifest))
+    _prune(directory, keep)
+    return manifest
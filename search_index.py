@@ -0,0 +1,294 @@
+"""
+Search and autocomplete index over process and component names.
+
+Indexes Prozessname and Merkmalsklasse of processes and Bauteilnamen,
+Bauteilkategorie, Hersteller and Typ of components. Text is folded (lower
+case, ä -> ae, ß -> ss, accents stripped) so "Etikettgroesse" finds
+"Etikettgröße". Every query token is looked up
+
+    1. exactly and as a prefix in a character trie (autocomplete), and
+    2. by trigram overlap for typo tolerance ("Greifr" -> "Greifer").
+
+Hits carry their path in the Process -> sub-process (any depth) -> Bauteil
+tree built by process_data.py, so a client can expand the right branch without
+loading the whole hierarchy. The token postings, the trie and the trigram map
+are persisted as search_index.json, so a query only parses the file, and
+rebuilt when any input file changes (see index_cache.load_or_build).
+"""
+
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+from hierarchy_builder import acyclic_links
+from index_cache import load_or_build
+
+INDEX_VERSION = 3
+
+PROCESS_FIELDS = {'Prozessname': 1.0, 'Merkmalsklasse 1': 0.5, 'Merkmalsklasse 2': 0.5, 'Merkmalsklasse 3': 0.5}
+COMPONENT_FIELDS = {'Bauteilnamen': 1.0, 'Typ': 0.8, 'Hersteller': 0.6, 'Bauteilkategorie': 0.6}
+
+SOURCE_FILES = ('hauptprozess_map.json', 'enhanced_matrix.json', 'process_data.json', 'component_data.json')
+
+# Score of a query token per match type (times the field weight)
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORE = 0.6
+MIN_TRIGRAM_SIMILARITY = 0.4
+MAX_PATHS = 10
+
+_FOLD_TABLE = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Lower-case, umlaut-folded, accent-free form of a text"""
+    text = str(text).lower().translate(_FOLD_TABLE)
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    """Folded alphanumeric tokens of a text"""
+    return _TOKEN_RE.findall(fold(text))
+
+
+def trigrams(token):
+    """Padded character trigrams of a token"""
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def tree_paths(hauptprozess_map, enhanced_matrix, max_paths=MAX_PATHS):
+    """
+    Node ids from the root to every process and component in the process_data.py tree
+
+    Walks the same acyclic view of the links as hierarchy_builder.py, to any
+    depth: a sub-process node lists its sub-processes first, then its Bauteile.
+
+    Args:
+        hauptprozess_map (dict): {process id: [sub-process ids]}
+        enhanced_matrix (dict): {process id: [Lfd. Nummer]}
+        max_paths (int): Paths kept per process or component (a sub-process linked from
+            many parents is not expanded again once it has that many)
+
+    Returns:
+        tuple: ({Prozessnummer: [path, ...]}, {Lfd. Nummer: [path, ...]})
+    """
+    links, _ = acyclic_links(hauptprozess_map, list(hauptprozess_map))
+    process_paths = defaultdict(list)
+    component_paths = defaultdict(list)
+
+    def add_components(process_id, path):
+        for bb_id in enhanced_matrix.get(process_id, []):
+            if len(component_paths[str(bb_id)]) < max_paths:
+                component_paths[str(bb_id)].append(path + [str(bb_id)])
+
+    for process_id in hauptprozess_map:
+        root = f"Process_{process_id}"
+        process_paths[process_id].append([root])
+        # Pre-order over the sub-processes; ('leaves', ...) entries add a node's Bauteile after its subtree
+        stack = [('node', child_id, [root, child_id]) for child_id in reversed(links.get(process_id, []))]
+        while stack:
+            entry, node_id, path = stack.pop()
+            if entry == 'leaves':
+                add_components(node_id, path)
+                continue
+            if len(process_paths[node_id]) >= max_paths:
+                continue
+            process_paths[node_id].append(path)
+            stack.append(('leaves', node_id, path))
+            stack.extend(('node', child_id, path + [child_id]) for child_id in reversed(links.get(node_id, [])))
+        if not links.get(process_id):
+            add_components(process_id, [root, f"direct_{process_id}"])
+    return process_paths, component_paths
+
+
+class SearchIndex:
+    """Prefix trie plus trigram index over folded name tokens"""
+
+    def __init__(self, docs, postings, source_hash=None, trie=None, trigram_tokens=None, source_signature=None):
+        """
+        Args:
+            docs (list): Documents {"kind", "id", "name", "paths"}
+            postings (dict): Token -> [[doc index, field weight], ...]
+            source_hash (str): Hash of the input files the index was built from
+            trie (dict): Character trie over the tokens ('' holds the token); derived when None
+            trigram_tokens (dict): Trigram -> [token, ...]; derived when None
+            source_signature (list): Signature recorded by index_cache.load_or_build
+        """
+        self.docs = docs
+        self.postings = postings
+        self.source_hash = source_hash
+        self.source_signature = source_signature
+        if trie is None or trigram_tokens is None:
+            trie, grams = {}, defaultdict(set)
+            for token in postings:
+                node = trie
+                for ch in token:
+                    node = node.setdefault(ch, {})
+                node[''] = token
+                for gram in trigrams(token):
+                    grams[gram].add(token)
+            trigram_tokens = {gram: sorted(tokens) for gram, tokens in grams.items()}
+        self._trie = trie
+        self._trigrams = trigram_tokens
+
+    @classmethod
+    def build(cls, data, source_hash=None):
+        """
+        Build the index from the JSON inputs loaded by process_data.load_data
+
+        Args:
+            data (dict): hauptprozess_map, enhanced_matrix, process_data, component_data
+            source_hash (str): Hash recorded for staleness checks
+
+        Returns:
+            SearchIndex: New index
+        """
+        process_paths, component_paths = tree_paths(data['hauptprozess_map'], data['enhanced_matrix'])
+        docs = []
+        postings = defaultdict(dict)
+
+        def add(kind, doc_id, name, record, fields, paths):
+            doc_index = len(docs)
+            docs.append({"kind": kind, "id": doc_id, "name": name, "paths": paths[:MAX_PATHS]})
+            for field, weight in fields.items():
+                for token in tokenize(record.get(field) or ''):
+                    postings[token][doc_index] = max(weight, postings[token].get(doc_index, 0.0))
+
+        for p in data['process_data']:
+            if not p.get('Prozessnummer'):
+                continue
+            process_id = str(int(p['Prozessnummer']))
+            add('process', process_id, p['Prozessname'], p, PROCESS_FIELDS, process_paths.get(process_id, []))
+        for c in data['component_data']:
+            if not c.get('Lfd. Nummer'):
+                continue
+            component_id = str(c['Lfd. Nummer'])
+            add('component', component_id, c['Bauteilnamen'], c, COMPONENT_FIELDS,
+                component_paths.get(component_id, []))
+
+        return cls(docs, {t: sorted(d.items()) for t, d in postings.items()}, source_hash)
+
+    def save(self, index_path):
+        """Write docs, postings, trie and trigram map as JSON (written to a temp file, then renamed)"""
+        payload = {'version': INDEX_VERSION, 'source_hash': self.source_hash,
+                   'source_signature': self.source_signature, 'docs': self.docs, 'postings': self.postings,
+                   'trie': self._trie, 'trigrams': self._trigrams}
+        tmp_path = f'{index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path):
+        """Read an index written by ``save``"""
+        with open(index_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in '{index_path}'")
+        return cls(payload['docs'], payload['postings'], payload.get('source_hash'), payload['trie'],
+                   payload['trigrams'], payload.get('source_signature'))
+
+    def _prefix_tokens(self, prefix):
+        """Indexed tokens starting with prefix"""
+        node = self._trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        tokens, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == '':
+                    tokens.append(child)
+                else:
+                    stack.append(child)
+        return tokens
+
+    def _fuzzy_tokens(self, token):
+        """Indexed tokens with trigram Jaccard similarity above MIN_TRIGRAM_SIMILARITY"""
+        grams = trigrams(token)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                overlap[candidate] += 1
+        similar = []
+        for candidate, shared in overlap.items():
+            similarity = shared / (len(grams) + len(trigrams(candidate)) - shared)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                similar.append((candidate, similarity))
+        return similar
+
+    def _token_scores(self, token):
+        """Best score per doc index for one query token"""
+        matches = {}
+        if token in self.postings:
+            matches[token] = EXACT_SCORE
+        for candidate in self._prefix_tokens(token):
+            matches.setdefault(candidate, PREFIX_SCORE)
+        if len(token) >= 3:
+            for candidate, similarity in self._fuzzy_tokens(token):
+                matches[candidate] = max(matches.get(candidate, 0.0), FUZZY_SCORE * similarity)
+
+        scores = {}
+        for candidate, match_score in matches.items():
+            for doc_index, weight in self.postings[candidate]:
+                scores[doc_index] = max(scores.get(doc_index, 0.0), match_score * weight)
+        return scores
+
+    def search(self, query, limit=20, kind=None):
+        """
+        Ranked documents matching every token of a query
+
+        Args:
+            query (str): Free text; the last token may be incomplete
+            limit (int): Maximum number of hits
+            kind (str): Restrict to 'process' or 'component'
+
+        Returns:
+            list: Hits {"kind", "id", "name", "score", "paths"}, best first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        totals = None
+        for token in tokens:
+            scores = self._token_scores(token)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {d: totals[d] + s for d, s in scores.items() if d in totals}
+            if not totals:
+                return []
+
+        hits = []
+        for doc_index, score in totals.items():
+            doc = self.docs[doc_index]
+            if kind and doc['kind'] != kind:
+                continue
+            hits.append((score / len(tokens), doc_index))
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return [dict(self.docs[d], score=round(s, 3)) for s, d in hits[:limit]]
+
+
+def load_or_build_search_index(data_path, load_data, index_path=None, source_files=SOURCE_FILES):
+    """
+    Load the persisted search index, rebuilding it when missing or stale
+
+    Args:
+        data_path (str): Directory with the JSON inputs
+        load_data (callable): data_path -> dict of loaded inputs (process_data.load_data)
+        index_path (str): Index path (defaults to <data_path>/search_index.json)
+        source_files (tuple): Files in data_path load_data reads (the SQLite store when it is served)
+
+    Returns:
+        SearchIndex: Index matching the current input files
+    """
+    index_path = index_path or os.path.join(data_path, 'search_index.json')
+    return load_or_build(index_path, [os.path.join(data_path, name) for name in source_files], SearchIndex.load,
+                         lambda: SearchIndex.build(load_data(data_path)), salt=f'search-index-{INDEX_VERSION}')
@@ -1,38 +1,202 @@
 const express = require('express');
-const { exec } = require('child_process');
+const { execFile } = require('child_process');
+const fs = require('fs');
+const http = require('http');
 const path = require('path');
 const cors = require('cors');
 
 const app = express();
 const port = 5000;
 
+// Mapping job service (Create_data_files/mapping_jobs.py)
+const jobsServiceUrl = new URL(process.env.MAPPING_JOBS_URL || 'http://127.0.0.1:5001');
+
 // Use CORS to allow requests from your React app
 app.use(cors());
 
-// API endpoint to execute the Python script and get data
-app.get('/api/mindmaps', (req, res) => {
-  const pythonScriptPath = path.join(__dirname, 'process_data.py');
-  
-  // Use 'exec' to run the Python script
-  exec(`python ${pythonScriptPath}`, (error, stdout, stderr) => {
+const pythonScriptPath = path.join(__dirname, 'process_data.py');
+
+// Run process_data.py with the given arguments and send its JSON output.
+// execFile passes arguments directly, never through a shell.
+function sendProcessData(res, args) {
+  execFile('python', [pythonScriptPath, ...args], (error, stdout, stderr) => {
     if (error) {
       console.error(`Error executing Python script: ${error.message}`);
       return res.status(500).send(`Server error: ${error.message}`);
     }
-    if (stderr) {
-      console.error(`Python script stderr: ${stderr}`);
-      return res.status(500).send(`Python script error: ${stderr}`);
-    }
+    // stderr is a log (warnings of a successful run); only a non-zero exit is a failure
+    if (stderr) console.warn(`Python script stderr: ${stderr}`);
 
     try {
-      // The Python script should print a JSON array to stdout
-      const mindMaps = JSON.parse(stdout);
-      res.json(mindMaps);
+      // The Python script should print JSON to stdout
+      res.json(JSON.parse(stdout));
     } catch (e) {
       console.error(`Failed to parse JSON from Python script: ${e.message}`);
       return res.status(500).send(`Failed to parse JSON: ${e.message}`);
     }
   });
+}
+
+// Inputs of the hierarchy responses (process_data.HIERARCHY_FILES plus the SQLite store)
+const inputFiles = ['hauptprozess_map.json', 'enhanced_matrix.json', 'process_data.json', 'component_data.json',
+  'enhanced_results.npz', 'hierarchy.sqlite', 'hierarchy.sqlite-wal'];
+
+// Data directory process_data.py reads (current/ when mapping jobs published a release)
+// plus (size, mtime) of every input: when it is unchanged, so is the snapshot manifest
+async function inputsSignature() {
+  const current = path.join(__dirname, 'current');
+  const dataDir = await fs.promises.realpath(current).catch(() => __dirname);
+  const stats = await Promise.all(inputFiles.map((name) => fs.promises.stat(path.join(dataDir, name))
+    .then((stat) => `${name}:${stat.size}:${stat.mtimeMs}`, () => `${name}:-`)));
+  return [dataDir, ...stats].join('|');
+}
+
+// Snapshot manifests by request variant: {signature, variants (promise)}
+const manifestCache = new Map();
+
+// Manifest of one request variant; spawns process_data.py --snapshot only when the inputs changed
+// (concurrent requests for a changed variant share one spawn)
+async function snapshotVariants(args) {
+  const key = args.join('\0');
+  const signature = await inputsSignature();
+  const cached = manifestCache.get(key);
+  if (cached && cached.signature === signature) return cached.variants;
+
+  const variants = new Promise((resolve, reject) => {
+    execFile('python', [pythonScriptPath, '--snapshot', ...args], (error, stdout, stderr) => {
+      if (error) return reject(error);
+      if (stderr) console.warn(`Python script stderr: ${stderr}`);
+      try {
+        resolve(JSON.parse(stdout).variants);
+      } catch (e) {
+        reject(e);
+      }
+    });
+  });
+  manifestCache.set(key, { signature, variants });
+  variants.catch(() => {
+    if (manifestCache.get(key)?.variants === variants) manifestCache.delete(key);
+  });
+  return variants;
+}
+
+// Serve a hierarchy response from its precompressed snapshot (process_data.py --snapshot,
+// see response_cache.py): 304 when If-None-Match carries one of its ETags, otherwise the stored
+// brotli, gzip or plain bytes as they are. The manifest is cached per variant, so while the inputs
+// are unchanged no Python process is started. Falls back to sendProcessData if no snapshot can be made.
+async function sendHierarchySnapshot(req, res, args) {
+  let variants;
+  try {
+    variants = await snapshotVariants(args);
+  } catch (e) {
+    console.error(`Snapshot unavailable, building the response directly: ${e.message}`);
+    return sendProcessData(res, args);
+  }
+
+  const encoding = ['br', 'gzip'].find((e) => variants[e] && req.acceptsEncodings(e) === e) || 'identity';
+  const variant = variants[encoding];
+  const etags = Object.values(variants).map((v) => v.etag);
+  res.set({ ETag: variant.etag, Vary: 'Accept-Encoding', 'Cache-Control': 'no-cache' });
+
+  const ifNoneMatch = req.get('If-None-Match');
+  if (ifNoneMatch && ifNoneMatch.split(',').some((tag) => {
+    const value = tag.trim().replace(/^W\//, '');
+    return value === '*' || etags.includes(value);
+  })) {
+    return res.status(304).end();
+  }
+
+  const stream = fs.createReadStream(variant.path);
+  stream.on('open', () => {
+    res.set({ 'Content-Type': 'application/json; charset=utf-8', 'Content-Length': String(variant.length) });
+    if (encoding !== 'identity') res.set('Content-Encoding', encoding);
+    stream.pipe(res);
+  });
+  stream.on('error', (e) => {
+    // Pruned between manifest and read: forget the manifest and build the response instead
+    manifestCache.delete(args.join('\0'));
+    if (res.headersSent) return res.destroy(e);
+    console.error(`Failed to read snapshot ${variant.path}: ${e.message}`);
+    res.removeHeader('ETag');
+    sendProcessData(res, args);
+  });
+}
+
+// Optional property constraints, e.g. ?where=Traglast>=5&where=Reichweite>=800
+function whereArgs(req) {
+  return [].concat(req.query.where || []).map(String).flatMap((c) => ['--where', c]);
+}
+
+// Optional level of detail, e.g. ?lod=Hersteller groups the Bauteile of wide nodes
+function lodArgs(req) {
+  return req.query.lod === 'Bauteilkategorie' || req.query.lod === 'Hersteller' ? ['--lod', req.query.lod] : [];
+}
+
+// API endpoint to execute the Python script and get data
+app.get('/api/mindmaps', (req, res) => {
+  const args = [...whereArgs(req), ...lodArgs(req)];
+  // ?layout=1 returns precomputed tidy-tree coordinates with every node
+  if (req.query.layout === '1' || req.query.layout === 'true') args.push('--layout');
+  sendHierarchySnapshot(req, res, args);
+});
+
+// Versioned hierarchy: without ?since the current {version, hierarchy}, with ?since=N the
+// structural changes from version N (or the full snapshot if N is no longer kept)
+app.get('/api/mindmaps/versions', (req, res) => {
+  const since = parseInt(req.query.since, 10);
+  sendProcessData(res, Number.isNaN(since) ? ['--versioned'] : ['--since', String(since)]);
+});
+
+// Bauteile behind one level-of-detail group node (same where/lod parameters as the tree)
+app.get('/api/mindmaps/groups/:id', (req, res) => {
+  sendProcessData(res, [...whereArgs(req), ...lodArgs(req), '--expand', req.params.id]);
+});
+
+// Subtree below one Hauptprozess or partial solution (indexed query when hierarchy.sqlite exists)
+app.get('/api/mindmaps/nodes/:id', (req, res) => {
+  const args = [...whereArgs(req), '--subtree', req.params.id];
+  if (req.query.layout === '1' || req.query.layout === 'true') args.push('--layout');
+  sendProcessData(res, args);
+});
+
+// Full sheet row of one process or Bauteil
+app.get('/api/processes/:id', (req, res) => {
+  sendProcessData(res, ['--process', req.params.id]);
+});
+
+app.get('/api/components/:id', (req, res) => {
+  sendProcessData(res, ['--component', req.params.id]);
+});
+
+// Search processes and Bauteile by name without loading the whole hierarchy
+app.get('/api/search', (req, res) => {
+  const args = ['--search', String(req.query.q || '')];
+  if (req.query.limit) args.push('--limit', String(parseInt(req.query.limit, 10) || 20));
+  if (req.query.kind === 'process' || req.query.kind === 'component') args.push('--kind', req.query.kind);
+  sendProcessData(res, args);
+});
+
+// Forward mapping job requests (submit, status, cancel) to the Python job service
+// (POST /api/jobs takes JSON naming a workbook in the service's workbook directory, or the workbook itself)
+app.all(['/api/jobs', '/api/jobs/:id'], express.raw({ type: '*/*', limit: '50mb' }), (req, res) => {
+  const body = Buffer.isBuffer(req.body) ? req.body : Buffer.alloc(0);
+  const query = req.originalUrl.includes('?') ? req.originalUrl.slice(req.originalUrl.indexOf('?')) : '';
+  const proxyReq = http.request({
+    hostname: jobsServiceUrl.hostname,
+    port: jobsServiceUrl.port,
+    path: (req.params.id ? `/jobs/${encodeURIComponent(req.params.id)}` : '/jobs') + query,
+    method: req.method,
+    headers: { 'Content-Type': req.get('Content-Type') || 'application/json', 'Content-Length': body.length },
+  }, (proxyRes) => {
+    res.status(proxyRes.statusCode);
+    res.set('Content-Type', proxyRes.headers['content-type'] || 'application/json');
+    proxyRes.pipe(res);
+  });
+  proxyReq.on('error', (e) => {
+    console.error(`Mapping job service unavailable: ${e.message}`);
+    res.status(503).send(`Mapping job service unavailable: ${e.message}`);
+  });
+  proxyReq.end(body);
 });
 
 app.listen(port, () => {